@@ -0,0 +1,136 @@
+"""partition_video_snapshots
+
+Revision ID: 8d2f4a61c0b7
+Revises: 3b7e1c52d9a4
+Create Date: 2026-10-18 15:27:41.602118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f4a61c0b7'
+down_revision: Union[str, Sequence[str], None] = '3b7e1c52d9a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = (
+    'id, video_id, views_count, likes_count, comments_count, reports_count, '
+    'delta_views_count, delta_likes_count, delta_comments_count, '
+    'delta_reports_count, created_at, updated_at'
+)
+
+
+def _create_indexes() -> None:
+    op.create_index('idx_snapshots_date_video', 'video_snapshots', ['created_at', 'video_id'], unique=False)
+    op.create_index(op.f('ix_video_snapshots_created_at'), 'video_snapshots', ['created_at'], unique=False)
+    op.create_index(op.f('ix_video_snapshots_video_id'), 'video_snapshots', ['video_id'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    op.execute(
+        """
+        CREATE TABLE video_snapshots_partitioned (
+            LIKE video_snapshots INCLUDING DEFAULTS
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+
+    # месячные секции под существующие данные, текущий и следующий месяц;
+    # дальше секции создает загрузчик (src.scripts.snapshot_partitions)
+    op.execute(
+        """
+        DO $$
+        DECLARE
+          month date;
+          first_month date;
+          last_month date;
+        BEGIN
+          SELECT
+            (date_trunc('month', COALESCE(MIN(created_at), now()), 'UTC')
+              AT TIME ZONE 'UTC')::date,
+            (date_trunc('month', GREATEST(MAX(created_at), now()), 'UTC')
+              AT TIME ZONE 'UTC')::date
+          INTO first_month, last_month
+          FROM video_snapshots;
+
+          FOR month IN
+            SELECT generate_series(
+              first_month, last_month + interval '1 month', interval '1 month'
+            )::date
+          LOOP
+            EXECUTE format(
+              'CREATE TABLE %I PARTITION OF video_snapshots_partitioned '
+              'FOR VALUES FROM (%L) TO (%L)',
+              'video_snapshots_' || to_char(month, '"y"YYYY"m"MM'),
+              month::text || ' 00:00+00',
+              (month + interval '1 month')::date::text || ' 00:00+00'
+            );
+          END LOOP;
+        END
+        $$;
+        """
+    )
+
+    op.execute(
+        f"INSERT INTO video_snapshots_partitioned ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM video_snapshots"
+    )
+    op.drop_table('video_snapshots')
+    op.rename_table('video_snapshots_partitioned', 'video_snapshots')
+
+    # ключ и индексы строятся после копирования данных, одним проходом
+    op.create_primary_key('video_snapshots_pkey', 'video_snapshots', ['id', 'created_at'])
+    op.create_foreign_key(
+        'video_snapshots_video_id_fkey', 'video_snapshots', 'videos',
+        ['video_id'], ['id'], ondelete='CASCADE',
+    )
+    _create_indexes()
+
+    # к секциям через родителя хватает прав на родителя; права по умолчанию
+    # нужны для прямых запросов к секциям, созданным позже
+    op.execute("GRANT SELECT ON ALL TABLES IN SCHEMA public TO readonly_user")
+    op.execute(
+        "ALTER DEFAULT PRIVILEGES IN SCHEMA public "
+        "GRANT SELECT ON TABLES TO readonly_user"
+    )
+    op.execute("ANALYZE video_snapshots")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+
+    op.execute(
+        "ALTER DEFAULT PRIVILEGES IN SCHEMA public "
+        "REVOKE SELECT ON TABLES FROM readonly_user"
+    )
+
+    op.execute(
+        """
+        CREATE TABLE video_snapshots_plain (
+            LIKE video_snapshots INCLUDING DEFAULTS
+        )
+        """
+    )
+    op.execute(
+        f"INSERT INTO video_snapshots_plain ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM video_snapshots"
+    )
+    # секции удаляются вместе с родителем
+    op.drop_table('video_snapshots')
+    op.rename_table('video_snapshots_plain', 'video_snapshots')
+
+    op.create_primary_key('video_snapshots_pkey', 'video_snapshots', ['id'])
+    op.create_foreign_key(
+        'video_snapshots_video_id_fkey', 'video_snapshots', 'videos',
+        ['video_id'], ['id'], ondelete='CASCADE',
+    )
+    _create_indexes()
+
+    op.execute("GRANT SELECT ON video_snapshots TO readonly_user")
@@ -0,0 +1,173 @@
+"""Память и скорость конвертации пачек: словари против колонок.
+
+база не нужна, синтетический файл создается при первом запуске:
+
+    python -m src.benchmarks.conversion --videos 20000 --snapshots 100
+"""
+
+from argparse import ArgumentParser, Namespace
+from collections.abc import Callable, Generator
+from dataclasses import dataclass
+from pathlib import Path
+from tempfile import gettempdir
+from time import perf_counter
+import tracemalloc
+from typing import Any
+
+import ijson  # type: ignore
+from src.scripts.columnar_batch import (
+    SNAPSHOT_COLUMNS,
+    VIDEO_COLUMNS,
+    ColumnarBatch,
+    convert_raw_batch_columnar,
+)
+from src.scripts.generate_dataset import DatasetSpec, write_dataset
+from src.scripts.json_to_database import convert_raw_batch
+
+RawBatch = list[dict[str, Any]]
+
+
+def iter_raw_batches(  # noqa: D103
+    path: Path, bulk_size: int
+) -> Generator[RawBatch]:
+    raw_batch: RawBatch = []
+    with open(path, "rb") as file:
+        for video_item in ijson.items(file, "videos.item"):
+            raw_batch.append(video_item)
+            if len(raw_batch) == bulk_size:
+                yield raw_batch
+                raw_batch = []
+    if raw_batch:
+        yield raw_batch
+
+
+def _columnar_converter() -> Callable[[RawBatch], Any]:
+    videos = ColumnarBatch(VIDEO_COLUMNS)
+    snapshots = ColumnarBatch(SNAPSHOT_COLUMNS)
+    return lambda raw_batch: convert_raw_batch_columnar(
+        raw_batch, videos, snapshots
+    )
+
+
+CONVERTERS: dict[str, Callable[[], Callable[[RawBatch], Any]]] = {
+    "dict": lambda: convert_raw_batch,
+    "columnar": _columnar_converter,
+}
+
+
+@dataclass(slots=True)
+class ConversionResult:  # noqa: D101
+    variant: str
+    rows: int
+    parse_seconds: float
+    convert_seconds: float
+    peak_batch_bytes: int
+
+    @property
+    def rows_per_second(self) -> float:  # noqa: D102
+        if not self.convert_seconds:
+            return 0.0
+        return self.rows / self.convert_seconds
+
+
+def run_variant(  # noqa: D103
+    variant: str, path: Path, bulk_size: int, memory_batches: int
+) -> ConversionResult:
+    convert = CONVERTERS[variant]()
+    rows = 0
+    parse_seconds = 0.0
+    convert_seconds = 0.0
+    peak_batch_bytes = 0
+
+    raw_batches = iter_raw_batches(path, bulk_size)
+    batch_index = 0
+    while True:
+        parse_started = perf_counter()
+        raw_batch = next(raw_batches, None)
+        parse_seconds += perf_counter() - parse_started
+        if raw_batch is None:
+            break
+
+        # память меряем на первых пачках: tracemalloc сильно тормозит
+        traced = batch_index < memory_batches
+        if traced:
+            tracemalloc.start()
+
+        convert_started = perf_counter()
+        videos_batch, snapshots_batch = convert(raw_batch)
+        elapsed = perf_counter() - convert_started
+
+        if traced:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak_batch_bytes = max(peak_batch_bytes, peak)
+        else:
+            convert_seconds += elapsed
+            rows += len(videos_batch) + len(snapshots_batch)
+
+        batch_index += 1
+
+    return ConversionResult(
+        variant=variant,
+        rows=rows,
+        parse_seconds=parse_seconds,
+        convert_seconds=convert_seconds,
+        peak_batch_bytes=peak_batch_bytes,
+    )
+
+
+def main(args: Namespace) -> None:  # noqa: D103
+    if not args.path.exists():
+        print(f"writing synthetic file {args.path}")
+        write_dataset(
+            DatasetSpec(
+                videos=args.videos,
+                creators=max(1, args.videos // 50),
+                max_snapshots=args.snapshots,
+            ),
+            args.path,
+        )
+
+    print(
+        f"{'variant':<10}{'rows':>12}{'parse s':>10}"
+        f"{'convert s':>11}{'rows/s':>12}{'peak MiB':>10}"
+    )
+    for variant in args.variants:
+        result = run_variant(
+            variant, args.path, args.bulk_size, args.memory_batches
+        )
+        print(
+            f"{result.variant:<10}{result.rows:>12}"
+            f"{result.parse_seconds:>10.2f}{result.convert_seconds:>11.2f}"
+            f"{result.rows_per_second:>12.0f}"
+            f"{result.peak_batch_bytes / 2**20:>10.1f}"
+        )
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--path",
+        type=Path,
+        default=Path(gettempdir()) / "synthetic_videos.json",
+    )
+    parser.add_argument("--videos", type=int, default=20000)
+    parser.add_argument(
+        "--snapshots",
+        type=int,
+        default=100,
+        help="не больше стольких замеров на видео",
+    )
+    parser.add_argument("--bulk-size", type=int, default=2000)
+    parser.add_argument("--memory-batches", type=int, default=2)
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        choices=list(CONVERTERS),
+        default=list(CONVERTERS),
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
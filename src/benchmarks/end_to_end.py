@@ -0,0 +1,281 @@
+r"""Сквозной бенчмарк TextToSQLService без реальной llm.
+
+вопросы из golden_questions.json идут через весь конвейер (генерация sql,
+проверка, explain, выполнение, повторы) на засеянной базе, а llm заменена
+фейковым openai-совместимым сервером с заготовленными ответами. для
+каждого уровня параллельности считаются p50/p95/p99, запросы к llm на
+вопрос, точность против эталонного sql и вопросы в секунду. результат
+пишется в json, чтобы сравнивать коммиты:
+
+    POSTGRES_HOST=localhost python -m src.benchmarks.end_to_end \
+        --concurrency 1 4 16 --bad-sql-rate 0.2 \
+        --compare .benchmarks/e2e-<коммит>.json
+"""
+
+from argparse import ArgumentParser, Namespace
+import asyncio
+from asyncio import run
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+import json
+from pathlib import Path
+from statistics import quantiles
+import subprocess
+from time import perf_counter
+
+from aiohttp.test_utils import TestServer
+from dependency_injector import providers
+from pydantic import SecretStr
+from src.benchmarks.fake_llm_server import LatencyProfile, create_app
+from src.container import Container
+from src.core.settings import LLMSettings, PlanCacheSettings, QueryLogSettings
+from src.llm_service.text_to_sql import TextToSQLService
+
+GOLDEN_PATH = Path(__file__).with_name("golden_questions.json")
+RESULTS_DIR = Path(".benchmarks")
+FAKE_MODEL = "fake/primary"
+
+
+@dataclass(slots=True)
+class GoldenQuestion:  # noqa: D101
+    question: str
+    sql: str
+    expected: int | None = None
+
+
+@dataclass(slots=True)
+class LevelResult:  # noqa: D101
+    concurrency: int
+    queries: int
+    seconds: float
+    queries_per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    llm_requests_per_query: float
+    accuracy: float
+    errors: int
+
+
+def git_commit() -> str:  # noqa: D103
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_golden(path: Path) -> list[GoldenQuestion]:  # noqa: D103
+    return [
+        GoldenQuestion(**item)
+        for item in json.loads(path.read_text(encoding="utf-8"))
+    ]
+
+
+def create_service(args: Namespace, base_url: str) -> TextToSQLService:
+    """Сервис из контейнера с фейковой llm и без записи на диск."""
+    container = Container()
+    container.llm_settings.override(
+        providers.Object(
+            LLMSettings(
+                api_key=SecretStr("fake"),
+                model=FAKE_MODEL,
+                base_url=base_url,
+                candidates=args.candidates,
+            )
+        )
+    )
+    container.plan_cache_settings.override(
+        providers.Object(
+            PlanCacheSettings(
+                enabled=args.caches, templates_enabled=args.caches
+            )
+        )
+    )
+    container.query_log_settings.override(
+        providers.Object(QueryLogSettings(enabled=False, journal_enabled=False))
+    )
+    return container.llm_service()
+
+
+async def fill_expected(
+    service: TextToSQLService, golden: list[GoldenQuestion]
+) -> None:
+    """Эталонные ответы - результат эталонного sql на этой же базе."""
+    async with service.db_manager.read() as connection:
+        for item in golden:
+            if item.expected is None:
+                item.expected = int(await connection.fetchval(item.sql))
+
+
+async def run_level(
+    service: TextToSQLService,
+    golden: list[GoldenQuestion],
+    requests: dict[str, int],
+    concurrency: int,
+    repeat: int,
+) -> LevelResult:
+    """Прогоняет вопросы `repeat` раз при заданной параллельности."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    correct = errors = 0
+
+    async def ask(item: GoldenQuestion) -> None:
+        nonlocal correct, errors
+        async with semaphore:
+            started = perf_counter()
+            try:
+                # одинаковые вопросы не склеиваются
+                result = await service.process_query(
+                    item.question, coalesce=False
+                )
+            except Exception:
+                errors += 1
+                result = None
+            latencies.append((perf_counter() - started) * 1000)
+            correct += result == item.expected
+
+    requests.clear()
+    started = perf_counter()
+    await asyncio.gather(*(ask(item) for item in golden * repeat))
+    seconds = perf_counter() - started
+
+    queries = len(latencies)
+    percentiles = quantiles(latencies, n=100, method="inclusive")
+    return LevelResult(
+        concurrency=concurrency,
+        queries=queries,
+        seconds=seconds,
+        queries_per_second=queries / seconds,
+        p50_ms=percentiles[49],
+        p95_ms=percentiles[94],
+        p99_ms=percentiles[98],
+        llm_requests_per_query=sum(requests.values()) / queries,
+        accuracy=correct / queries,
+        errors=errors,
+    )
+
+
+def print_levels(levels: list[LevelResult]) -> None:  # noqa: D103
+    print(
+        f"{'conc':>5} {'q/s':>8} {'p50, ms':>9} {'p95, ms':>9} "
+        f"{'p99, ms':>9} {'llm/q':>6} {'acc':>6} {'errors':>7}"
+    )
+    for level in levels:
+        print(
+            f"{level.concurrency:>5} {level.queries_per_second:>8.1f} "
+            f"{level.p50_ms:>9.0f} {level.p95_ms:>9.0f} {level.p99_ms:>9.0f} "
+            f"{level.llm_requests_per_query:>6.2f} {level.accuracy:>6.0%} "
+            f"{level.errors:>7}"
+        )
+
+
+def print_comparison(levels: list[LevelResult], baseline_path: Path) -> None:
+    """Изменение метрик относительно сохраненного прогона."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nagainst {baseline['commit']} ({baseline_path}):")
+    for level in levels:
+        before = previous.get(level.concurrency)
+        if before is None:
+            continue
+        changes = ", ".join(
+            f"{metric} {(getattr(level, metric) / before[metric] - 1):+.1%}"
+            for metric in ("queries_per_second", "p50_ms", "p95_ms", "p99_ms")
+            if before[metric]
+        )
+        print(f"  concurrency {level.concurrency}: {changes}")
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=Path, default=GOLDEN_PATH)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 16]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--median", type=float, default=0.5)
+    parser.add_argument("--tail-probability", type=float, default=0.02)
+    parser.add_argument("--tail-seconds", type=float, default=5.0)
+    parser.add_argument("--token-seconds", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--bad-sql-rate", type=float, default=0.0)
+    parser.add_argument("--candidates", type=int, default=1)
+    parser.add_argument(
+        "--caches",
+        action="store_true",
+        help="включить кэш планов и шаблонов (по умолчанию выключены)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="по умолчанию .benchmarks/e2e-<коммит>.json",
+    )
+    parser.add_argument("--compare", type=Path)
+    return parser.parse_args()
+
+
+async def main() -> None:  # noqa: D103
+    args = parse_args()
+    golden = load_golden(args.questions)
+    app = create_app(
+        LatencyProfile(
+            median_seconds=args.median,
+            tail_probability=args.tail_probability,
+            tail_seconds=args.tail_seconds,
+            token_seconds=args.token_seconds,
+        ),
+        answers={item.question: item.sql for item in golden},
+        error_rate=args.error_rate,
+        bad_sql_rate=args.bad_sql_rate,
+    )
+    server = TestServer(app)
+    await server.start_server()
+    service = create_service(args, str(server.make_url("/v1")))
+
+    try:
+        await fill_expected(service, golden)
+        levels = [
+            await run_level(
+                service, golden, app["requests"], concurrency, args.repeat
+            )
+            for concurrency in args.concurrency
+        ]
+    finally:
+        await server.close()
+        await service.client.close()
+        await service.db_manager.close()
+
+    print_levels(levels)
+
+    commit = git_commit()
+    output = args.output or RESULTS_DIR / f"e2e-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    settings = {
+        key: str(value) if isinstance(value, Path) else value
+        for key, value in vars(args).items()
+    }
+    output.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "at": datetime.now(UTC).isoformat(),
+                "settings": settings,
+                "levels": [asdict(level) for level in levels],
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    print(f"\nsaved to {output}")
+
+    if args.compare:
+        print_comparison(levels, args.compare)
+
+
+if __name__ == "__main__":
+    run(main())
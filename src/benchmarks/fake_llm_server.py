@@ -0,0 +1,217 @@
+"""Локальный openai-совместимый сервер с управляемыми задержками.
+
+отвечает на POST /v1/chat/completions заготовленным sql (по вопросу из
+--answers, иначе фиксированным), обычным ответом или потоком
+(stream=true). с заданной вероятностью отвечает ошибкой 500 или
+заведомо неверным sql - тогда следующая попытка с ходом исправления
+получает верный. задержка до первого токена - логнормальная
+вокруг медианы, с заданной вероятностью ответ медленный (хвост). модели
+из --slow-models всегда отвечают с хвостом. после sql модель может
+"рассуждать" еще --trailing-tokens токенов. боту достаточно указать адрес:
+
+    python -m src.benchmarks.fake_llm_server --port 8090
+    OPENROUTER_BASE_URL=http://localhost:8090/v1 python -m src.main
+"""
+
+from argparse import ArgumentParser, Namespace
+import asyncio
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from itertools import count
+import json
+from pathlib import Path
+import random
+import time
+from typing import Any
+
+from aiohttp import web
+
+DEFAULT_SQL = "SELECT COUNT(*) FROM videos;"
+# неизвестная таблица: отклоняется локальной проверкой с подсказкой
+BROKEN_SQL = "SELECT COUNT(*) FROM video;"
+TRAILING_WORD = " поясню"
+
+_completion_ids = count(1)
+
+
+@dataclass(slots=True)
+class LatencyProfile:  # noqa: D101
+    median_seconds: float = 0.3
+    sigma: float = 0.3
+    tail_probability: float = 0.05
+    tail_seconds: float = 5.0
+    slow_models: frozenset[str] = field(default_factory=frozenset)
+    token_seconds: float = 0.0
+    trailing_tokens: int = 0
+
+    def sample(self, model: str) -> float:  # noqa: D102
+        if model in self.slow_models or random.random() < (
+            self.tail_probability
+        ):
+            return self.tail_seconds
+        return random.lognormvariate(0.0, self.sigma) * self.median_seconds
+
+
+def tokens(sql_query: str, trailing_tokens: int) -> list[str]:
+    """Ответ модели по токенам: sql по словам и текст после него."""
+    first, *rest = sql_query.split(" ")
+    return [
+        first,
+        *(f" {word}" for word in rest),
+        *([TRAILING_WORD] * trailing_tokens),
+    ]
+
+
+def completion(model: str, content: str) -> dict[str, Any]:
+    """Ответ chat.completions в формате openai."""
+    return {
+        "id": f"fake-{next(_completion_ids)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        },
+    }
+
+
+def completion_chunk(
+    model: str, content: str | None, finish_reason: str | None = None
+) -> dict[str, Any]:
+    """Кусок потокового ответа chat.completions в формате openai."""
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": "fake-stream",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {"index": 0, "delta": delta, "finish_reason": finish_reason}
+        ],
+    }
+
+
+def create_app(
+    profile: LatencyProfile,
+    sql_query: str = DEFAULT_SQL,
+    answers: Mapping[str, str] | None = None,
+    error_rate: float = 0.0,
+    bad_sql_rate: float = 0.0,
+) -> web.Application:
+    """Приложение фейкового сервера; `app["requests"]` - счетчик по моделям."""
+    app = web.Application()
+    requests: dict[str, int] = {}
+    app["requests"] = requests
+    answers = answers or {}
+
+    def answer(messages: list[dict[str, Any]]) -> str:
+        question = next(
+            message["content"]
+            for message in messages
+            if message["role"] == "user"
+        )
+        is_retry = any(message["role"] == "assistant" for message in messages)
+        if not is_retry and random.random() < bad_sql_rate:
+            return BROKEN_SQL
+        return answers.get(question, sql_query)
+
+    async def stream(
+        request: web.Request, model: str, parts: list[str]
+    ) -> web.StreamResponse:
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream"}
+        )
+        await response.prepare(request)
+        try:
+            for part in parts:
+                await asyncio.sleep(profile.token_seconds)
+                chunk = json.dumps(completion_chunk(model, part))
+                await response.write(f"data: {chunk}\n\n".encode())
+            chunk = json.dumps(completion_chunk(model, None, "stop"))
+            await response.write(f"data: {chunk}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+        except ConnectionResetError:
+            # клиент закрыл поток, получив sql
+            pass
+        return response
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        model = payload["model"]
+        requests[model] = requests.get(model, 0) + 1
+        parts = tokens(answer(payload["messages"]), profile.trailing_tokens)
+
+        await asyncio.sleep(profile.sample(model))
+        if random.random() < error_rate:
+            return web.json_response(
+                {"error": {"message": "fake upstream error", "code": 500}},
+                status=500,
+            )
+        if payload.get("stream"):
+            return await stream(request, model, parts)
+
+        await asyncio.sleep(profile.token_seconds * len(parts))
+        return web.json_response(completion(model, "".join(parts)))
+
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+def load_answers(path: Path) -> dict[str, str]:
+    """Вопрос -> sql из json-списка [{question, sql}]."""
+    items = json.loads(path.read_text(encoding="utf-8"))
+    return {item["question"]: item["sql"] for item in items}
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--median", type=float, default=0.3)
+    parser.add_argument("--tail-probability", type=float, default=0.05)
+    parser.add_argument("--tail-seconds", type=float, default=5.0)
+    parser.add_argument("--slow-models", nargs="*", default=[])
+    parser.add_argument("--token-seconds", type=float, default=0.02)
+    parser.add_argument("--trailing-tokens", type=int, default=0)
+    parser.add_argument("--sql", default=DEFAULT_SQL)
+    parser.add_argument(
+        "--answers",
+        type=Path,
+        help="json-список [{question, sql}], например golden_questions.json",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--bad-sql-rate", type=float, default=0.0)
+    return parser.parse_args()
+
+
+def main() -> None:  # noqa: D103
+    args = parse_args()
+    profile = LatencyProfile(
+        median_seconds=args.median,
+        tail_probability=args.tail_probability,
+        tail_seconds=args.tail_seconds,
+        slow_models=frozenset(args.slow_models),
+        token_seconds=args.token_seconds,
+        trailing_tokens=args.trailing_tokens,
+    )
+    app = create_app(
+        profile,
+        args.sql,
+        answers=load_answers(args.answers) if args.answers else None,
+        error_rate=args.error_rate,
+        bad_sql_rate=args.bad_sql_rate,
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
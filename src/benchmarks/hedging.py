@@ -0,0 +1,157 @@
+"""Хвостовые задержки генерации sql с хеджированием и без.
+
+поднимает фейковый openai-совместимый сервер (src.benchmarks.fake_llm_server)
+и гоняет через него `_call_llm` сервиса. база не нужна:
+
+    python -m src.benchmarks.hedging --calls 300 --tail-probability 0.05
+"""
+
+from argparse import ArgumentParser, Namespace
+import asyncio
+from asyncio import run
+from dataclasses import dataclass
+from statistics import quantiles
+from time import perf_counter
+from typing import TypedDict
+
+from aiohttp.test_utils import TestServer
+from dependency_injector import providers
+from pydantic import SecretStr
+from src.benchmarks.fake_llm_server import LatencyProfile, create_app
+from src.container import Container
+from src.core.settings import LLMSettings, PlanCacheSettings, QueryLogSettings
+
+PRIMARY_MODEL = "fake/primary"
+FALLBACK_MODEL = "fake/fallback"
+
+
+class LLMOverrides(TypedDict, total=False):
+    """Поля LLMSettings, которыми отличаются варианты."""
+
+    hedge: bool
+    stream: bool
+    fallback_models: list[str]
+
+
+VARIANTS: dict[str, LLMOverrides] = {
+    "single": {"hedge": False},
+    "hedge-same-model": {"hedge": True},
+    "hedge-fallback": {"hedge": True, "fallback_models": [FALLBACK_MODEL]},
+}
+
+
+@dataclass(slots=True)
+class HedgingResult:  # noqa: D101
+    variant: str
+    latencies: list[float]
+    server_requests: int
+
+    def percentile(self, quantile: int) -> float:  # noqa: D102
+        return quantiles(self.latencies, n=100)[quantile - 1]
+
+
+async def run_variant(
+    variant: str,
+    overrides: LLMOverrides,
+    base_url: str,
+    requests: dict[str, int],
+    args: Namespace,
+) -> HedgingResult:
+    """Прогоняет `args.calls` генераций одним вариантом настроек llm."""
+    container = Container()
+    container.llm_settings.override(
+        providers.Object(
+            LLMSettings(
+                api_key=SecretStr("fake"),
+                model=PRIMARY_MODEL,
+                base_url=base_url,
+                hedge_min_samples=args.warmup,
+                **overrides,
+            )
+        )
+    )
+    container.plan_cache_settings.override(
+        providers.Object(PlanCacheSettings(enabled=False))
+    )
+    container.query_log_settings.override(
+        providers.Object(QueryLogSettings(enabled=False, journal_enabled=False))
+    )
+    service = container.llm_service()
+
+    for _ in range(args.warmup):
+        await service._call_llm("сколько всего видео?")
+
+    requests.clear()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def timed_call() -> float:
+        async with semaphore:
+            started = perf_counter()
+            await service._call_llm("сколько всего видео?")
+            return perf_counter() - started
+
+    latencies = await asyncio.gather(*(timed_call() for _ in range(args.calls)))
+    await service.client.close()
+    return HedgingResult(variant, latencies, sum(requests.values()))
+
+
+def print_results(  # noqa: D103
+    results: list[HedgingResult], calls: int
+) -> None:
+    print(
+        f"{'variant':<18} {'p50, s':>8} {'p90, s':>8} {'p99, s':>8} "
+        f"{'requests/call':>14}"
+    )
+    for result in results:
+        print(
+            f"{result.variant:<18} {result.percentile(50):>8.2f} "
+            f"{result.percentile(90):>8.2f} {result.percentile(99):>8.2f} "
+            f"{result.server_requests / calls:>14.2f}"
+        )
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--median", type=float, default=0.3)
+    parser.add_argument("--tail-probability", type=float, default=0.05)
+    parser.add_argument("--tail-seconds", type=float, default=5.0)
+    parser.add_argument(
+        "--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS)
+    )
+    return parser.parse_args()
+
+
+async def main() -> None:  # noqa: D103
+    args = parse_args()
+    app = create_app(
+        LatencyProfile(
+            median_seconds=args.median,
+            tail_probability=args.tail_probability,
+            tail_seconds=args.tail_seconds,
+        )
+    )
+    server = TestServer(app)
+    await server.start_server()
+
+    try:
+        results = [
+            await run_variant(
+                variant,
+                VARIANTS[variant],
+                str(server.make_url("/v1")),
+                app["requests"],
+                args,
+            )
+            for variant in args.variants
+        ]
+    finally:
+        await server.close()
+
+    print_results(results, args.calls)
+
+
+if __name__ == "__main__":
+    run(main())
@@ -0,0 +1,256 @@
+r"""Сравнение скорости загрузчиков JsonToDatabaseUploader.
+
+перед каждым прогоном таблицы videos и video_snapshots очищаются,
+поэтому запускать только на тестовой базе. кроме строк в секунду
+печатаются пиковый rss процесса за прогон и размер таблиц после него.
+с --generate-videos файл сначала генерируется (src.scripts.generate_dataset),
+так проверяется загрузка в 10 и 100 раз больших объемов:
+
+    POSTGRES_HOST=localhost python -m src.benchmarks.loaders \
+        --path demo/videos.json --truncate
+
+    POSTGRES_HOST=localhost python -m src.benchmarks.loaders \
+        --path /tmp/videos_100k.json --generate-videos 100000 --truncate
+"""
+
+from argparse import ArgumentParser, Namespace
+from asyncio import run
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import resource
+from threading import Event, Thread
+from time import perf_counter
+from types import TracebackType
+
+from dependency_injector.wiring import Provide, inject
+from sqlalchemy import text
+from src.container import Container
+from src.database.manager import DatabaseManager
+from src.scripts.generate_dataset import DatasetSpec, write_dataset
+from src.scripts.ingestion_pipeline import IngestionPipeline
+from src.scripts.json_to_database import JsonToDatabaseUploader, LoaderMode
+
+# режим, staging-таблица, конвейер с пулом процессов
+VARIANTS: dict[str, tuple[LoaderMode, bool, bool]] = {
+    "orm": ("orm", False, False),
+    "copy": ("copy", False, False),
+    "copy-staging": ("copy", True, False),
+    "copy-pipeline": ("copy", False, True),
+}
+
+TABLES_SIZE_SQL = """
+SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0)
+FROM (
+    SELECT relid FROM pg_partition_tree('video_snapshots')
+    UNION ALL SELECT 'videos'::regclass
+    UNION ALL SELECT 'video_snapshots_hourly'::regclass
+    UNION ALL SELECT 'video_snapshots_daily'::regclass
+    UNION ALL SELECT 'creator_snapshots_hourly'::regclass
+    UNION ALL SELECT 'creator_snapshots_daily'::regclass
+) AS tables
+"""
+
+
+@dataclass(slots=True)
+class LoaderResult:  # noqa: D101
+    variant: str
+    bulk_size: int
+    rows: int
+    total_seconds: float
+    write_seconds: float
+    peak_rss_mb: float = 0.0
+    tables_size_mb: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:  # noqa: D102
+        return self.rows / self.total_seconds if self.total_seconds else 0.0
+
+    @property
+    def write_rows_per_second(self) -> float:  # noqa: D102
+        return self.rows / self.write_seconds if self.write_seconds else 0.0
+
+
+class PeakRSS:
+    """Пиковый rss процесса внутри блока `with`.
+
+    ru_maxrss - пик за всю жизнь процесса и между прогонами не
+    сбрасывается, поэтому текущий rss опрашивается фоновым потоком
+    """
+
+    INTERVAL_SECONDS = 0.05
+
+    def __init__(self) -> None:  # noqa: D107
+        self.peak_bytes = 0
+        self._stop = Event()
+        self._thread = Thread(target=self._sample, daemon=True)
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def _current_bytes(self) -> int:
+        try:
+            with open("/proc/self/statm", encoding="ascii") as statm:
+                return int(statm.read().split()[1]) * self._page_size
+        except OSError:
+            # не linux: пик процесса целиком (на macos - в байтах)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.INTERVAL_SECONDS):
+            self.peak_bytes = max(self.peak_bytes, self._current_bytes())
+
+    def __enter__(self) -> "PeakRSS":  # noqa: D105
+        self.peak_bytes = self._current_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(  # noqa: D105
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._current_bytes())
+
+    @property
+    def peak_mb(self) -> float:  # noqa: D102
+        return self.peak_bytes / 2**20
+
+
+@inject
+async def tables_size_mb(
+    database_manager: DatabaseManager = Provide[Container.database_manager_rw],
+) -> float:
+    """Размер таблиц бота вместе с индексами, секциями и toast."""
+    async with database_manager.session() as session:
+        size = await session.scalar(text(TABLES_SIZE_SQL))
+    return int(size or 0) / 2**20
+
+
+@inject
+async def truncate_tables(
+    database_manager: DatabaseManager = Provide[Container.database_manager_rw],
+) -> None:
+    """Очищает таблицы перед прогоном."""
+    async with database_manager.session(commit=True) as session:
+        await session.execute(text("TRUNCATE videos, video_snapshots CASCADE"))
+
+
+async def run_variant(
+    variant: str, path_to_json: Path, bulk_size: int | None
+) -> LoaderResult:
+    """Загружает файл одним вариантом загрузчика и замеряет время."""
+    mode, use_staging, pipelined = VARIANTS[variant]
+    uploader = JsonToDatabaseUploader(
+        path_to_json=path_to_json,
+        bulk_size=bulk_size,
+        mode=mode,
+        use_staging=use_staging,
+    )
+
+    await truncate_tables()
+
+    rows = 0
+    write_seconds = 0.0
+
+    with PeakRSS() as rss:
+        started = perf_counter()
+        if pipelined:
+            # rss воркеров пула сюда не входит, см. workers rss
+            rows = await IngestionPipeline(
+                uploader, workers=os.cpu_count() or 1
+            ).run()
+        else:
+            for videos_batch, snapshots_batch in uploader.load_bulk_from_json():
+                rows += len(videos_batch) + len(snapshots_batch)
+                write_started = perf_counter()
+                await uploader.upload_bulk_to_database(
+                    videos_batch, snapshots_batch
+                )
+                write_seconds += perf_counter() - write_started
+        total_seconds = perf_counter() - started
+
+    return LoaderResult(
+        variant=variant,
+        bulk_size=uploader.bulk_size,
+        rows=rows,
+        total_seconds=total_seconds,
+        # запись в конвейере идет параллельно с разбором
+        write_seconds=write_seconds or total_seconds,
+        peak_rss_mb=rss.peak_mb,
+        tables_size_mb=await tables_size_mb(),
+    )
+
+
+@inject
+async def main(  # noqa: D103
+    args: Namespace,
+    database_manager: DatabaseManager = Provide[Container.database_manager_rw],
+) -> None:
+    if args.generate_videos:
+        videos, snapshots = write_dataset(
+            DatasetSpec(videos=args.generate_videos), args.path
+        )
+        print(f"generated {args.path}: {videos} videos, {snapshots} snapshots")
+
+    results: list[LoaderResult] = []
+    try:
+        for variant in args.variants:
+            results.append(
+                await run_variant(variant, args.path, args.bulk_size)
+            )
+    finally:
+        await database_manager.close()
+
+    print(
+        f"{'variant':<14}{'bulk':>8}{'rows':>12}"
+        f"{'seconds':>10}{'rows/s':>12}{'write rows/s':>14}"
+        f"{'peak rss, MB':>14}{'tables, MB':>12}"
+    )
+    for result in results:
+        print(
+            f"{result.variant:<14}{result.bulk_size:>8}{result.rows:>12}"
+            f"{result.total_seconds:>10.2f}{result.rows_per_second:>12.0f}"
+            f"{result.write_rows_per_second:>14.0f}"
+            f"{result.peak_rss_mb:>14.0f}{result.tables_size_mb:>12.0f}"
+        )
+
+    # ru_maxrss детей - пик самого большого завершенного воркера, в кб
+    workers_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if workers_rss:
+        print(f"workers rss: {workers_rss / 1024:.0f} MB")
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--path", type=Path, default=Path("demo/videos.json"))
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        choices=list(VARIANTS),
+        default=list(VARIANTS),
+    )
+    parser.add_argument("--bulk-size", type=int, default=None)
+    parser.add_argument(
+        "--generate-videos",
+        type=int,
+        default=None,
+        help="сгенерировать файл --path с таким числом видео",
+    )
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="подтверждение, что таблицы можно очищать",
+    )
+    args = parser.parse_args()
+    if not args.truncate:
+        parser.error("benchmark truncates tables, pass --truncate to confirm")
+    return args
+
+
+if __name__ == "__main__":
+    container = Container()
+    container.wire([__name__])
+
+    run(main(parse_args()))
@@ -0,0 +1,65 @@
+"""Время до готового sql: полный ответ против потока с ранним выходом.
+
+фейковая модель после sql продолжает писать --trailing-tokens токенов;
+в потоковом режиме сервис закрывает поток на `;`, и время до ответа
+зависит от длины sql, а не от длины всего ответа:
+
+    python -m src.benchmarks.streaming --trailing-tokens 300
+"""
+
+from argparse import ArgumentParser, Namespace
+from asyncio import run
+
+from aiohttp.test_utils import TestServer
+from src.benchmarks.fake_llm_server import LatencyProfile, create_app
+from src.benchmarks.hedging import LLMOverrides, print_results, run_variant
+
+VARIANTS: dict[str, LLMOverrides] = {
+    "full-response": {"hedge": False, "stream": False},
+    "stream": {"hedge": False, "stream": True},
+}
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=0)
+    parser.add_argument("--median", type=float, default=0.3)
+    parser.add_argument("--token-seconds", type=float, default=0.02)
+    parser.add_argument("--trailing-tokens", type=int, default=200)
+    return parser.parse_args()
+
+
+async def main() -> None:  # noqa: D103
+    args = parse_args()
+    app = create_app(
+        LatencyProfile(
+            median_seconds=args.median,
+            tail_probability=0.0,
+            token_seconds=args.token_seconds,
+            trailing_tokens=args.trailing_tokens,
+        )
+    )
+    server = TestServer(app)
+    await server.start_server()
+
+    try:
+        results = [
+            await run_variant(
+                variant,
+                overrides,
+                str(server.make_url("/v1")),
+                app["requests"],
+                args,
+            )
+            for variant, overrides in VARIANTS.items()
+        ]
+    finally:
+        await server.close()
+
+    print_results(results, args.calls)
+
+
+if __name__ == "__main__":
+    run(main())
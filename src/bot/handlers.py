@@ -1,25 +1,70 @@
+from contextlib import suppress
+from functools import partial
 import logging
+import time
 
 from aiogram import F, Router
+from aiogram.enums import ChatAction
+from aiogram.exceptions import TelegramAPIError
 from aiogram.types import Message
+from aiogram.utils.chat_action import ChatActionSender
 from dependency_injector.wiring import Provide, inject
+from src.bot.scheduler import QueryScheduler
 from src.container import Container
+from src.core import metrics
 from src.llm_service.text_to_sql import TextToSQLService
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+BUSY_REPLY = "Сейчас слишком много запросов, попробуйте через минуту."
+
+
+async def answer_query(  # noqa: D103
+    message: Message, llm_service: TextToSQLService, submitted_at: float
+) -> None:
+    if not message.text or message.bot is None:
+        return
+    metrics.STAGE_SECONDS.observe(
+        time.perf_counter() - submitted_at, stage="queue_wait"
+    )
+    try:
+        # "печатает..." повторяется, пока запрос выполняется
+        async with ChatActionSender.typing(
+            bot=message.bot, chat_id=message.chat.id
+        ):
+            result = await llm_service.process_query(message.text)
+        with metrics.STAGE_SECONDS.time(stage="telegram_send"):
+            await message.answer(str(result))
+    except Exception:
+        logger.exception("failed to process query: %s", message.text)
+    finally:
+        metrics.STAGE_SECONDS.observe(
+            time.perf_counter() - submitted_at, stage="handle"
+        )
+
 
 @router.message(F.text)
 @inject
 async def handle_query(  # noqa: D103
     message: Message,
     llm_service: TextToSQLService = Provide[Container.llm_service],
+    scheduler: QueryScheduler = Provide[Container.query_scheduler],
 ) -> None:
-    try:
-        if not message.text:
-            return
-        await message.answer(str(await llm_service.process_query(message.text)))
-    except Exception:
-        logger.exception(f"failed to process query: {message.text}")
+    if not message.text or message.bot is None:
+        return
+
+    key = message.from_user.id if message.from_user else message.chat.id
+    job = partial(answer_query, message, llm_service, time.perf_counter())
+    if not scheduler.submit(key, job):
+        metrics.BOT_REJECTED.inc()
+        logger.warning("query rejected, backlog is full: %s", message.text)
+        await message.answer(BUSY_REPLY)
+        return
+
+    # запрос может подождать в очереди, подтверждаем прием сразу
+    with suppress(TelegramAPIError):
+        await message.bot.send_chat_action(
+            chat_id=message.chat.id, action=ChatAction.TYPING
+        )
@@ -0,0 +1,104 @@
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+
+
+class QueryScheduler:
+    """Очередь запросов бота с общим лимитом параллельности.
+
+    у каждого пользователя своя FIFO-очередь, и его запросы выполняются
+    по одному, поэтому ответы приходят в порядке вопросов. воркеры берут
+    пользователей по кругу: один пользователь с пачкой вопросов не
+    задерживает остальных. очередь ограничена - при переполнении `submit`
+    возвращает False, и бот сразу отвечает, что занят
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        max_concurrency: int,
+        max_backlog: int,
+        max_queued_per_user: int,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_backlog = max_backlog
+        self.max_queued_per_user = max_queued_per_user
+
+        self._queues: dict[Hashable, deque[Job]] = {}
+        # пользователи с ожидающими запросами и без выполняемого
+        self._ready: deque[Hashable] = deque()
+        self._ready_count = asyncio.Semaphore(0)
+        self._active: set[Hashable] = set()
+        self._queued = 0
+        self._workers: list[asyncio.Task[None]] = []
+
+    @property
+    def queued(self) -> int:  # noqa: D102
+        return self._queued
+
+    @property
+    def running(self) -> int:  # noqa: D102
+        return len(self._active)
+
+    def submit(self, key: Hashable, job: Job) -> bool:
+        """Ставит запрос в очередь пользователя; False - очередь полна."""
+        queue = self._queues.setdefault(key, deque())
+        if (
+            self._queued >= self.max_backlog
+            or len(queue) >= self.max_queued_per_user
+        ):
+            if not queue and key not in self._active:
+                del self._queues[key]
+            return False
+
+        self._start_workers()
+        queue.append(job)
+        self._queued += 1
+        if len(queue) == 1 and key not in self._active:
+            self._mark_ready(key)
+        return True
+
+    def _mark_ready(self, key: Hashable) -> None:
+        self._ready.append(key)
+        self._ready_count.release()
+
+    def _start_workers(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"query-worker-{index}")
+            for index in range(self.max_concurrency)
+        ]
+
+    async def _work(self) -> None:
+        while True:
+            await self._ready_count.acquire()
+            key = self._ready.popleft()
+            queue = self._queues[key]
+            job = queue.popleft()
+            self._queued -= 1
+            self._active.add(key)
+
+            try:
+                await job()
+            except Exception:
+                logger.exception("query job failed for %r", key)
+            finally:
+                self._active.discard(key)
+                if queue:
+                    self._mark_ready(key)
+                else:
+                    del self._queues[key]
+
+    async def close(self) -> None:
+        """Останавливает воркеры; невыполненные запросы отбрасываются."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._queued:
+            logger.warning("dropped %s queued queries on close", self._queued)
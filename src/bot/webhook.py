@@ -0,0 +1,83 @@
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import (
+    SimpleRequestHandler,
+    setup_application,
+)
+from aiohttp import web
+from src.core.settings import BotSettings
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "/healthz"
+
+
+async def health(_: web.Request) -> web.Response:  # noqa: D103
+    return web.Response(text="ok")
+
+
+def create_webhook_app(
+    dispatcher: Dispatcher, bot: Bot, bot_settings: BotSettings
+) -> web.Application:
+    """Aiohttp-приложение, принимающее обновления telegram.
+
+    обновление подтверждается ответом 200 сразу, а обрабатывается в фоне:
+    telegram не ждет llm и не присылает обновление повторно по таймауту.
+    чужие запросы без секретного заголовка получают 401
+    """
+    app = web.Application()
+    secret = bot_settings.webhook_secret
+    SimpleRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=secret.get_secret_value() if secret else None,
+    ).register(app, path=bot_settings.webhook_path)
+    app.router.add_get(HEALTH_PATH, health)
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+async def register_webhook(
+    dispatcher: Dispatcher, bot: Bot, bot_settings: BotSettings
+) -> None:
+    """Регистрирует адрес webhook в telegram."""
+    if bot_settings.webhook_url is None:
+        raise ValueError("BOT_WEBHOOK_BASE_URL is required in webhook mode")
+
+    secret = bot_settings.webhook_secret
+    await bot.set_webhook(
+        url=bot_settings.webhook_url,
+        secret_token=secret.get_secret_value() if secret else None,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+        drop_pending_updates=True,
+    )
+    logger.info("webhook registered at %s", bot_settings.webhook_url)
+
+
+async def run_webhook(
+    dispatcher: Dispatcher, bot: Bot, bot_settings: BotSettings
+) -> None:
+    """Слушает webhook, пока задачу не отменят."""
+    if bot_settings.webhook_register:
+        await register_webhook(dispatcher, bot, bot_settings)
+
+    runner = web.AppRunner(create_webhook_app(dispatcher, bot, bot_settings))
+    await runner.setup()
+    site = web.TCPSite(
+        runner, host=bot_settings.webhook_host, port=bot_settings.webhook_port
+    )
+    await site.start()
+    logger.info(
+        "listening for updates on %s:%s%s",
+        bot_settings.webhook_host,
+        bot_settings.webhook_port,
+        bot_settings.webhook_path,
+    )
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,9 +1,16 @@
 from dependency_injector import containers, providers
+from src.bot.scheduler import QueryScheduler
 from src.core.settings import (
     BotSettings,
+    IngestSettings,
     LLMSettings,
+    LoggingSettings,
+    MetricsSettings,
+    PlanCacheSettings,
     PostgresSettingsRO,
     PostgresSettingsRW,
+    QueryGuardSettings,
+    QueryLogSettings,
 )
 from src.database.manager import DatabaseManager
 from src.llm_service.text_to_sql import TextToSQLService
@@ -16,6 +23,24 @@ class Container(containers.DeclarativeContainer):  # noqa: D101
     llm_settings: providers.Provider[LLMSettings] = (
         providers.ThreadSafeSingleton(LLMSettings)
     )
+    logging_settings: providers.Provider[LoggingSettings] = (
+        providers.ThreadSafeSingleton(LoggingSettings)
+    )
+    metrics_settings: providers.Provider[MetricsSettings] = (
+        providers.ThreadSafeSingleton(MetricsSettings)
+    )
+    plan_cache_settings: providers.Provider[PlanCacheSettings] = (
+        providers.ThreadSafeSingleton(PlanCacheSettings)
+    )
+    query_guard_settings: providers.Provider[QueryGuardSettings] = (
+        providers.ThreadSafeSingleton(QueryGuardSettings)
+    )
+    query_log_settings: providers.Provider[QueryLogSettings] = (
+        providers.ThreadSafeSingleton(QueryLogSettings)
+    )
+    ingest_settings: providers.Provider[IngestSettings] = (
+        providers.ThreadSafeSingleton(IngestSettings)
+    )
     postgres_settings_rw: providers.Provider[PostgresSettingsRW] = (
         providers.ThreadSafeSingleton(PostgresSettingsRW)
     )
@@ -38,8 +63,11 @@ class Container(containers.DeclarativeContainer):  # noqa: D101
         providers.ThreadSafeSingleton(
             DatabaseManager,
             db_url=postgres_settings_ro.provided.sqlalchemy_url,
-            pool_size=10,
-            max_overflow=20,
+            # бот читает через пул asyncpg (`read`), движок sqlalchemy
+            # остается для скриптов
+            read_pool_max_size=20,
+            pool_size=2,
+            max_overflow=8,
             pool_recycle=3600,
         )
     )
@@ -47,5 +75,15 @@ class Container(containers.DeclarativeContainer):  # noqa: D101
     llm_service: providers.Provider[TextToSQLService] = providers.Singleton(
         TextToSQLService,
         llm_settings=llm_settings,
-        db_manager=database_manager_ro
+        db_manager=database_manager_ro,
+        plan_cache_settings=plan_cache_settings,
+        query_log_settings=query_log_settings,
+        query_guard_settings=query_guard_settings,
+    )
+
+    query_scheduler: providers.Provider[QueryScheduler] = providers.Singleton(
+        QueryScheduler,
+        max_concurrency=bot_settings.provided.max_concurrency,
+        max_backlog=bot_settings.provided.max_backlog,
+        max_queued_per_user=bot_settings.provided.max_queued_per_user,
     )
@@ -0,0 +1,70 @@
+from collections.abc import Generator
+import json
+import logging
+from pathlib import Path
+from queue import SimpleQueue
+from threading import Thread
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class JsonlWriter:
+    """Дописывает записи в jsonl-файл из фонового потока.
+
+    `write` только кладет запись в очередь и не блокирует event loop
+    диском. значения, которые json не умеет (uuid, даты), пишутся строками
+    """
+
+    def __init__(self, path: Path) -> None:  # noqa: D107
+        self.path = path
+        self._queue: SimpleQueue[Any] = SimpleQueue()
+        self._thread: Thread | None = None
+
+    def _run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                record = self._queue.get()
+                if record is _STOP:
+                    return
+
+                try:
+                    file.write(
+                        json.dumps(record, ensure_ascii=False, default=str)
+                    )
+                    file.write("\n")
+                    if self._queue.empty():
+                        file.flush()
+                except (OSError, TypeError, ValueError) as write_error:
+                    logger.warning(
+                        "failed to write %s: %s", self.path, write_error
+                    )
+
+    def write(self, record: dict[str, Any]) -> None:  # noqa: D102
+        if self._thread is None:
+            self._thread = Thread(
+                target=self._run, name=f"jsonl:{self.path.name}", daemon=True
+            )
+            self._thread.start()
+        self._queue.put(record)
+
+    def close(self) -> None:
+        """Дописывает очередь и останавливает поток."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+
+def read_jsonl(path: Path) -> Generator[dict[str, Any]]:
+    """Читает записи, пропуская битые строки (например, оборванную)."""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
@@ -0,0 +1,75 @@
+"""Логирование без записи в поток вывода из event loop.
+
+корневой логгер кладет записи в ограниченную очередь, а пишет их
+QueueListener в своем потоке: медленный stderr или диск не останавливает
+обработку запросов. при переполнении очереди запись отбрасывается и
+считается в метриках. debug-записи можно прореживать
+"""
+
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+import random
+import sys
+
+from src.core import metrics
+from src.core.settings import LoggingSettings
+
+LOG_RECORDS_DROPPED = metrics.Counter(
+    "text_to_sql_log_records_dropped_total",
+    "Log records dropped because the logging queue was full.",
+)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю `rate` записей уровня DEBUG и ниже."""
+
+    def __init__(self, rate: float) -> None:  # noqa: D107
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:  # noqa: D102
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Не ждет места в очереди: лишняя запись теряется, а не блокирует."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:  # noqa: D102
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class LogListener(QueueListener):
+    """При остановке ждет места в очереди под маркер конца."""
+
+    def enqueue_sentinel(self) -> None:  # noqa: D102
+        self.queue.put(self._sentinel)  # type: ignore[attr-defined]
+
+
+def setup_logging(settings: LoggingSettings) -> LogListener:
+    """Настраивает корневой логгер и запускает поток записи.
+
+    при остановке процесса нужен `listener.stop()`, чтобы дописать очередь
+    """
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter(settings.format))
+
+    queue: Queue[logging.LogRecord] = Queue(settings.queue_size)
+    queue_handler = DroppingQueueHandler(queue)
+    if settings.debug_sample_rate < 1:
+        queue_handler.addFilter(SamplingFilter(settings.debug_sample_rate))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.level.upper())
+    for name, level in settings.levels.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    listener = LogListener(queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,261 @@
+"""Метрики процесса в текстовом формате prometheus.
+
+без внешних зависимостей: счетчики, гистограммы и gauge с лейблами
+живут в словарях и обновляются из event loop без блокировок. endpoint
+отдает их на GET /metrics:
+
+    curl localhost:9100/metrics
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable, Generator, Iterable
+from contextlib import contextmanager
+import logging
+import time
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LabelValues = tuple[str, ...]
+
+# секунды: от проверки sql до хвоста llm
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"'
+        for name, value in zip(names, values, strict=True)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric(ABC):  # noqa: D101
+    kind = "untyped"
+
+    def __init__(  # noqa: D107
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as missing:
+            raise ValueError(f"{self.name}: missing label {missing}") from None
+
+    @abstractmethod
+    def samples(self) -> Generator[str]:
+        """Строки значений без HELP и TYPE."""
+
+    def render(self) -> str:  # noqa: D102
+        return "\n".join(
+            (
+                f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.kind}",
+                *self.samples(),
+            )
+        )
+
+
+class Counter(Metric):  # noqa: D101
+    kind = "counter"
+
+    def __init__(  # noqa: D107
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:  # noqa: D102
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Generator[str]:  # noqa: D102
+        for key, value in self._values.items():
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """Значение, которое считается функцией в момент запроса метрик."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str) -> None:  # noqa: D107
+        super().__init__(name, documentation)
+        self._function: Callable[[], float] | None = None
+
+    def set_function(self, function: Callable[[], float]) -> None:  # noqa: D102
+        self._function = function
+
+    def samples(self) -> Generator[str]:  # noqa: D102
+        if self._function is None:
+            return
+        try:
+            value = self._function()
+        except Exception as gauge_error:
+            logger.warning("gauge %s failed: %s", self.name, gauge_error)
+            return
+        yield f"{self.name} {_format_value(value)}"
+
+
+class Histogram(Metric):  # noqa: D101
+    kind = "histogram"
+
+    def __init__(  # noqa: D107
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # по лейблам: попадания в каждую корзину (последняя - +Inf) и сумма
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:  # noqa: D102
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Generator[None]:
+        """Замеряет блок, в том числе завершившийся исключением."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Generator[str]:  # noqa: D102
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(
+                (*map(_format_value, self.buckets), "+Inf"),
+                counts,
+                strict=True,
+            ):
+                cumulative += count
+                labels = _format_labels((*self.labelnames, "le"), (*key, bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {self._sums[key]!r}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:  # noqa: D101
+    def __init__(self) -> None:  # noqa: D107
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:  # noqa: D102
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:  # noqa: D102
+        return (
+            "\n\n".join(metric.render() for metric in self._metrics.values())
+            + "\n"
+        )
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    "text_to_sql_stage_seconds",
+    "Duration of a request processing stage.",
+    ("stage",),
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "text_to_sql_llm_request_seconds",
+    "Time until the SQL of a single LLM request, by model.",
+    ("model",),
+)
+QUERIES = Counter(
+    "text_to_sql_queries_total",
+    "User questions by the path that answered them.",
+    ("source",),
+)
+ATTEMPTS = Counter(
+    "text_to_sql_attempts_total",
+    "LLM generation attempts by kind.",
+    ("kind",),
+)
+FAILURES = Counter(
+    "text_to_sql_failures_total",
+    "Failed attempts by exception type.",
+    ("reason",),
+)
+LLM_TOKENS = Counter(
+    "text_to_sql_llm_tokens_total",
+    "LLM tokens by kind; cached tokens are part of prompt.",
+    ("kind",),
+)
+BOT_REJECTED = Counter(
+    "text_to_sql_bot_rejected_total",
+    "Questions rejected because the scheduler backlog was full.",
+)
+SCHEDULER_QUEUED = Gauge(
+    "text_to_sql_scheduler_queued", "Questions waiting in the scheduler."
+)
+SCHEDULER_RUNNING = Gauge(
+    "text_to_sql_scheduler_running", "Questions being processed."
+)
+READ_POOL_SIZE = Gauge(
+    "text_to_sql_read_pool_size", "Open connections in the read pool."
+)
+READ_POOL_IDLE = Gauge(
+    "text_to_sql_read_pool_idle", "Idle connections in the read pool."
+)
+
+
+async def metrics_handler(_: web.Request) -> web.Response:  # noqa: D103
+    return web.Response(
+        text=REGISTRY.render(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Поднимает GET /metrics; остановка - `await runner.cleanup()`."""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info("metrics on http://%s:%s/metrics", host, port)
+    return runner
@@ -1,6 +1,7 @@
 from pathlib import Path
+from typing import Literal, Self
 
-from pydantic import SecretStr
+from pydantic import SecretStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy import URL
 
@@ -17,6 +18,75 @@ class BotSettings(BaseSettings):  # noqa: D101
     )
     token: SecretStr = SecretStr("bot_token")
 
+    # одновременно выполняемые запросы; держать ниже пула чтения бд
+    max_concurrency: int = 8
+    # ожидающие запросы сверх выполняемых; при переполнении бот отвечает,
+    # что занят
+    max_backlog: int = 100
+    max_queued_per_user: int = 3
+
+    # webhook - telegram сам присылает обновления в aiohttp-приложение;
+    # за балансировщиком можно держать несколько экземпляров бота
+    mode: Literal["polling", "webhook"] = "polling"
+    # публичный адрес за балансировщиком, например https://bot.example.com
+    webhook_base_url: str | None = None
+    webhook_path: str = "/telegram/webhook"
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_secret: SecretStr | None = None
+    # регистрировать webhook в telegram при старте; достаточно одного
+    # экземпляра из нескольких
+    webhook_register: bool = True
+
+    @model_validator(mode="after")
+    def _require_webhook_secret(self) -> Self:
+        # без секрета обновления может прислать кто угодно
+        if self.mode == "webhook" and self.webhook_secret is None:
+            raise ValueError("BOT_WEBHOOK_SECRET is required in webhook mode")
+        return self
+
+    @property
+    def webhook_url(self) -> str | None:  # noqa: D102
+        if self.webhook_base_url is None:
+            return None
+        return self.webhook_base_url.rstrip("/") + self.webhook_path
+
+
+class LoggingSettings(BaseSettings):  # noqa: D101
+    model_config = SettingsConfigDict(
+        env_file=env_path,
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        env_prefix="LOG_",
+        extra="ignore",
+    )
+
+    level: str = "INFO"
+    # уровни отдельных логгеров, json: {"src.llm_service": "DEBUG"};
+    # aiogram пишет info на каждое обновление
+    levels: dict[str, str] = {"aiogram.event": "WARNING"}
+    # доля debug-записей, которые попадают в лог; 1 - все
+    debug_sample_rate: float = 0.1
+    # записи сверх очереди отбрасываются, а не тормозят event loop
+    queue_size: int = 10_000
+    format: str = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+
+
+class MetricsSettings(BaseSettings):  # noqa: D101
+    model_config = SettingsConfigDict(
+        env_file=env_path,
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        env_prefix="METRICS_",
+        extra="ignore",
+    )
+
+    # GET /metrics в текстовом формате prometheus
+    enabled: bool = True
+    # 0.0.0.0 - чтобы prometheus мог забирать метрики из контейнера
+    host: str = "127.0.0.1"
+    port: int = 9100
+
 
 class PostgresSettingsRW(BaseSettings):  # noqa: D101
     model_config = SettingsConfigDict(
@@ -92,3 +162,128 @@ class LLMSettings(BaseSettings):  # noqa: D101
 
     api_key: SecretStr = SecretStr("your_openrouter_api_key")
     model: str = "your_openrouter_model_name"
+    base_url: str = "https://openrouter.ai/api/v1"
+    # None - без таймаута
+    timeout_seconds: float | None = 60.0
+    # читать ответ потоком и закрывать его, как только sql закончился
+    stream: bool = True
+    # больше 1 - первая попытка просит столько вариантов sql параллельно
+    # (модели по кругу) и выполняет от самого дешевого по explain;
+    # последовательные исправления по ошибке остаются запасным путем
+    candidates: int = 1
+    # сколько ждать остальных вариантов после первого валидного
+    candidates_grace_seconds: float = 1.5
+    # токены на один вопрос пользователя со всеми повторами и хеджами;
+    # None - без ограничения
+    token_budget: int | None = 40_000
+    # явная точка кэша промпта (cache_control) для anthropic и gemini;
+    # openai и deepseek кэшируют одинаковый префикс сами
+    prompt_cache_control: bool = False
+
+    # если ответа нет дольше перцентиля задержек модели, параллельно
+    # уходит повторный запрос, берется первый валидный sql
+    hedge: bool = True
+    max_hedges: int = 1
+    # модели для повторных запросов по кругу; пусто - та же модель,
+    # json-список: ["google/gemini-2.0-flash-exp:free"]
+    fallback_models: list[str] = []
+    hedge_percentile: float = 0.9
+    # задержка, пока замеров модели меньше hedge_min_samples
+    hedge_delay_seconds: float = 8.0
+    hedge_min_samples: int = 20
+    hedge_min_delay_seconds: float = 1.0
+
+
+class PlanCacheSettings(BaseSettings):  # noqa: D101
+    model_config = SettingsConfigDict(
+        env_file=env_path,
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        env_prefix="PLAN_CACHE_",
+        extra="ignore",
+    )
+
+    enabled: bool = True
+    templates_enabled: bool = True
+    max_size: int = 1024
+    ttl_seconds: float = 24 * 60 * 60
+    dir: Path = Path.home() / ".cache" / "text_to_sql"
+
+
+class QueryGuardSettings(BaseSettings):  # noqa: D101
+    model_config = SettingsConfigDict(
+        env_file=env_path,
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        env_prefix="QUERY_GUARD_",
+        extra="ignore",
+    )
+
+    enabled: bool = True
+    # локальная проверка имен и формы запроса по метаданным моделей
+    precheck: bool = True
+    # единицы стоимости планировщика postgres (seq_page_cost = 1)
+    max_cost: float = 2_000_000
+    # оценка строк на любом узле плана, ловит декартовы произведения
+    max_rows: float = 50_000_000
+    statement_timeout_ms: int = 30_000
+
+
+class QueryLogSettings(BaseSettings):  # noqa: D101
+    model_config = SettingsConfigDict(
+        env_file=env_path,
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        env_prefix="QUERY_LOG_",
+        extra="ignore",
+    )
+
+    # выполненные ботом запросы с временем - вход для index_advisor
+    enabled: bool = True
+    path: Path = Path.home() / ".cache" / "text_to_sql" / "query_log.jsonl"
+
+    # вопросы пользователей с попытками, ошибками, временем этапов и
+    # итогом - вход для replay_journal
+    journal_enabled: bool = True
+    journal_path: Path = (
+        Path.home() / ".cache" / "text_to_sql" / "query_journal.jsonl"
+    )
+
+
+class IngestSettings(BaseSettings):  # noqa: D101
+    model_config = SettingsConfigDict(
+        env_file=env_path,
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        env_prefix="INGEST_",
+        extra="ignore",
+    )
+
+    path_to_json: Path = Path("demo/videos.json")
+    mode: Literal["orm", "copy"] = "copy"
+    # None - размер пачки по умолчанию для выбранного режима
+    bulk_size: int | None = None
+    use_staging: bool = False
+    # повторная загрузка обновляет строки вместо ошибки по первичному ключу
+    upsert: bool = True
+    # None - рядом с json-файлом, `<имя>.checkpoint.json`
+    checkpoint_path: Path | None = None
+    resume: bool = True
+
+    # 0 - последовательная загрузка без пула процессов,
+    # None - по числу ядер
+    workers: int | None = None
+    writers: int = 4
+    queue_depth: int = 8
+
+    # снять вторичные индексы на время загрузки и построить их заново
+    defer_indexes: bool = False
+    index_build_parallelism: int = 4
+    maintenance_work_mem: str = "512MB"
+
+    # часовые/дневные суммы приростов для бота; при defer_indexes
+    # пересчитываются целиком один раз после загрузки
+    rollups: bool = True
+
+    # сколько месячных секций video_snapshots создавать впрок
+    partition_months_ahead: int = 1
@@ -1,27 +1,109 @@
 # https://python-dependency-injector.ets-labs.org/examples/fastapi-sqlalchemy.html
 
+import asyncio
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from functools import lru_cache
+import re
+import time
+from typing import Any
 
+import asyncpg  # type: ignore
+from sqlalchemy import URL, make_url
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from src.core import metrics
+
+# литералы, идентификаторы в кавычках, комментарии и `::` пропускаются,
+# `:name` становится позиционным `$n`
+_BIND_RE = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|::"
+    r"|(?<![:\w]):(?P<name>[A-Za-z_]\w*)",
+    re.DOTALL,
+)
+
+_CONNECTION_ERRORS = (
+    OSError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+)
+
+
+@lru_cache(maxsize=1024)
+def to_positional(sql_query: str) -> tuple[str, tuple[str, ...]]:
+    """`:name`-параметры sqlalchemy в `$n` asyncpg: (sql, порядок имен)."""
+    names: list[str] = []
+
+    def replace(match: re.Match[str]) -> str:
+        name = match["name"]
+        if name is None:
+            return match.group()
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _BIND_RE.sub(replace, sql_query), tuple(names)
+
+
+class ReadConnection:
+    """Соединение пула asyncpg для чтения без sqlalchemy.
+
+    запросы принимают `:name`-параметры, как `text()`. asyncpg готовит
+    именованные prepared statements и кэширует их на соединении по
+    тексту запроса: у шаблонов с bind-параметрами текст не меняется,
+    поэтому повторный запрос не проходит parse/plan на сервере
+    """
+
+    __slots__ = ("connection",)
+
+    def __init__(self, connection: asyncpg.Connection) -> None:  # noqa: D107
+        self.connection = connection
+
+    @staticmethod
+    def _bind(
+        sql_query: str, params: dict[str, Any] | None
+    ) -> tuple[str, list[Any]]:
+        positional, names = to_positional(sql_query)
+        params = params or {}
+        missing = [name for name in names if name not in params]
+        if missing:
+            raise ValueError(f"missing bind parameters: {', '.join(missing)}")
+        return positional, [params[name] for name in names]
+
+    async def fetchrow(  # noqa: D102
+        self, sql_query: str, params: dict[str, Any] | None = None
+    ) -> asyncpg.Record | None:
+        positional, args = self._bind(sql_query, params)
+        return await self.connection.fetchrow(positional, *args)
+
+    async def fetchval(  # noqa: D102
+        self, sql_query: str, params: dict[str, Any] | None = None
+    ) -> Any:
+        positional, args = self._bind(sql_query, params)
+        return await self.connection.fetchval(positional, *args)
 
 
 class DatabaseManager:  # noqa: D101
     def __init__(  # noqa: D107
         self,
-        db_url: str,
+        db_url: str | URL,
         echo: bool = False,
+        pool_pre_ping: bool = True,
+        read_pool_max_size: int = 10,
+        statement_cache_size: int = 256,
+        ping_idle_after: float = 30.0,
+        max_idle_lifetime: float = 300.0,
         **engine_kwargs: dict[str, str | int],
     ) -> None:
+        self._url = make_url(db_url)
         self._engine: AsyncEngine = create_async_engine(
             db_url,
             echo=echo,
-            pool_pre_ping=True,
+            pool_pre_ping=pool_pre_ping,
             **engine_kwargs,
         )
 
@@ -35,7 +117,20 @@ class DatabaseManager:  # noqa: D101
             )
         )
 
+        self.read_pool_max_size = read_pool_max_size
+        self.statement_cache_size = statement_cache_size
+        self.ping_idle_after = ping_idle_after
+        self.max_idle_lifetime = max_idle_lifetime
+
+        self._read_pool: asyncpg.Pool | None = None
+        self._read_pool_lock = asyncio.Lock()
+        # pid серверного процесса -> момент возврата соединения в пул
+        self._released_at: dict[int, float] = {}
+
     async def close(self) -> None:  # noqa: D102
+        if self._read_pool is not None:
+            await self._read_pool.close()
+            self._read_pool = None
         await self._engine.dispose()
 
     @asynccontextmanager
@@ -44,12 +139,102 @@ class DatabaseManager:  # noqa: D101
     ) -> AsyncGenerator[AsyncSession]:
         session: AsyncSession = self._session_factory()
 
+        with metrics.STAGE_SECONDS.time(stage="db_session"):
+            try:
+                yield session
+                if commit:
+                    await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                await session.close()
+
+    async def _get_read_pool(self) -> asyncpg.Pool:
+        if self._read_pool is not None:
+            return self._read_pool
+
+        async with self._read_pool_lock:
+            if self._read_pool is None:
+                self._read_pool = await asyncpg.create_pool(
+                    user=self._url.username,
+                    password=self._url.password,
+                    host=self._url.host,
+                    port=self._url.port,
+                    database=self._url.database,
+                    min_size=1,
+                    max_size=self.read_pool_max_size,
+                    statement_cache_size=self.statement_cache_size,
+                    # простаивающие соединения закрываются, а не пингуются
+                    max_inactive_connection_lifetime=self.max_idle_lifetime,
+                )
+        return self._read_pool
+
+    async def _ping_if_idle(self, connection: asyncpg.Connection) -> None:
+        """Пингует соединение, если оно долго простаивало в пуле.
+
+        только что использованное соединение почти наверняка живо, поэтому
+        в отличие от pool_pre_ping лишнего round trip на горячем пути нет.
+        отметка о возврате снимается здесь: `read` ставит ее заново
+        """
+        released_at = self._released_at.pop(connection.get_server_pid(), None)
+        if (
+            released_at is not None
+            and time.monotonic() - released_at >= self.ping_idle_after
+        ):
+            await connection.execute("SELECT 1")
+
+    async def _acquire(self, pool: asyncpg.Pool) -> asyncpg.Connection:
+        """Соединение из пула, проверенное пингом или только что открытое.
+
+        после рестарта базы мертвыми могут оказаться все простаивающие
+        соединения: каждое упавшее закрывается, и пул открывает новое,
+        поэтому попыток на одну больше размера пула
+        """
+        last_error: BaseException | None = None
+        for _ in range(self.read_pool_max_size + 1):
+            connection = await pool.acquire()
+            try:
+                await self._ping_if_idle(connection)
+            except _CONNECTION_ERRORS as ping_error:
+                last_error = ping_error
+                connection.terminate()
+                await pool.release(connection)
+                continue
+            return connection
+
+        raise ConnectionError(
+            "no live connection in the read pool"
+        ) from last_error
+
+    @asynccontextmanager
+    async def read(self) -> AsyncGenerator[ReadConnection]:
+        """Readonly-транзакция на пуле asyncpg в обход sqlalchemy."""
+        with metrics.STAGE_SECONDS.time(stage="pool_checkout"):
+            pool = await self._get_read_pool()
+            connection = await self._acquire(pool)
         try:
-            yield session
-            if commit:
-                await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
+            async with connection.transaction(readonly=True):
+                yield ReadConnection(connection)
         finally:
-            await session.close()
+            if not connection.is_closed():
+                self._released_at[connection.get_server_pid()] = (
+                    time.monotonic()
+                )
+            await pool.release(connection)
+            self._forget_stale_connections()
+
+    def read_pool_stats(self) -> tuple[int, int]:
+        """Открытые и простаивающие соединения пула чтения."""
+        if self._read_pool is None:
+            return 0, 0
+        return self._read_pool.get_size(), self._read_pool.get_idle_size()
+
+    def _forget_stale_connections(self) -> None:
+        if len(self._released_at) <= 4 * self.read_pool_max_size:
+            return
+        # соединения, простоявшие дольше max_idle_lifetime, пул уже закрыл
+        deadline = time.monotonic() - self.max_idle_lifetime
+        for pid, released_at in list(self._released_at.items()):
+            if released_at < deadline:
+                del self._released_at[pid]
@@ -1,4 +1,17 @@
+from src.database.models.snapshot_rollups import (
+    CreatorSnapshotsDaily,
+    CreatorSnapshotsHourly,
+    VideoSnapshotsDaily,
+    VideoSnapshotsHourly,
+)
 from src.database.models.video_snapshots import VideoSnapshots
 from src.database.models.videos import Videos
 
-__all__ = ["VideoSnapshots", "Videos"]
+__all__ = [
+    "CreatorSnapshotsDaily",
+    "CreatorSnapshotsHourly",
+    "VideoSnapshots",
+    "VideoSnapshotsDaily",
+    "VideoSnapshotsHourly",
+    "Videos",
+]
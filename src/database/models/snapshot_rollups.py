@@ -0,0 +1,135 @@
+from datetime import date, datetime
+from uuid import UUID as PyUUID
+
+from sqlalchemy import BigInteger, Date, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID as PgUUID
+from sqlalchemy.orm import Mapped, mapped_column
+from src.database.models.base import Base
+
+
+class SnapshotDeltaSums:
+    """Суммы приростов из video_snapshots за интервал."""
+
+    delta_views_count: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+    )
+
+    delta_likes_count: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+    )
+
+    delta_comments_count: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+    )
+
+    delta_reports_count: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+    )
+
+    snapshots_count: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+    )
+
+
+class VideoSnapshotsHourly(SnapshotDeltaSums, Base):  # noqa: D101
+    __tablename__ = "video_snapshots_hourly"
+
+    video_id: Mapped[PyUUID] = mapped_column(
+        PgUUID(as_uuid=True),
+        ForeignKey("videos.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    hour_start: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+    )
+
+    creator_id: Mapped[PyUUID] = mapped_column(
+        PgUUID(as_uuid=True),
+        nullable=False,
+    )
+
+    __table_args__ = (
+        Index("idx_video_snapshots_hourly_hour", "hour_start"),
+        Index("idx_video_snapshots_hourly_creator", "creator_id", "hour_start"),
+    )
+
+
+class VideoSnapshotsDaily(SnapshotDeltaSums, Base):  # noqa: D101
+    __tablename__ = "video_snapshots_daily"
+
+    video_id: Mapped[PyUUID] = mapped_column(
+        PgUUID(as_uuid=True),
+        ForeignKey("videos.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    day: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+    )
+
+    creator_id: Mapped[PyUUID] = mapped_column(
+        PgUUID(as_uuid=True),
+        nullable=False,
+    )
+
+    __table_args__ = (
+        Index("idx_video_snapshots_daily_day", "day"),
+        Index("idx_video_snapshots_daily_creator", "creator_id", "day"),
+    )
+
+
+class CreatorSnapshotsHourly(SnapshotDeltaSums, Base):  # noqa: D101
+    __tablename__ = "creator_snapshots_hourly"
+
+    creator_id: Mapped[PyUUID] = mapped_column(
+        PgUUID(as_uuid=True),
+        primary_key=True,
+    )
+
+    hour_start: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+    )
+
+    videos_count: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+    )
+
+    __table_args__ = (Index("idx_creator_snapshots_hourly_hour", "hour_start"),)
+
+
+class CreatorSnapshotsDaily(SnapshotDeltaSums, Base):  # noqa: D101
+    __tablename__ = "creator_snapshots_daily"
+
+    creator_id: Mapped[PyUUID] = mapped_column(
+        PgUUID(as_uuid=True),
+        primary_key=True,
+    )
+
+    day: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+    )
+
+    videos_count: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        default=0,
+    )
+
+    __table_args__ = (Index("idx_creator_snapshots_daily_day", "day"),)
@@ -76,8 +76,11 @@ class VideoSnapshots(Base):  # noqa: D101
         default=0,
     )
 
+    # ключ секционирования входит в первичный ключ: postgres требует этого
+    # от уникальных индексов секционированной таблицы
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         nullable=False,
         index=True,
     )
@@ -97,4 +100,6 @@ class VideoSnapshots(Base):  # noqa: D101
 
     __table_args__ = (
         Index("idx_snapshots_date_video", "created_at", "video_id"),
+        # месячные секции создает src.scripts.snapshot_partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
@@ -1,15 +1,91 @@
 from asyncio import run
-from pathlib import Path
+import os
 
+from dependency_injector.wiring import Provide, inject
 from src.container import Container
+from src.core.settings import IngestSettings
+from src.database.manager import DatabaseManager
+from src.database.models import Videos, VideoSnapshots
+from src.scripts.deferred_indexes import DeferredIndexes
+from src.scripts.ingest_checkpoint import IngestCheckpoint
+from src.scripts.ingestion_pipeline import IngestionPipeline
 from src.scripts.json_to_database import JsonToDatabaseUploader
+from src.scripts.snapshot_rollups import rebuild_rollups
 
 
-async def load_json_to_database() -> None:  # noqa: D103
-    uploader = JsonToDatabaseUploader(path_to_json=Path("demo/videos.json"))
+async def upload(  # noqa: D103
+    settings: IngestSettings,
+    uploader: JsonToDatabaseUploader,
+    checkpoint: IngestCheckpoint,
+) -> None:
+    workers = (
+        settings.workers if settings.workers is not None else os.cpu_count()
+    )
 
-    for videos_batch, snapshots_batch in uploader.load_bulk_from_json():
+    if workers:
+        await IngestionPipeline(
+            uploader,
+            workers=workers,
+            writers=settings.writers,
+            queue_depth=settings.queue_depth,
+            checkpoint=checkpoint,
+        ).run()
+        return
+
+    batches = uploader.load_bulk_from_json(skip_items=checkpoint.load())
+    for sequence, (videos_batch, snapshots_batch) in enumerate(batches):
         await uploader.upload_bulk_to_database(videos_batch, snapshots_batch)
+        checkpoint.mark_committed(sequence, len(videos_batch))
+
+    checkpoint.complete()
+
+
+@inject
+async def load_json_to_database(  # noqa: D103
+    settings: IngestSettings = Provide[Container.ingest_settings],
+    database_manager: DatabaseManager = Provide[Container.database_manager_rw],
+) -> None:
+    uploader = JsonToDatabaseUploader(
+        path_to_json=settings.path_to_json,
+        bulk_size=settings.bulk_size,
+        mode=settings.mode,
+        use_staging=settings.use_staging,
+        upsert=settings.upsert,
+        # без индексов построчный пересчет медленный, суммы строятся
+        # одним проходом после загрузки
+        maintain_rollups=settings.rollups and not settings.defer_indexes,
+        partition_months_ahead=settings.partition_months_ahead,
+    )
+
+    checkpoint = IngestCheckpoint(
+        path_to_json=settings.path_to_json,
+        path=settings.checkpoint_path
+        or settings.path_to_json.with_suffix(".checkpoint.json"),
+    )
+    if not settings.resume:
+        checkpoint.complete()
+
+    if not settings.defer_indexes:
+        await upload(settings, uploader, checkpoint)
+        return
+
+    deferred_indexes = DeferredIndexes(
+        database_manager,
+        tables=(Videos.__tablename__, VideoSnapshots.__tablename__),
+        record_path=checkpoint.path.with_suffix(".indexes.json"),
+        parallelism=settings.index_build_parallelism,
+        maintenance_work_mem=settings.maintenance_work_mem,
+    )
+    await deferred_indexes.drop()
+    try:
+        await upload(settings, uploader, checkpoint)
+    finally:
+        # индексы нужны боту даже если загрузка упала
+        await deferred_indexes.rebuild()
+
+        if settings.rollups:
+            async with database_manager.session(commit=True) as session:
+                await rebuild_rollups(session)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Sequence
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyStats:
+    """Скользящее окно последних задержек ответа по моделям.
+
+    для отмененного запроса в окно пишется время до отмены - нижняя
+    граница задержки (цензурированный замер)
+    """
+
+    def __init__(self, window: int = 256) -> None:  # noqa: D107
+        self.window = window
+        self._samples: dict[str, deque[float]] = {}
+
+    def observe(self, model: str, seconds: float) -> None:  # noqa: D102
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def count(self, model: str) -> int:  # noqa: D102
+        return len(self._samples.get(model, ()))
+
+    def percentile(self, model: str, quantile: float) -> float | None:
+        """Перцентиль по nearest-rank; None, пока замеров нет."""
+        samples = self._samples.get(model)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        rank = max(math.ceil(quantile * len(ordered)) - 1, 0)
+        return ordered[min(rank, len(ordered) - 1)]
+
+
+async def race[T](
+    calls: Sequence[Callable[[], Awaitable[T]]],
+    hedge_after: Callable[[int], float],
+    accept: Callable[[T], bool] = lambda _: True,
+) -> T:
+    """Первый подходящий результат из нескольких запусков одной работы.
+
+    `calls[0]` стартует сразу, следующий - если за `hedge_after(i)` секунд
+    после запуска предыдущего нет подходящего ответа, или сразу, если
+    предыдущий упал или вернул неподходящий. остальные запуски
+    отменяются. если подходящего нет, возвращается первый завершившийся
+    результат, а если все упали - первая ошибка
+    """
+    tasks: set[asyncio.Task[T]] = set()
+    rejected: list[T] = []
+    errors: list[BaseException] = []
+    launched = 0
+
+    try:
+        while True:
+            if launched < len(calls):
+                if launched:
+                    logger.debug("hedging with call %s", launched + 1)
+                tasks.add(asyncio.ensure_future(calls[launched]()))
+                launched += 1
+
+            done, tasks = await asyncio.wait(
+                tasks,
+                timeout=(
+                    hedge_after(launched) if launched < len(calls) else None
+                ),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                error = task.exception()
+                if error is not None:
+                    errors.append(error)
+                elif accept(task.result()):
+                    return task.result()
+                else:
+                    rejected.append(task.result())
+
+            if not tasks and launched == len(calls):
+                if rejected:
+                    return rejected[0]
+                raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def gather_within[T](
+    calls: Sequence[Callable[[], Awaitable[T]]],
+    accept: Callable[[T], bool],
+    grace_seconds: float,
+) -> tuple[list[T], list[T], list[BaseException]]:
+    """Запускает все вызовы сразу и собирает результаты.
+
+    после первого подходящего результата остальные ждут не дольше
+    `grace_seconds` и отменяются: медленный вызов не задерживает ответ.
+    возвращает подходящие и неподходящие результаты в порядке прихода
+    и ошибки
+    """
+    loop = asyncio.get_running_loop()
+    pending = {asyncio.ensure_future(call()) for call in calls}
+    accepted: list[T] = []
+    rejected: list[T] = []
+    errors: list[BaseException] = []
+    deadline: float | None = None
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=(
+                    None if deadline is None else max(deadline - loop.time(), 0)
+                ),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+
+            for task in done:
+                error = task.exception()
+                if error is not None:
+                    errors.append(error)
+                elif accept(task.result()):
+                    accepted.append(task.result())
+                else:
+                    rejected.append(task.result())
+
+            if accepted and deadline is None:
+                deadline = loop.time() + grace_seconds
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if pending:
+        logger.debug("cancelled %s slow calls", len(pending))
+    return accepted, rejected, errors
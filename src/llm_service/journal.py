@@ -0,0 +1,114 @@
+"""Трасса обработки одного вопроса для журнала запросов.
+
+трасса живет в contextvar на время `process_query`: задачи, которые
+сервис запускает внутри (хеджи, кандидаты, SingleFlight), наследуют
+контекст и пишут в тот же объект, поэтому сигнатуры методов не меняются.
+записи журнала читает `src.scripts.replay_journal`
+"""
+
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import time
+from typing import Any
+
+from src.core import metrics
+
+_current_trace: ContextVar["QueryTrace | None"] = ContextVar(
+    "query_trace", default=None
+)
+
+
+@dataclass(slots=True)
+class QueryTrace:
+    """Вопрос, попытки с sql и ошибками, время по этапам и итог.
+
+    `source` - откуда ответ: plan_cache, template, candidates, llm или
+    shared, если такой же вопрос уже обрабатывался и ответ общий
+    """
+
+    question: str
+    at: float = field(default_factory=time.time)
+    started: float = field(default_factory=time.perf_counter)
+    attempts: list[dict[str, Any]] = field(default_factory=list)
+    stages_ms: dict[str, float] = field(default_factory=dict)
+    source: str | None = None
+    result: int | None = None
+    error: str | None = None
+    usage: dict[str, int] | None = None
+
+    def add_attempt(
+        self,
+        kind: str,
+        sql_query: str | None,
+        params: dict[str, Any] | None = None,
+        error: str | None = None,
+    ) -> None:
+        """`sql_query` None - llm не вернула sql."""
+        self.attempts.append(
+            {
+                "kind": kind,
+                "sql": sql_query,
+                "params": params,
+                "error": error,
+                "offset_ms": (time.perf_counter() - self.started) * 1000,
+            }
+        )
+
+    def add_stage(self, stage: str, seconds: float) -> None:  # noqa: D102
+        self.stages_ms[stage] = self.stages_ms.get(stage, 0.0) + seconds * 1000
+
+    def record(self) -> dict[str, Any]:  # noqa: D102
+        return {
+            "at": self.at,
+            "question": self.question,
+            "source": self.source,
+            "result": self.result,
+            "error": self.error,
+            "elapsed_ms": (time.perf_counter() - self.started) * 1000,
+            "stages_ms": self.stages_ms,
+            "attempts": self.attempts,
+            "usage": self.usage,
+        }
+
+
+def current_trace() -> QueryTrace | None:  # noqa: D103
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_query(question: str) -> Generator[QueryTrace]:
+    """Новая трасса для вопроса на время блока."""
+    trace = QueryTrace(question)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Generator[None]:
+    """Замер этапа в метриках и в текущей трассе."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        metrics.STAGE_SECONDS.observe(seconds, stage=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(name, seconds)
+
+
+def record_attempt(
+    kind: str,
+    sql_query: str | None,
+    params: dict[str, Any] | None = None,
+    error: str | None = None,
+) -> None:
+    """Попытка в текущую трассу, если она есть."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_attempt(kind, sql_query, params, error)
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import json
+import logging
+from pathlib import Path
+import re
+from threading import Lock
+import time
+
+logger = logging.getLogger(__name__)
+
+# кавычки и знаки конца предложения; точка, запятая и двоеточие внутри
+# чисел ("1.5", "10:00") и операторы сравнения и арифметики остаются
+_PUNCTUATION_RE = re.compile(r"[«»\"'“”„`]+|[?…;]+|!(?!=)|[.,:](?!\d)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Приводит вопрос к каноничному виду для ключа кэша.
+
+    регистр, кавычки, знаки препинания и лишние пробелы не влияют на смысл
+    вопроса, поэтому "Сколько всего видео?" и "сколько  всего видео" дают
+    один ключ; операторы вроде `>` и `<` меняют смысл и в ключе остаются
+    """
+    normalized = question.casefold().replace("ё", "е")
+    normalized = _PUNCTUATION_RE.sub(" ", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+@dataclass(slots=True)
+class CacheEntry:  # noqa: D101
+    value: str
+    stored_at: float
+
+
+@dataclass(frozen=True, slots=True)
+class CacheSnapshot:
+    """Сериализованный кэш и номер изменения, на котором он снят."""
+
+    payload: str
+    changes: int
+
+
+class PlanCache:
+    """LRU/TTL кэш `ключ -> sql` с копией на диске.
+
+    кэш привязан к отпечатку системного промпта: если `on_start.md`
+    изменился, сохраненные на диске записи отбрасываются при загрузке
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(  # noqa: D107
+        self,
+        fingerprint: str,
+        max_size: int = 1024,
+        ttl_seconds: float = 86400,
+        path: Path | None = None,
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        # счетчик изменений и номер последнего записанного на диск;
+        # кэш грязный, пока они не совпали
+        self._changes = 0
+        self._saved_changes = 0
+        self._write_lock = Lock()
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._entries)
+
+    @property
+    def dirty(self) -> bool:  # noqa: D102
+        return self._changes != self._saved_changes
+
+    def _is_expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.stored_at > self.ttl_seconds
+
+    def get(self, key: str) -> str | None:  # noqa: D102
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if self._is_expired(entry, time.time()):
+            del self._entries[key]
+            self._changes += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, key: str, value: str) -> None:  # noqa: D102
+        self._entries[key] = CacheEntry(value=value, stored_at=time.time())
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        self._changes += 1
+
+    def invalidate(self, key: str) -> None:  # noqa: D102
+        if self._entries.pop(key, None) is not None:
+            self._changes += 1
+
+    def load(self) -> None:
+        """Поднимает записи с диска, пропуская устаревшие и чужие."""
+        if self.path is None or not self.path.exists():
+            return
+
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as load_error:
+            logger.warning("failed to load cache %s: %s", self.path, load_error)
+            return
+
+        if (
+            payload.get("version") != self.FORMAT_VERSION
+            or payload.get("fingerprint") != self.fingerprint
+        ):
+            logger.info("cache %s is stale, starting cold", self.path)
+            return
+
+        now = time.time()
+        for key, value, stored_at in payload.get("entries", []):
+            entry = CacheEntry(value=value, stored_at=stored_at)
+            if not self._is_expired(entry, now):
+                self._entries[key] = entry
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        logger.debug("loaded %s entries from %s", len(self._entries), self.path)
+
+    def dump(self) -> CacheSnapshot | None:
+        """Сериализует кэш, если с последнего сохранения были изменения.
+
+        вызывается из event loop, запись на диск делается отдельно
+        в `write`, чтобы не держать loop на файловом I/O; кэш остается
+        грязным, пока `write` не завершится успешно
+        """
+        if self.path is None or not self.dirty:
+            return None
+
+        payload = json.dumps(
+            {
+                "version": self.FORMAT_VERSION,
+                "fingerprint": self.fingerprint,
+                "entries": [
+                    [key, entry.value, entry.stored_at]
+                    for key, entry in self._entries.items()
+                ],
+            },
+            ensure_ascii=False,
+        )
+        return CacheSnapshot(payload=payload, changes=self._changes)
+
+    def write(self, snapshot: CacheSnapshot) -> None:
+        """Атомарно пишет снимок на диск и только потом снимает грязь.
+
+        изменения, сделанные после `dump`, оставляют кэш грязным
+        """
+        if self.path is None:
+            return
+
+        with self._write_lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(snapshot.payload, encoding="utf-8")
+            tmp_path.replace(self.path)
+            self._saved_changes = max(self._saved_changes, snapshot.changes)
+
+    def save(self) -> None:  # noqa: D102
+        snapshot = self.dump()
+        if snapshot is not None:
+            self.write(snapshot)
@@ -0,0 +1,152 @@
+from collections.abc import Generator
+from dataclasses import dataclass
+import json
+import logging
+from typing import Any, cast
+
+from src.core.settings import QueryGuardSettings
+from src.database.manager import ReadConnection
+
+logger = logging.getLogger(__name__)
+
+PlanNode = dict[str, Any]
+
+_JOIN_NODES = frozenset({"Nested Loop", "Hash Join", "Merge Join"})
+
+
+class QueryTooExpensiveError(ValueError):
+    """Оценка планировщика выше лимита, запрос не выполнялся."""
+
+
+@dataclass(slots=True)
+class PlanEstimate:  # noqa: D101
+    total_cost: float
+    max_rows: float
+    widest_node: str
+    has_unconditioned_join: bool
+
+
+def _iter_nodes(node: PlanNode) -> Generator[PlanNode]:
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _iter_nodes(child)
+
+
+def _describe(node: PlanNode) -> str:
+    relation = node.get("Relation Name")
+    return (
+        f"{node['Node Type']} on {relation}" if relation else node["Node Type"]
+    )
+
+
+def estimate(plan: PlanNode) -> PlanEstimate:
+    """Сводит план EXPLAIN (FORMAT JSON) к стоимости и самому широкому узлу."""
+    widest = max(_iter_nodes(plan), key=lambda node: node.get("Plan Rows", 0))
+    unconditioned = any(
+        node["Node Type"] in _JOIN_NODES
+        and not any(
+            key in node for key in ("Join Filter", "Hash Cond", "Merge Cond")
+        )
+        # nested loop с параметризованным внутренним сканом - обычный join
+        and not any(
+            "Index Cond" in child or "Recheck Cond" in child
+            for child in node.get("Plans", ())
+        )
+        for node in _iter_nodes(plan)
+    )
+    return PlanEstimate(
+        total_cost=plan.get("Total Cost", 0.0),
+        max_rows=widest.get("Plan Rows", 0),
+        widest_node=_describe(widest),
+        has_unconditioned_join=unconditioned,
+    )
+
+
+class QueryGuard:
+    """Проверка запроса планировщиком до выполнения.
+
+    EXPLAIN без ANALYZE ничего не выполняет и стоит одного планирования.
+    слишком дорогой запрос отклоняется ошибкой, которая уходит в цикл
+    повторов как подсказка для llm. выполнение дополнительно ограничено
+    statement_timeout на уровне транзакции
+    """
+
+    def __init__(self, settings: QueryGuardSettings) -> None:  # noqa: D107
+        self.settings = settings
+
+    async def _explain(
+        self,
+        connection: ReadConnection,
+        sql_query: str,
+        params: dict[str, Any] | None,
+    ) -> PlanNode:
+        plan = await connection.fetchval(
+            f"EXPLAIN (FORMAT JSON) {sql_query.strip().rstrip(';')}", params
+        )
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return cast(PlanNode, plan[0]["Plan"])
+
+    async def plan_estimate(
+        self,
+        connection: ReadConnection,
+        sql_query: str,
+        params: dict[str, Any] | None = None,
+    ) -> PlanEstimate:
+        """Оценка планировщика без выполнения и без проверки лимитов."""
+        return estimate(await self._explain(connection, sql_query, params))
+
+    def _reject_reason(self, plan_estimate: PlanEstimate) -> str | None:
+        if plan_estimate.total_cost > self.settings.max_cost:
+            return (
+                f"estimated cost {plan_estimate.total_cost:.0f} "
+                f"exceeds limit {self.settings.max_cost:.0f}"
+            )
+        if plan_estimate.max_rows > self.settings.max_rows:
+            return (
+                f"{plan_estimate.widest_node} is estimated at "
+                f"{plan_estimate.max_rows:.0f} rows, "
+                f"limit {self.settings.max_rows:.0f}"
+            )
+        return None
+
+    async def check(
+        self,
+        connection: ReadConnection,
+        sql_query: str,
+        params: dict[str, Any] | None = None,
+        plan_estimate: PlanEstimate | None = None,
+    ) -> None:
+        """Ставит таймаут транзакции и отклоняет дорогой запрос.
+
+        `plan_estimate` - уже полученная оценка того же запроса, тогда
+        EXPLAIN повторно не выполняется
+        """
+        if not self.settings.enabled:
+            return
+
+        await connection.fetchval(
+            "SELECT set_config('statement_timeout', :value, true)",
+            {"value": str(self.settings.statement_timeout_ms)},
+        )
+
+        if plan_estimate is None:
+            plan_estimate = await self.plan_estimate(
+                connection, sql_query, params
+            )
+        reason = self._reject_reason(plan_estimate)
+        if reason is None:
+            return
+
+        hint = (
+            "; the plan joins tables without a join condition "
+            "(cartesian product) - add ON/WHERE conditions between tables"
+            if plan_estimate.has_unconditioned_join
+            else ""
+        )
+        logger.warning("query rejected by cost gate: %s", reason)
+        raise QueryTooExpensiveError(
+            f"query is too expensive: {reason}{hint}. rewrite it cheaper: "
+            "filter by indexed columns and date ranges, prefer the rollup "
+            "tables for sums, avoid joins that multiply rows"
+        )
@@ -0,0 +1,48 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight[K: Hashable, T]:
+    """Склеивает одновременные вызовы с одинаковым ключом в один.
+
+    первый вызов запускает работу отдельной задачей, остальные ждут ее же
+    результат. исключение получают все ожидающие. отмена одного ожидающего
+    не отменяет работу для остальных
+    """
+
+    def __init__(self) -> None:  # noqa: D107
+        self._in_flight: dict[K, asyncio.Task[T]] = {}
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._in_flight)
+
+    def _forget(self, key: K, task: asyncio.Task[T]) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+        # помечаем исключение полученным, даже если все ожидающие отменились
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("shared call for %r failed", key)
+
+    async def run(  # noqa: D102
+        self,
+        key: K,
+        factory: Callable[[], Awaitable[T]],
+    ) -> T:
+        task = self._in_flight.get(key)
+
+        if task is None:
+
+            async def call() -> T:
+                return await factory()
+
+            task = asyncio.create_task(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            logger.debug("joining in-flight call for %r", key)
+
+        return await asyncio.shield(task)
@@ -0,0 +1,788 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from difflib import get_close_matches
+import re
+
+from sqlalchemy import MetaData
+
+
+class SQLCheckError(ValueError):
+    """Ошибка, найденная в sql без обращения к базе."""
+
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<space>\s+)
+    |(?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>[EeXxBb]?'(?:[^']|'')*')
+    |(?P<dollar>\$(?P<tag>\w*)\$.*?\$(?P=tag)\$)
+    |(?P<quoted>"(?:[^"]|"")+")
+    |(?P<cast>::)
+    |(?P<param>:\w+)
+    |(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+    |(?P<word>[A-Za-z_][\w$]*)
+    |(?P<punct>[(),.;\[\]])
+    |(?P<op>[-+*/%<>=~!@#^&|`?]+)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+KEYWORDS = frozenset(
+    {
+        "ALL",
+        "AND",
+        "ANY",
+        "ARRAY",
+        "AS",
+        "ASC",
+        "ASYMMETRIC",
+        "AT",
+        "BETWEEN",
+        "BOTH",
+        "BY",
+        "CASE",
+        "CAST",
+        "COLLATE",
+        "CROSS",
+        "CURRENT",
+        "CURRENT_DATE",
+        "CURRENT_TIME",
+        "CURRENT_TIMESTAMP",
+        "DESC",
+        "DISTINCT",
+        "ELSE",
+        "END",
+        "EXCEPT",
+        "EXISTS",
+        "FALSE",
+        "FETCH",
+        "FILTER",
+        "FIRST",
+        "FOLLOWING",
+        "FOR",
+        "FROM",
+        "FULL",
+        "GROUP",
+        "GROUPING",
+        "HAVING",
+        "ILIKE",
+        "IN",
+        "INNER",
+        "INTERSECT",
+        "INTERVAL",
+        "IS",
+        "ISNULL",
+        "JOIN",
+        "LAST",
+        "LATERAL",
+        "LEADING",
+        "LEFT",
+        "LIKE",
+        "LIMIT",
+        "LOCALTIME",
+        "LOCALTIMESTAMP",
+        "MATERIALIZED",
+        "NATURAL",
+        "NEXT",
+        "NOT",
+        "NOTNULL",
+        "NULL",
+        "NULLS",
+        "OF",
+        "OFFSET",
+        "ON",
+        "ONLY",
+        "OR",
+        "ORDER",
+        "OTHERS",
+        "OUTER",
+        "OVER",
+        "OVERLAPS",
+        "PARTITION",
+        "PRECEDING",
+        "RANGE",
+        "RECURSIVE",
+        "RIGHT",
+        "ROW",
+        "ROWS",
+        "SELECT",
+        "SETS",
+        "SIMILAR",
+        "SOME",
+        "SYMMETRIC",
+        "TABLESAMPLE",
+        "THEN",
+        "TIES",
+        "TO",
+        "TRAILING",
+        "TRUE",
+        "UNBOUNDED",
+        "UNION",
+        "UNKNOWN",
+        "USING",
+        "VALUES",
+        "WHEN",
+        "WHERE",
+        "WINDOW",
+        "WITH",
+        "WITHIN",
+        "WITHOUT",
+        "ZONE",
+        "BIGINT",
+        "BIGSERIAL",
+        "BOOL",
+        "BOOLEAN",
+        "CHAR",
+        "CHARACTER",
+        "DATE",
+        "DEC",
+        "DECIMAL",
+        "DOUBLE",
+        "FLOAT",
+        "FLOAT4",
+        "FLOAT8",
+        "INT",
+        "INT2",
+        "INT4",
+        "INT8",
+        "INTEGER",
+        "JSON",
+        "JSONB",
+        "NUMERIC",
+        "PRECISION",
+        "REAL",
+        "SMALLINT",
+        "TEXT",
+        "TIME",
+        "TIMESTAMP",
+        "TIMESTAMPTZ",
+        "TIMETZ",
+        "UUID",
+        "VARCHAR",
+        "VARYING",
+        "CENTURY",
+        "DAY",
+        "DECADE",
+        "DOW",
+        "DOY",
+        "EPOCH",
+        "HOUR",
+        "ISODOW",
+        "ISOYEAR",
+        "MICROSECONDS",
+        "MILLENNIUM",
+        "MILLISECONDS",
+        "MINUTE",
+        "MONTH",
+        "QUARTER",
+        "SECOND",
+        "TIMEZONE",
+        "WEEK",
+        "YEAR",
+    }
+)
+
+# служебные слова внутри скобок особых функций sql:
+# `overlay(s PLACING t FROM 1 FOR 2)`, `substring(s SIMILAR p ESCAPE e)`
+_CALL_KEYWORDS: dict[str, frozenset[str]] = {
+    "overlay": frozenset({"PLACING", "FROM", "FOR"}),
+    "substring": frozenset({"FROM", "FOR", "SIMILAR", "ESCAPE"}),
+    "trim": frozenset({"BOTH", "LEADING", "TRAILING", "FROM"}),
+}
+
+# оборвать в этом месте список источников после FROM
+_CLAUSE_END = frozenset(
+    {
+        "WHERE",
+        "GROUP",
+        "HAVING",
+        "ORDER",
+        "LIMIT",
+        "OFFSET",
+        "FETCH",
+        "UNION",
+        "INTERSECT",
+        "EXCEPT",
+        "WINDOW",
+    }
+)
+
+_WRITE_WORDS = frozenset(
+    {
+        "INSERT",
+        "UPDATE",
+        "DELETE",
+        "MERGE",
+        "UPSERT",
+        "DROP",
+        "ALTER",
+        "CREATE",
+        "TRUNCATE",
+        "GRANT",
+        "REVOKE",
+        "COPY",
+        "CALL",
+        "DO",
+        "VACUUM",
+        "ANALYZE",
+        "REINDEX",
+        "CLUSTER",
+        "LOCK",
+        "SET",
+        "RESET",
+        "INTO",
+    }
+)
+_FORBIDDEN_FUNCTIONS = frozenset(
+    {
+        "pg_sleep",
+        "pg_sleep_for",
+        "pg_sleep_until",
+        "pg_read_file",
+        "pg_read_binary_file",
+        "pg_ls_dir",
+        "pg_stat_file",
+        "lo_import",
+        "lo_export",
+        "dblink",
+        "dblink_exec",
+        "pg_terminate_backend",
+        "pg_cancel_backend",
+        "set_config",
+    }
+)
+AGGREGATES = frozenset(
+    {
+        "sum",
+        "count",
+        "avg",
+        "min",
+        "max",
+        "array_agg",
+        "string_agg",
+        "bool_and",
+        "bool_or",
+        "every",
+        "percentile_cont",
+        "percentile_disc",
+        "mode",
+    }
+)
+
+
+@dataclass(slots=True)
+class Token:  # noqa: D101
+    kind: str
+    value: str
+    position: int
+
+    @property
+    def upper(self) -> str:  # noqa: D102
+        return self.value.upper() if self.kind == "word" else ""
+
+    @property
+    def name(self) -> str:
+        """Имя идентификатора так, как его видит postgres."""
+        if self.kind == "quoted":
+            return self.value[1:-1].replace('""', '"')
+        return self.value.lower()
+
+    @property
+    def is_identifier(self) -> bool:  # noqa: D102
+        return self.kind == "quoted" or (
+            self.kind == "word" and self.upper not in KEYWORDS
+        )
+
+
+def tokenize(sql_query: str) -> list[Token]:
+    """Токены без пробелов и комментариев."""
+    tokens: list[Token] = []
+    position = 0
+    while position < len(sql_query):
+        match = _TOKEN_RE.match(sql_query, position)
+        if match is None:
+            fragment = sql_query[position : position + 20]
+            if sql_query[position] in "'\"$":
+                raise SQLCheckError(f"unterminated literal near: {fragment}")
+            raise SQLCheckError(f"syntax error near: {fragment}")
+
+        kind = match.lastgroup or ""
+        if kind == "tag":
+            kind = "dollar"
+        if kind not in {"space", "comment"}:
+            tokens.append(Token(kind, match.group(), position))
+        position = match.end()
+    return tokens
+
+
+@dataclass(slots=True)
+class _Sources:
+    """Источники строк запроса: таблицы, алиасы и то, что не проверить."""
+
+    aliases: dict[str, set[str]] = field(default_factory=dict)
+    opaque: set[str] = field(default_factory=set)
+    output_aliases: set[str] = field(default_factory=set)
+    skip: set[int] = field(default_factory=set)
+
+
+class SQLChecker:
+    """Проверка sql по метаданным sqlalchemy до отправки в базу.
+
+    разбор намеренно консервативный: ошибка выдается только когда она
+    несомненна (неизвестная таблица или колонка, несколько выражений,
+    запись, колонка вне GROUP BY при агрегатах). все, что не удается
+    разобрать уверенно (cte, подзапросы во FROM, табличные функции),
+    пропускается и остается на проверку базе
+    """
+
+    def __init__(self, metadata: MetaData) -> None:  # noqa: D107
+        self.columns: dict[str, frozenset[str]] = {
+            name: frozenset(column.name for column in table.columns)
+            for name, table in metadata.tables.items()
+        }
+
+    def check(self, sql_query: str) -> None:  # noqa: D102
+        tokens = tokenize(sql_query)
+        while tokens and tokens[-1].value == ";":
+            tokens.pop()
+        if not tokens:
+            raise SQLCheckError("empty sql query")
+
+        self._check_statement(tokens)
+        sources = self._collect_sources(tokens)
+        self._check_references(tokens, sources)
+        self._check_grouping(tokens)
+
+    def _check_statement(self, tokens: list[Token]) -> None:
+        if any(token.value == ";" for token in tokens):
+            raise SQLCheckError(
+                "multiple statements are not allowed, return one SELECT"
+            )
+
+        first = next((token for token in tokens if token.value != "("), None)
+        if first is None or first.upper not in {"SELECT", "WITH"}:
+            raise SQLCheckError(
+                "only SELECT queries are allowed, "
+                f"got: {tokens[0].value[:50]}"
+            )
+
+        for index, token in enumerate(tokens):
+            if token.upper in _WRITE_WORDS:
+                raise SQLCheckError(
+                    f"{token.upper} is not allowed in a read-only query"
+                )
+            if token.upper == "FOR" and index + 1 < len(tokens):
+                locking = tokens[index + 1].upper
+                if locking in {"UPDATE", "SHARE", "NO", "KEY"}:
+                    raise SQLCheckError("row locking clauses are not allowed")
+            if (
+                token.kind == "word"
+                and token.name in _FORBIDDEN_FUNCTIONS
+                and self._is_call(tokens, index)
+            ):
+                raise SQLCheckError(f"function {token.name} is not allowed")
+
+    @staticmethod
+    def _is_call(tokens: list[Token], index: int) -> bool:
+        return index + 1 < len(tokens) and tokens[index + 1].value == "("
+
+    @staticmethod
+    def _matching_paren(tokens: list[Token], index: int) -> int:
+        depth = 0
+        for position in range(index, len(tokens)):
+            if tokens[position].value == "(":
+                depth += 1
+            elif tokens[position].value == ")":
+                depth -= 1
+                if depth == 0:
+                    return position
+        raise SQLCheckError("unbalanced parentheses")
+
+    @staticmethod
+    def _paren_kinds(tokens: list[Token]) -> list[str | None]:
+        """Для каждого токена - чем открыта ближайшая скобка.
+
+        "query" - подзапрос, имя функции - вызов, None - верхний уровень
+        или скобки выражения
+        """
+        stack: list[str | None] = []
+        kinds: list[str | None] = []
+        for index, token in enumerate(tokens):
+            if token.value == "(":
+                following = (
+                    tokens[index + 1].upper if index + 1 < len(tokens) else ""
+                )
+                previous = tokens[index - 1] if index else None
+                if following in {"SELECT", "WITH"}:
+                    stack.append("query")
+                elif previous is not None and previous.kind in {
+                    "word",
+                    "quoted",
+                }:
+                    stack.append(previous.name)
+                else:
+                    stack.append(None)
+            elif token.value == ")":
+                if not stack:
+                    raise SQLCheckError("unbalanced parentheses")
+                stack.pop()
+            kinds.append(stack[-1] if stack else None)
+        if stack:
+            raise SQLCheckError("unbalanced parentheses")
+        return kinds
+
+    def _read_alias(
+        self, tokens: list[Token], index: int, sources: _Sources
+    ) -> tuple[str | None, int]:
+        """Алиас источника после `index`: (алиас, следующий индекс)."""
+        if index < len(tokens) and tokens[index].upper == "AS":
+            sources.skip.add(index)
+            index += 1
+        if index < len(tokens) and tokens[index].is_identifier:
+            sources.skip.add(index)
+            alias = tokens[index].name
+            index += 1
+            # список колонок алиаса: `t(a, b)`
+            if index < len(tokens) and tokens[index].value == "(":
+                end = self._matching_paren(tokens, index)
+                sources.skip.update(range(index, end + 1))
+                index = end + 1
+            return alias, index
+        return None, index
+
+    def _read_opaque_source(
+        self, tokens: list[Token], index: int, sources: _Sources
+    ) -> None:
+        """Подзапрос или табличная функция: колонки не известны."""
+        start = index
+        if tokens[index].value != "(":
+            sources.skip.add(index)
+            start += 1
+        end = self._matching_paren(tokens, start)
+        alias, _ = self._read_alias(tokens, end + 1, sources)
+        sources.opaque.add(alias if alias is not None else "")
+
+    @staticmethod
+    def _read_relation_name(
+        tokens: list[Token], index: int, sources: _Sources
+    ) -> tuple[str, int]:
+        """Имя таблицы, возможно со схемой: (имя, индекс последнего токена)."""
+        sources.skip.add(index)
+        if (
+            index + 2 < len(tokens)
+            and tokens[index + 1].value == "."
+            and tokens[index + 2].is_identifier
+        ):
+            # схема: `public.videos`
+            sources.skip.update({index + 1, index + 2})
+            return tokens[index + 2].name, index + 2
+        return tokens[index].name, index
+
+    def _read_source(
+        self, tokens: list[Token], index: int, sources: _Sources
+    ) -> None:
+        if index < len(tokens) and tokens[index].upper in {"LATERAL", "ONLY"}:
+            index += 1
+        if index >= len(tokens):
+            return
+
+        token = tokens[index]
+        if token.value == "(" or (
+            token.kind in {"word", "quoted"} and self._is_call(tokens, index)
+        ):
+            self._read_opaque_source(tokens, index, sources)
+            return
+
+        if not token.is_identifier:
+            return
+
+        name, index = self._read_relation_name(tokens, index, sources)
+        if name in sources.opaque:
+            alias, _ = self._read_alias(tokens, index + 1, sources)
+            if alias is not None:
+                sources.opaque.add(alias)
+            return
+
+        if name not in self.columns:
+            raise SQLCheckError(
+                f'relation "{name}" does not exist'
+                + self._suggest(name, self.columns)
+            )
+
+        alias, _ = self._read_alias(tokens, index + 1, sources)
+        sources.aliases.setdefault(alias or name, set()).add(name)
+        if alias is None:
+            sources.aliases.setdefault(name, set()).add(name)
+
+    def _collect_ctes(self, tokens: list[Token], sources: _Sources) -> None:
+        for index, token in enumerate(tokens):
+            if not token.is_identifier:
+                continue
+            position = index + 1
+            if position < len(tokens) and tokens[position].value == "(":
+                position = self._matching_paren(tokens, position) + 1
+            if position < len(tokens) and tokens[position].upper == "AS":
+                position += 1
+                while position < len(tokens) and tokens[position].upper in {
+                    "NOT",
+                    "MATERIALIZED",
+                }:
+                    position += 1
+                if (
+                    position + 1 < len(tokens)
+                    and tokens[position].value == "("
+                    and tokens[position + 1].upper in {"SELECT", "WITH"}
+                ):
+                    sources.opaque.add(token.name)
+                    sources.skip.update(range(index, position))
+
+    def _collect_sources(self, tokens: list[Token]) -> _Sources:
+        sources = _Sources()
+        self._collect_ctes(tokens, sources)
+        kinds = self._paren_kinds(tokens)
+
+        from_depths: set[int] = set()
+        depth = 0
+        for index, token in enumerate(tokens):
+            if token.value == "(":
+                depth += 1
+                continue
+            if token.value == ")":
+                from_depths.discard(depth)
+                depth -= 1
+                continue
+
+            clause_level = kinds[index] in {None, "query"}
+            if (
+                token.upper == "FROM"
+                and clause_level
+                and not (index and tokens[index - 1].upper == "DISTINCT")
+            ):
+                # `IS [NOT] DISTINCT FROM` - сравнение, а не FROM
+                from_depths.add(depth)
+                self._read_source(tokens, index + 1, sources)
+            elif token.upper == "JOIN" or (
+                token.value == "," and depth in from_depths and clause_level
+            ):
+                self._read_source(tokens, index + 1, sources)
+            elif token.upper in _CLAUSE_END:
+                from_depths.discard(depth)
+
+            if token.upper == "AS" and kinds[index] != "cast":
+                following = index + 1
+                if (
+                    following < len(tokens)
+                    and tokens[following].is_identifier
+                    and following not in sources.skip
+                ):
+                    sources.output_aliases.add(tokens[following].name)
+                    sources.skip.add(following)
+
+        return sources
+
+    @staticmethod
+    def _suggest(name: str, candidates: Iterable[str]) -> str:
+        matches = get_close_matches(name, list(candidates), n=3)
+        return f", did you mean: {', '.join(matches)}?" if matches else ""
+
+    def _is_reference(
+        self, tokens: list[Token], index: int, kinds: list[str | None]
+    ) -> bool:
+        """Идентификатор - ссылка на колонку или таблицу, а не тип или поле."""
+        token = tokens[index]
+        if not token.is_identifier or self._is_call(tokens, index):
+            return False
+        if token.upper in _CALL_KEYWORDS.get(kinds[index] or "", ()):
+            return False
+        if not index:
+            return True
+
+        previous = tokens[index - 1]
+        if previous.kind == "cast":
+            # тип после `::`
+            return False
+        if kinds[index] == "cast" and previous.upper == "AS":
+            return False
+        # поле EXTRACT(field FROM ...)
+        return not (kinds[index] == "extract" and previous.value == "(")
+
+    def _check_unqualified(
+        self, name: str, known_columns: frozenset[str], sources: _Sources
+    ) -> None:
+        if (
+            name in known_columns
+            or name in sources.output_aliases
+            or name in sources.aliases
+        ):
+            return
+        tables = sorted(set().union(*sources.aliases.values()))
+        raise SQLCheckError(
+            f'column "{name}" does not exist in {", ".join(tables)}'
+            + self._suggest(name, known_columns)
+        )
+
+    def _check_references(self, tokens: list[Token], sources: _Sources) -> None:
+        kinds = self._paren_kinds(tokens)
+        known_columns = frozenset().union(
+            *(
+                self.columns[table]
+                for tables in sources.aliases.values()
+                for table in tables
+            )
+        )
+        # без cte, подзапросов и функций во FROM все колонки известны
+        check_unqualified = bool(sources.aliases) and not sources.opaque
+
+        index = 0
+        while index < len(tokens):
+            if index in sources.skip or not self._is_reference(
+                tokens, index, kinds
+            ):
+                index += 1
+                continue
+
+            token = tokens[index]
+            if (
+                index + 2 < len(tokens)
+                and tokens[index + 1].value == "."
+                and tokens[index + 2].kind in {"word", "quoted", "op"}
+            ):
+                # `pg_catalog.count(...)` - функция со схемой, не колонка
+                if not self._is_call(tokens, index + 2):
+                    self._check_qualified(
+                        token.name, tokens[index + 2], sources
+                    )
+                index += 3
+                continue
+
+            if check_unqualified:
+                self._check_unqualified(token.name, known_columns, sources)
+            index += 1
+
+    def _check_qualified(
+        self, qualifier: str, column: Token, sources: _Sources
+    ) -> None:
+        if qualifier in sources.opaque:
+            return
+        tables = sources.aliases.get(qualifier)
+        if tables is None:
+            raise SQLCheckError(
+                f'missing FROM-clause entry for table "{qualifier}"'
+                + self._suggest(qualifier, sources.aliases)
+            )
+        if column.value == "*":
+            return
+
+        name = column.name
+        if any(name in self.columns[table] for table in tables):
+            return
+        available = sorted(
+            {column for table in tables for column in self.columns[table]}
+        )
+        raise SQLCheckError(
+            f"column {qualifier}.{name} does not exist, "
+            f"available: {', '.join(available)}"
+            + self._suggest(name, available)
+        )
+
+    def _check_grouping(self, tokens: list[Token]) -> None:
+        """Агрегат и голая колонка в одном SELECT без GROUP BY."""
+        for index, token in enumerate(tokens):
+            if token.upper == "SELECT":
+                self._check_select_level(tokens, index)
+
+    @staticmethod
+    def _select_items(
+        tokens: list[Token], start: int
+    ) -> tuple[list[list[Token]], int]:
+        """Элементы списка SELECT и индекс токена, на котором он кончился."""
+        items: list[list[Token]] = [[]]
+        depth = 0
+        index = start + 1
+        while index < len(tokens):
+            token = tokens[index]
+            if token.value == "(":
+                depth += 1
+            elif token.value == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and token.upper in {"FROM", *_CLAUSE_END}:
+                break
+            elif depth == 0 and token.value == ",":
+                items.append([])
+                index += 1
+                continue
+            items[-1].append(token)
+            index += 1
+        return items, index
+
+    @staticmethod
+    def _has_group_by(tokens: list[Token], index: int) -> bool:
+        """Есть ли GROUP BY того же уровня, начиная с `index`."""
+        depth = 0
+        for token in tokens[index:]:
+            if token.value == "(":
+                depth += 1
+            elif token.value == ")":
+                if depth == 0:
+                    return False
+                depth -= 1
+            elif depth == 0 and token.upper == "GROUP":
+                return True
+            elif depth == 0 and token.upper in {
+                "UNION",
+                "INTERSECT",
+                "EXCEPT",
+            }:
+                return False
+        return False
+
+    def _check_select_level(self, tokens: list[Token], start: int) -> None:
+        items, index = self._select_items(tokens, start)
+        has_aggregate = any(self._has_aggregate(item) for item in items if item)
+        if not has_aggregate:
+            return
+
+        bare = [name for item in items if (name := self._bare_column(item))]
+        if not bare or self._has_group_by(tokens, index):
+            return
+
+        raise SQLCheckError(
+            f'column "{bare[0]}" must appear in the GROUP BY clause '
+            "or be used in an aggregate function"
+        )
+
+    def _has_aggregate(self, item: list[Token]) -> bool:
+        for index, token in enumerate(item):
+            if token.kind != "word" or token.name not in AGGREGATES:
+                continue
+            if not self._is_call(item, index):
+                continue
+            end = self._matching_paren(item, index + 1)
+            following = end + 1
+            if following < len(item) and item[following].upper == "FILTER":
+                following = self._matching_paren(item, following + 1) + 1
+            if following < len(item) and item[following].upper == "OVER":
+                continue
+            return True
+        return False
+
+    @staticmethod
+    def _bare_column(item: list[Token]) -> str | None:
+        """Имя колонки, если элемент списка - просто колонка (с алиасом)."""
+        if len(item) >= 2 and item[-2].upper == "AS":
+            item = item[:-2]
+        elif len(item) in {2, 4} and item[-1].is_identifier:
+            item = item[:-1]
+
+        if len(item) == 1 and item[0].is_identifier:
+            return item[0].name
+        if (
+            len(item) == 3
+            and item[0].is_identifier
+            and item[1].value == "."
+            and item[2].is_identifier
+        ):
+            return f"{item[0].name}.{item[2].name}"
+        return None
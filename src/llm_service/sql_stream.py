@@ -0,0 +1,128 @@
+import re
+
+FENCE = "```"
+# ограда с необязательным языком, когда блок кода не разбит на строки
+_INLINE_FENCE_RE = re.compile(r"```(?:sql(?=\s))?", re.IGNORECASE)
+
+
+class SQLStreamExtractor:
+    """Выделяет sql из ответа llm по мере поступления текста.
+
+    запрос считается законченным на первой `;` вне литералов и
+    комментариев или на закрывающем ```, если ответ начался с блока кода.
+    все, что модель пишет после (пояснения, рассуждения), не нужно
+    """
+
+    def __init__(self) -> None:  # noqa: D107
+        self._buffer = ""
+        self._fenced: bool | None = None
+        # начало sql и позиция, до которой буфер уже разобран
+        self._start = 0
+        self._position = 0
+        # "'" / '"' - внутри литерала, "--" / "/*" - внутри комментария
+        self._inside: str | None = None
+
+    def _detect_fence(self) -> bool:
+        stripped = self._buffer.lstrip()
+        if len(stripped) < len(FENCE):
+            return False
+
+        self._fenced = stripped.startswith(FENCE)
+        if not self._fenced:
+            self._start = self._position = len(self._buffer) - len(stripped)
+            return True
+
+        # строка с открывающим ``` может содержать язык: ```sql
+        line_end = self._buffer.find("\n", self._buffer.index(FENCE))
+        if line_end == -1:
+            self._fenced = None
+            return False
+        self._start = self._position = line_end + 1
+        return True
+
+    def _scan(self) -> int | None:
+        """Конец запроса в буфере или None, если он еще не пришел.
+
+        двухсимвольные маркеры (`--`, `/*`, `*/`, ```) могут разорваться
+        между кусками, поэтому на их первом символе в конце буфера разбор
+        останавливается до следующего куска
+        """
+        index = self._position
+        while index < len(self._buffer):
+            if self._inside is not None:
+                following = self._skip_inside(index)
+            else:
+                end = self._statement_end(index)
+                if end is not None:
+                    return end
+                following = self._enter(index)
+            if following is None:
+                break
+            index = following
+
+        self._position = index
+        return None
+
+    def _skip_inside(self, index: int) -> int | None:
+        """Шаг внутри литерала или комментария; None - ждать следующий кусок."""
+        char = self._buffer[index]
+        if self._inside in ("'", '"'):
+            if char == self._inside:
+                self._inside = None
+        elif self._inside == "--":
+            if char == "\n":
+                self._inside = None
+        elif self._buffer.startswith("*/", index):
+            self._inside = None
+            return index + 2
+        elif char == "*" and index + 1 == len(self._buffer):
+            return None
+        return index + 1
+
+    def _statement_end(self, index: int) -> int | None:
+        """Конец запроса, если он на позиции `index`: после `;` или до ```."""
+        if self._buffer[index] == ";":
+            return index + 1
+        if self._fenced and self._buffer.startswith(FENCE, index):
+            return index
+        return None
+
+    def _enter(self, index: int) -> int | None:
+        """Шаг вне литералов; None - маркер мог разорваться между кусками."""
+        buffer = self._buffer
+        char = buffer[index]
+        pair = buffer[index : index + 2]
+        if char in "'\"":
+            self._inside = char
+        elif pair in ("--", "/*"):
+            self._inside = pair
+            return index + 2
+        elif (char in "-/" and index + 1 == len(buffer)) or (
+            char == "`" and self._fenced and index + len(FENCE) > len(buffer)
+        ):
+            return None
+        return index + 1
+
+    def feed(self, text: str) -> str | None:
+        """Добавляет кусок ответа; возвращает sql, как только он закончен."""
+        self._buffer += text
+        if self._fenced is None and not self._detect_fence():
+            return None
+
+        end = self._scan()
+        if end is None:
+            return None
+        return self._buffer[self._start : end].strip()
+
+    def finish(self) -> str:
+        """Возвращает sql из полного ответа без найденного конца."""
+        if self._fenced is None:
+            # блок кода в одну строку: ```SELECT 1```
+            return _INLINE_FENCE_RE.sub("", self._buffer).strip()
+        return self._buffer[self._start :].replace(FENCE, "").strip()
+
+
+def extract_sql(content: str) -> str:
+    """Выделяет sql из полного ответа llm."""
+    extractor = SQLStreamExtractor()
+    return extractor.feed(content) or extractor.finish()
@@ -0,0 +1,347 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date
+import json
+import logging
+import re
+from typing import Any, Literal
+from uuid import UUID
+
+from src.llm_service.plan_cache import PlanCache, normalize_question
+
+logger = logging.getLogger(__name__)
+
+LiteralKind = Literal["uuid", "date", "number"]
+
+_MONTHS: dict[str, int] = {
+    "январ": 1,
+    "феврал": 2,
+    "март": 3,
+    "апрел": 4,
+    "ма": 5,
+    "июн": 6,
+    "июл": 7,
+    "август": 8,
+    "сентябр": 9,
+    "октябр": 10,
+    "ноябр": 11,
+    "декабр": 12,
+}
+
+_UUID_RE = re.compile(
+    r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b",
+    re.IGNORECASE,
+)
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+# "28 ноября 2025", "с 1 по 5 ноября" - первый день диапазона
+# наследует месяц и год второго
+_RU_DATE_RE = re.compile(
+    r"(?:\b(\d{1,2})\s*(?:по|до|и|-|–|—)\s*)?"
+    r"\b(\d{1,2})\s+"
+    r"(январ[яь]|феврал[яь]|марта?|апрел[яь]|ма[яй]|июн[яь]|июл[яь]"
+    r"|августа?|сентябр[яь]|октябр[яь]|ноябр[яь]|декабр[яь])\b"
+    r"(?:\s+(\d{4})\b)?",
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r"\b\d{1,3}(?:[  ]\d{3})+\b|\b\d+\b")
+
+# строковые литералы sql и числа вне идентификаторов
+# типизированный литерал `DATE '...'` заменяется целиком, с ключевым словом
+_SQL_LITERAL_RE = re.compile(
+    r"(?:\bDATE\s+)?'(?:[^']|'')*'|(?<![\w.$])\d+(?![\w.])",
+    re.IGNORECASE,
+)
+_SQL_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+# число сразу после `дата +` / `дата -`: сдвиг в днях, а не значение
+# из вопроса (`< DATE '2025-11-28' + 1`)
+_DATE_ARITHMETIC_RE = re.compile(
+    r"(?:'\d{4}-\d{2}-\d{2}'(?:\s*::\s*date)?|\bCURRENT_DATE)\s*[-+]\s*$",
+    re.IGNORECASE,
+)
+# служебные константы sql (`COALESCE(..., 0)`, `LIMIT 1`), которые
+# не берутся из формулировки вопроса
+_STRUCTURAL_NUMBERS = frozenset({"0", "1"})
+
+_CASTS: dict[LiteralKind, str] = {
+    "uuid": "UUID",
+    "date": "DATE",
+    "number": "BIGINT",
+}
+
+
+@dataclass(slots=True, frozen=True)
+class QuestionLiteral:  # noqa: D101
+    kind: LiteralKind
+    start: int
+    end: int
+    value: UUID | date | int
+    has_year: bool = True
+
+
+@dataclass(slots=True, frozen=True)
+class BoundTemplate:  # noqa: D101
+    sql: str
+    params: dict[str, Any]
+
+
+def _month_number(month_word: str) -> int:
+    lowered = month_word.casefold()
+    for stem, number in _MONTHS.items():
+        if lowered.startswith(stem):
+            return number
+    raise ValueError(f"unknown month: {month_word}")
+
+
+def _overlaps(start: int, end: int, taken: list[tuple[int, int]]) -> bool:
+    return any(start < t_end and t_start < end for t_start, t_end in taken)
+
+
+def _uuid_literals(match: re.Match[str]) -> list[QuestionLiteral]:
+    return [QuestionLiteral("uuid", *match.span(), UUID(match.group()))]
+
+
+def _iso_date_literals(match: re.Match[str]) -> list[QuestionLiteral]:
+    try:
+        value = date(*map(int, match.groups()))
+    except ValueError:
+        return []
+    return [QuestionLiteral("date", *match.span(), value)]
+
+
+def _ru_date_literals(match: re.Match[str]) -> list[QuestionLiteral]:
+    first_day, day, month_word, year = match.groups()
+    month = _month_number(month_word)
+    has_year = year is not None
+    # год-заглушка, реальный год подставляется из шаблона
+    year_value = int(year) if has_year else 2000
+
+    groups = [(2, day)]
+    if first_day is not None:
+        groups.insert(0, (1, first_day))
+    try:
+        return [
+            QuestionLiteral(
+                "date",
+                match.start(group),
+                match.end(group) if group == 1 else match.end(),
+                date(year_value, month, int(day_text)),
+                has_year,
+            )
+            for group, day_text in groups
+        ]
+    except ValueError:
+        return []
+
+
+def _number_literals(match: re.Match[str]) -> list[QuestionLiteral]:
+    value = int(re.sub(r"\s", "", match.group()))
+    return [QuestionLiteral("number", *match.span(), value)]
+
+
+# порядок важен: число внутри uuid или даты уже занято и не берется
+_LITERAL_FINDERS: tuple[
+    tuple[re.Pattern[str], Callable[[re.Match[str]], list[QuestionLiteral]]],
+    ...,
+] = (
+    (_UUID_RE, _uuid_literals),
+    (_ISO_DATE_RE, _iso_date_literals),
+    (_RU_DATE_RE, _ru_date_literals),
+    (_NUMBER_RE, _number_literals),
+)
+
+
+def extract_literals(question: str) -> list[QuestionLiteral]:
+    """Вынимает из вопроса uuid, даты и числа в порядке появления."""
+    literals: list[QuestionLiteral] = []
+    taken: list[tuple[int, int]] = []
+
+    for pattern, convert in _LITERAL_FINDERS:
+        for match in pattern.finditer(question):
+            if _overlaps(*match.span(), taken):
+                continue
+            for literal in convert(match):
+                literals.append(literal)
+                taken.append((literal.start, literal.end))
+
+    literals.sort(key=lambda literal: literal.start)
+    return literals
+
+
+def question_shape(question: str, literals: list[QuestionLiteral]) -> str:
+    """Вопрос с литералами, замененными на типизированные слоты."""
+    parts: list[str] = []
+    position = 0
+    for literal in literals:
+        slot = literal.kind if literal.has_year else "day"
+        parts.append(question[position : literal.start])
+        parts.append(f" {slot}slot ")
+        position = literal.end
+    parts.append(question[position:])
+    return normalize_question("".join(parts))
+
+
+def _date_year(content: str, literal: QuestionLiteral) -> int | None:
+    """Год sql-даты `content`, если ее день и месяц совпали с литералом."""
+    date_match = _SQL_DATE_RE.fullmatch(content)
+    value = literal.value
+    if date_match is None or not isinstance(value, date):
+        return None
+    year, month, day = map(int, date_match.groups())
+    if (month, day) != (value.month, value.day):
+        return None
+    if literal.has_year and year != value.year:
+        return None
+    return year
+
+
+def _occurrence(
+    token: str, literal: QuestionLiteral
+) -> tuple[bool, int | None]:
+    """Совпал ли sql-литерал `token` с литералом вопроса и год даты."""
+    is_string = token.endswith("'")
+    if not is_string:
+        return literal.kind == "number" and int(token) == literal.value, None
+
+    content = token[token.index("'") + 1 : -1]
+    if literal.kind == "uuid":
+        return content.lower() == str(literal.value), None
+    if literal.kind == "date":
+        year = _date_year(content, literal)
+        return year is not None, year
+    return False, None
+
+
+def _in_date_arithmetic(sql_query: str, start: int) -> bool:
+    return _DATE_ARITHMETIC_RE.search(sql_query, 0, start) is not None
+
+
+def _has_unmapped_numbers(sql_query: str, mapped: set[int]) -> bool:
+    """Остались ли в sql числа, не связанные ни с одним литералом вопроса.
+
+    такое число - константа из конкретного вопроса ("1 тысяча" -> 1000),
+    и шаблон с ним вернул бы неверный ответ на вопрос с другим числом.
+    константами остаются только 0, 1 и сдвиги дат в днях
+    """
+    for match in _SQL_LITERAL_RE.finditer(sql_query):
+        token = match.group()
+        if (
+            token.endswith("'")
+            or token in _STRUCTURAL_NUMBERS
+            or match.start() in mapped
+        ):
+            continue
+        if not _in_date_arithmetic(sql_query, match.start()):
+            return True
+    return False
+
+
+def _find_occurrences(
+    sql_query: str, literal: QuestionLiteral
+) -> list[tuple[int, int, int | None]] | None:
+    """Вхождения литерала в sql: [(start, end, year)].
+
+    uuid и число должны встречаться ровно один раз, число - не в сдвиге
+    даты. дата может повторяться (полуинтервал `>= '2025-11-28' AND
+    < DATE '2025-11-28' + 1` для секционированных таблиц), но везде
+    с одним и тем же годом
+    """
+    found: list[tuple[int, int, int | None]] = []
+    for match in _SQL_LITERAL_RE.finditer(sql_query):
+        matched, year = _occurrence(match.group(), literal)
+        if matched and _in_date_arithmetic(sql_query, match.start()):
+            return None
+        if matched:
+            found.append((*match.span(), year))
+
+    if not found:
+        return None
+    if literal.kind == "date":
+        return found if len({year for _, _, year in found}) == 1 else None
+    return found if len(found) == 1 else None
+
+
+class SQLTemplateCache:
+    """Кэш параметризованных sql-шаблонов по форме вопроса.
+
+    после успешного ответа llm литералы вопроса ищутся в sql и заменяются
+    на bind-параметры. следующий вопрос той же формы с другими датами,
+    числами или uuid выполняется по шаблону без обращения к llm
+    """
+
+    def __init__(self, storage: PlanCache) -> None:  # noqa: D107
+        self.storage = storage
+
+    def learn(self, question: str, sql_query: str) -> bool:
+        """Строит шаблон по паре вопрос/sql, если отображение однозначно."""
+        literals = extract_literals(question)
+        if not literals:
+            return False
+
+        spans: list[tuple[int, int, int]] = []
+        slots: list[dict[str, Any]] = []
+        for index, literal in enumerate(literals):
+            occurrences = _find_occurrences(sql_query, literal)
+            if occurrences is None:
+                return False
+            spans.extend((start, end, index) for start, end, _ in occurrences)
+            slots.append(
+                {
+                    "index": index,
+                    "kind": literal.kind,
+                    "default_year": occurrences[0][2],
+                }
+            )
+
+        starts = [start for start, _, _ in spans]
+        if len(set(starts)) != len(starts):
+            # два литерала вопроса указывают на одно место в sql
+            return False
+        if _has_unmapped_numbers(sql_query, set(starts)):
+            return False
+
+        template = sql_query
+        for start, end, index in sorted(spans, reverse=True):
+            template = (
+                f"{template[:start]}"
+                f"CAST(:p{index} AS {_CASTS[literals[index].kind]})"
+                f"{template[end:]}"
+            )
+
+        shape = question_shape(question, literals)
+        self.storage.put(shape, json.dumps({"sql": template, "slots": slots}))
+        logger.debug("learned sql template for shape: %s", shape)
+        return True
+
+    def match(self, question: str) -> tuple[str, BoundTemplate] | None:
+        """Ищет шаблон для вопроса и связывает новые значения литералов."""
+        literals = extract_literals(question)
+        if not literals:
+            return None
+
+        shape = question_shape(question, literals)
+        cached = self.storage.get(shape)
+        if cached is None:
+            return None
+
+        entry = json.loads(cached)
+        slots = entry["slots"]
+        if len(slots) != len(literals):
+            return None
+
+        params: dict[str, Any] = {}
+        for slot, literal in zip(slots, literals, strict=True):
+            if slot["kind"] != literal.kind:
+                return None
+
+            value = literal.value
+            if isinstance(value, date) and not literal.has_year:
+                try:
+                    value = value.replace(year=slot["default_year"])
+                except ValueError:
+                    return None
+            params[f"p{slot['index']}"] = value
+
+        return shape, BoundTemplate(sql=entry["sql"], params=params)
+
+    def invalidate(self, shape: str) -> None:  # noqa: D102
+        self.storage.invalidate(shape)
@@ -1,19 +1,63 @@
+import asyncio
+from dataclasses import asdict
+from functools import partial
+from hashlib import sha256
 import logging
 from pathlib import Path
-from typing import TypedDict
+import time
+from typing import Any
 
 from openai import AsyncOpenAI
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession
-from src.core.settings import LLMSettings
-from src.database.manager import DatabaseManager
+from openai.types.chat import (
+    ChatCompletionContentPartTextParam,
+    ChatCompletionMessageParam,
+    ChatCompletionSystemMessageParam,
+)
+from src.core import metrics
+from src.core.jsonl import JsonlWriter
+from src.core.settings import (
+    LLMSettings,
+    PlanCacheSettings,
+    QueryGuardSettings,
+    QueryLogSettings,
+)
+from src.database.manager import DatabaseManager, ReadConnection
+from src.database.models.base import Base
+from src.llm_service import journal
+from src.llm_service.hedging import LatencyStats, gather_within, race
+from src.llm_service.plan_cache import PlanCache, normalize_question
+from src.llm_service.query_guard import PlanEstimate, QueryGuard
+from src.llm_service.single_flight import SingleFlight
+from src.llm_service.sql_checker import SQLChecker
+from src.llm_service.sql_stream import SQLStreamExtractor, extract_sql
+from src.llm_service.sql_templates import SQLTemplateCache
+from src.llm_service.usage import TokenBudgetExceededError, TokenUsage
 
 logger = logging.getLogger(__name__)
 
 
-class ErrorRecord(TypedDict):  # noqa: D101
-    sql: str
-    error: str
+SQLFlightKey = tuple[str, tuple[tuple[str, Any], ...]]
+
+
+class CachedTextPart(ChatCompletionContentPartTextParam, total=False):
+    """Текст с явной точкой кэша openrouter для anthropic и gemini."""
+
+    cache_control: dict[str, str]
+
+
+def system_message(
+    prompt: str, cache_control: bool
+) -> ChatCompletionSystemMessageParam:
+    """Собирает системное сообщение, с точкой кэша при `cache_control`."""
+    if not cache_control:
+        return {"role": "system", "content": prompt}
+
+    part: CachedTextPart = {
+        "type": "text",
+        "text": prompt,
+        "cache_control": {"type": "ephemeral"},
+    }
+    return {"role": "system", "content": [part]}
 
 
 class TextToSQLService:  # noqa: D101
@@ -21,24 +65,78 @@ class TextToSQLService:  # noqa: D101
     PROMPT_DIR_NAME = "prompts"
     ON_START_PROMPT_FILE = "on_start.md"
     ON_ERROR_PROMPT_FILE = "on_error.md"
+    PLAN_CACHE_FILE = "plan_cache.json"
+    TEMPLATE_CACHE_FILE = "sql_templates.json"
 
     def __init__(  # noqa: D107
         self,
         llm_settings: LLMSettings,
         db_manager: DatabaseManager,
+        plan_cache_settings: PlanCacheSettings,
+        query_log_settings: QueryLogSettings,
+        query_guard_settings: QueryGuardSettings,
     ) -> None:
         self.llm_settings = llm_settings
         self.db_manager = db_manager
+        self.plan_cache_settings = plan_cache_settings
         self.max_retries = self.MAX_RETRIES
 
         self.client = AsyncOpenAI(
             api_key=llm_settings.api_key.get_secret_value(),
-            base_url="https://openrouter.ai/api/v1",
+            base_url=llm_settings.base_url,
+            timeout=llm_settings.timeout_seconds,
         )
+        self.models = [llm_settings.model, *llm_settings.fallback_models]
+        self.latency = LatencyStats()
+        # все токены с запуска процесса
+        self.usage_total = TokenUsage()
 
         self.prompts_dir = Path(__file__).parent / self.PROMPT_DIR_NAME
         self.on_start_prompt = self._load_prompt(self.ON_START_PROMPT_FILE)
         self.on_error_prompt = self._load_prompt(self.ON_ERROR_PROMPT_FILE)
+        self.system_message = system_message(
+            self.on_start_prompt, llm_settings.prompt_cache_control
+        )
+
+        prompt_fingerprint = sha256(self.on_start_prompt.encode()).hexdigest()
+        self.plan_cache = PlanCache(
+            fingerprint=prompt_fingerprint,
+            max_size=plan_cache_settings.max_size,
+            ttl_seconds=plan_cache_settings.ttl_seconds,
+            path=plan_cache_settings.dir / self.PLAN_CACHE_FILE,
+        )
+        self.template_cache = SQLTemplateCache(
+            PlanCache(
+                fingerprint=prompt_fingerprint,
+                max_size=plan_cache_settings.max_size,
+                ttl_seconds=plan_cache_settings.ttl_seconds,
+                path=plan_cache_settings.dir / self.TEMPLATE_CACHE_FILE,
+            )
+        )
+        if plan_cache_settings.enabled:
+            self.plan_cache.load()
+        if plan_cache_settings.templates_enabled:
+            self.template_cache.storage.load()
+
+        # одинаковые вопросы и одинаковый итоговый sql,
+        # пришедшие одновременно, выполняются один раз
+        self._query_flights: SingleFlight[str, int] = SingleFlight()
+        self._sql_flights: SingleFlight[SQLFlightKey, int] = SingleFlight()
+
+        self.query_guard = QueryGuard(query_guard_settings)
+        self.sql_checker = (
+            SQLChecker(Base.metadata) if query_guard_settings.precheck else None
+        )
+        self.query_log = (
+            JsonlWriter(query_log_settings.path)
+            if query_log_settings.enabled
+            else None
+        )
+        self.query_journal = (
+            JsonlWriter(query_log_settings.journal_path)
+            if query_log_settings.journal_enabled
+            else None
+        )
 
     def _load_prompt(self, filename: str) -> str:
         prompt_path = self.prompts_dir / filename
@@ -47,47 +145,160 @@ class TextToSQLService:  # noqa: D101
             raise FileNotFoundError(f"prompt file not found: {prompt_path}")
 
         content = prompt_path.read_text(encoding="utf-8")
-        logger.debug(f"loaded prompt from {filename}")
+        logger.debug("loaded prompt from %s", filename)
         return content
 
+    def _messages(
+        self, user_query: str, turns: list[ChatCompletionMessageParam]
+    ) -> list[ChatCompletionMessageParam]:
+        # схема - одинаковый префикс всех вызовов, провайдер кэширует его;
+        # повторы дописывают ходы в конец, не меняя начало
+        return [
+            self.system_message,
+            {"role": "user", "content": user_query},
+            *turns,
+        ]
+
+    async def _stream_sql(
+        self, model: str, messages: list[ChatCompletionMessageParam]
+    ) -> tuple[str, TokenUsage]:
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        extractor = SQLStreamExtractor()
+        usage: TokenUsage | None = None
+        # выход из `async with` закрывает соединение, и модель перестает
+        # генерировать текст после запроса
+        async with stream:
+            async for chunk in stream:
+                # usage приходит последним куском, только если дочитать
+                if chunk.usage is not None:
+                    usage = TokenUsage.from_completion(chunk.usage)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                sql_query = extractor.feed(chunk.choices[0].delta.content)
+                if sql_query is not None:
+                    return sql_query, TokenUsage.estimate(messages, sql_query)
+
+        sql_query = extractor.finish()
+        return sql_query, usage or TokenUsage.estimate(messages, sql_query)
+
+    async def _request_completion(
+        self,
+        model: str,
+        messages: list[ChatCompletionMessageParam],
+        usage: TokenUsage,
+    ) -> str:
+        started = time.perf_counter()
+        try:
+            if self.llm_settings.stream:
+                sql_query, call_usage = await self._stream_sql(model, messages)
+            else:
+                response = await self.client.chat.completions.create(
+                    model=model, messages=messages
+                )
+                content = response.choices[0].message.content or ""
+                sql_query = extract_sql(content)
+                call_usage = (
+                    TokenUsage.from_completion(response.usage)
+                    if response.usage
+                    else TokenUsage.estimate(messages, content)
+                )
+        except asyncio.CancelledError:
+            # промпт отмененного хеджа провайдер уже принял
+            usage.add(TokenUsage.estimate(messages))
+            # ответ пришел бы не раньше отмены: без этого замера в окне
+            # остаются только быстрые ответы и хедж стартует слишком рано
+            self.latency.observe(model, time.perf_counter() - started)
+            raise
+        elapsed = time.perf_counter() - started
+        self.latency.observe(model, elapsed)
+        metrics.LLM_REQUEST_SECONDS.observe(elapsed, model=model)
+        usage.add(call_usage)
+
+        if not sql_query:
+            raise ValueError(f"{model} returned empty response")
+        return sql_query
+
+    def _hedge_delay(self, model: str) -> float:
+        settings = self.llm_settings
+        if self.latency.count(model) < settings.hedge_min_samples:
+            return settings.hedge_delay_seconds
+        delay = self.latency.percentile(model, settings.hedge_percentile)
+        return max(delay or 0.0, settings.hedge_min_delay_seconds)
+
+    def _is_valid_sql(self, sql_query: str) -> bool:
+        try:
+            self._validate_sql(sql_query)
+        except ValueError:
+            return False
+        return True
+
     async def _call_llm(
         self,
-        user_message: str,
-        system_prompt: str | None = None,
+        user_query: str,
+        turns: list[ChatCompletionMessageParam] | None = None,
+        usage: TokenUsage | None = None,
     ) -> str:
+        messages = self._messages(user_query, turns or [])
+        usage = usage if usage is not None else TokenUsage()
+        calls = (
+            1 + self.llm_settings.max_hedges if self.llm_settings.hedge else 1
+        )
+        # хеджи идут по запасным моделям по кругу
+        models = [
+            self.models[index % len(self.models)] for index in range(calls)
+        ]
         try:
-            response = await self.client.chat.completions.create(
-                model=self.llm_settings.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt or self.on_start_prompt,
-                    },
-                    {"role": "user", "content": user_message},
-                ],
-            )
-            if not response.choices[0].message.content:
-                raise ValueError("llm returned empty response")
-            sql_query = response.choices[0].message.content.strip()
-            logger.debug(f"llm generated sql: {sql_query}")
+            with journal.stage("llm"):
+                sql_query = await race(
+                    [
+                        partial(
+                            self._request_completion, model, messages, usage
+                        )
+                        for model in models
+                    ],
+                    hedge_after=lambda index: self._hedge_delay(
+                        models[index - 1]
+                    ),
+                    accept=self._is_valid_sql,
+                )
+            logger.debug("llm generated sql: %s", sql_query)
             return sql_query
         except Exception as llm_error:
-            logger.error(f"llm call failed: {llm_error}")
+            logger.error("llm call failed: %s", llm_error)
             raise
 
     def _validate_sql(self, sql_query: str) -> None:
+        with journal.stage("validate"):
+            self._check_sql(sql_query)
+
+    def _check_sql(self, sql_query: str) -> None:
+        if self.sql_checker is not None:
+            # ошибки имен и формы ловятся без похода в базу
+            self.sql_checker.check(sql_query)
+            return
+
         normalized = sql_query.strip().upper()
         if not normalized.startswith("SELECT"):
             raise ValueError(
                 f"only SELECT queries are allowed, got: {sql_query[:50]}"
             )
 
-    async def _execute_sql(self, session: AsyncSession, sql_query: str) -> int:
+    async def _execute_sql(
+        self,
+        connection: ReadConnection,
+        sql_query: str,
+        params: dict[str, Any] | None = None,
+    ) -> int:
         if not sql_query.strip():
             raise ValueError("empty sql query")
 
-        result = await session.execute(text(sql_query))
-        row = result.fetchone()
+        with journal.stage("sql"):
+            row = await connection.fetchrow(sql_query, params)
 
         if row is None or row[0] is None:
             raise ValueError("query returned no results or NULL")
@@ -100,89 +311,393 @@ class TextToSQLService:  # noqa: D101
                 f"(type: {type(row[0]).__name__})"
             ) from e
 
-    def _format_error_prompt(
-        self, user_query: str, error_history: list[ErrorRecord]
-    ) -> str:
-        if not error_history:
-            error_history_text = "ошибок пока не было"
-            last_error = ""
-        else:
-            error_parts: list[str] = []
-            for attempt_number, error_record in enumerate(error_history, 1):
-                sql = error_record.get("sql", "N/A")
-                error = error_record.get("error", "N/A")
-                error_parts.append(
-                    f"попытка {attempt_number}\n"
-                    f"sql-query: {sql}\n"
-                    f"ошибка: {error}\n"
-                )
-            error_history_text = "\n".join(error_parts).strip()
-            last_error = error_history[-1].get("error", "")
-
+    def _format_error_turn(self, error: str) -> str:
         try:
-            return self.on_error_prompt.format(
-                user_query=user_query,
-                error_history=error_history_text,
-                last_error=last_error,
-            )
-
+            return self.on_error_prompt.format(last_error=error)
         except KeyError as key_error:
             raise RuntimeError(
                 f"error on formatting on_error.md: {key_error}"
             ) from key_error
 
-    async def process_query(  # noqa: D102
+    async def _run_sql_once(
         self,
-        user_query: str,
+        sql_query: str,
+        params: dict[str, Any] | None,
+        plan_estimate: PlanEstimate | None,
     ) -> int:
-        logger.info(f"user query: {user_query}")
+        started = time.perf_counter()
+        error: str | None = None
+        try:
+            async with self.db_manager.read() as connection:
+                with journal.stage("explain"):
+                    await self.query_guard.check(
+                        connection, sql_query, params, plan_estimate
+                    )
+                return await self._execute_sql(connection, sql_query, params)
+        except Exception as sql_error:
+            error = str(sql_error)
+            raise
+        finally:
+            if self.query_log is not None:
+                self.query_log.write(
+                    {
+                        "at": time.time(),
+                        "sql": sql_query,
+                        "params": params,
+                        "elapsed_ms": (time.perf_counter() - started) * 1000,
+                        "error": error,
+                    }
+                )
+
+    async def _run_sql(
+        self,
+        sql_query: str,
+        params: dict[str, Any] | None = None,
+        plan_estimate: PlanEstimate | None = None,
+    ) -> int:
+        key = (sql_query, tuple(sorted((params or {}).items())))
+        return await self._sql_flights.run(
+            key, partial(self._run_sql_once, sql_query, params, plan_estimate)
+        )
 
-        error_history: list[ErrorRecord] = []
-        sql_query: str = ""
+    async def _save_caches(self) -> None:
+        for cache in (self.plan_cache, self.template_cache.storage):
+            snapshot = cache.dump()
+            if snapshot is None:
+                continue
 
-        for attempt in range(self.max_retries):
             try:
-                logger.info(
-                    f"attempt {attempt + 1}/{self.max_retries} "
-                    f"for query: {user_query}"
+                await asyncio.to_thread(cache.write, snapshot)
+            except OSError as write_error:
+                logger.warning(
+                    "failed to persist %s: %s", cache.path, write_error
                 )
 
-                if attempt == 0:
-                    sql_query = await self._call_llm(user_query)
-                else:
-                    error_prompt = self._format_error_prompt(
-                        user_query, error_history
-                    )
-                    sql_query = await self._call_llm(
-                        user_message=user_query,
-                        system_prompt=error_prompt,
-                    )
+    async def _execute_cached_plan(self, cache_key: str) -> int | None:
+        sql_query = self.plan_cache.get(cache_key)
+        if sql_query is None:
+            return None
 
-                self._validate_sql(sql_query)
+        try:
+            result = await self._run_sql(sql_query)
+        except Exception as cached_error:
+            journal.record_attempt(
+                "plan_cache", sql_query, error=str(cached_error)
+            )
+            # схема или данные могли поменяться, план больше не годится
+            logger.warning("cached plan failed, evicting: %s", cached_error)
+            self.plan_cache.invalidate(cache_key)
+            return None
 
-                async with self.db_manager.session() as session:
-                    result = await self._execute_sql(session, sql_query)
-                    logger.info(
-                        f"query succeeded on {attempt + 1} attempt "
-                        f"result: {result}"
-                    )
+        journal.record_attempt("plan_cache", sql_query)
+        logger.info("plan cache hit, result: %s", result)
+        return result
+
+    async def _execute_template(self, user_query: str) -> int | None:
+        matched = self.template_cache.match(user_query)
+        if matched is None:
+            return None
+
+        shape, template = matched
+        try:
+            result = await self._run_sql(template.sql, template.params)
+        except Exception as template_error:
+            journal.record_attempt(
+                "template",
+                template.sql,
+                template.params,
+                error=str(template_error),
+            )
+            logger.warning("sql template failed, evicting: %s", template_error)
+            self.template_cache.invalidate(shape)
+            return None
+
+        journal.record_attempt("template", template.sql, template.params)
+        logger.info("sql template hit, result: %s", result)
+        return result
+
+    def _remember(
+        self, user_query: str, cache_key: str, sql_query: str
+    ) -> None:
+        if self.plan_cache_settings.enabled:
+            self.plan_cache.put(cache_key, sql_query)
+        if self.plan_cache_settings.templates_enabled:
+            self.template_cache.learn(user_query, sql_query)
+
+    async def close(self) -> None:  # noqa: D102
+        await self._save_caches()
+        for writer in (self.query_log, self.query_journal):
+            if writer is not None:
+                await asyncio.to_thread(writer.close)
+
+    async def process_query(
+        self, user_query: str, coalesce: bool = True
+    ) -> int:
+        """Отвечает на вопрос пользователя числом.
+
+        одинаковые одновременные вопросы по умолчанию склеиваются в один
+        расчет; `coalesce=False` считает каждый вопрос отдельно - так
+        нагрузочный прогон меряет реальную работу на запрос
+        """
+        logger.info("user query: %s", user_query)
+
+        cache_key = normalize_question(user_query)
+        resolve = partial(self._resolve_query, user_query, cache_key)
+        with (
+            metrics.STAGE_SECONDS.time(stage="process"),
+            journal.trace_query(user_query) as trace,
+        ):
+            try:
+                result = await (
+                    self._query_flights.run(cache_key, resolve)
+                    if coalesce
+                    else resolve()
+                )
+                trace.result = result
+            except Exception as error:
+                trace.error = str(error)
+                raise
+            finally:
+                if trace.source is None and coalesce:
+                    # ответ посчитан для такого же одновременного вопроса
+                    trace.source = "shared"
+                    metrics.QUERIES.inc(source="shared")
+                if self.query_journal is not None:
+                    self.query_journal.write(trace.record())
+        return result
+
+    def _account(self, source: str, usage: TokenUsage | None = None) -> None:
+        metrics.QUERIES.inc(source=source)
+        trace = journal.current_trace()
+        if trace is not None:
+            trace.source = source
+        if usage is None:
+            return
+
+        metrics.LLM_TOKENS.inc(usage.prompt_tokens, kind="prompt")
+        metrics.LLM_TOKENS.inc(usage.cached_tokens, kind="cached")
+        metrics.LLM_TOKENS.inc(usage.completion_tokens, kind="completion")
+        if trace is not None:
+            trace.usage = asdict(usage)
+        self.usage_total.add(usage)
+        logger.info("llm usage for query: %s", usage)
+
+    async def _resolve_query(self, user_query: str, cache_key: str) -> int:
+        if self.plan_cache_settings.enabled:
+            cached_result = await self._execute_cached_plan(cache_key)
+            if cached_result is not None:
+                self._account("plan_cache")
+                return cached_result
+
+        if self.plan_cache_settings.templates_enabled:
+            template_result = await self._execute_template(user_query)
+            if template_result is not None:
+                self._account("template")
+                return template_result
+
+        turns: list[ChatCompletionMessageParam] = []
+        usage = TokenUsage()
+        source = "failed"
+        try:
+            attempts = self.max_retries
+            if self.llm_settings.candidates > 1:
+                # первая попытка - сразу несколько вариантов sql
+                attempts -= 1
+                result = await self._try_candidates(
+                    user_query, cache_key, turns, usage
+                )
+                if result is not None:
+                    source = "candidates"
                     return result
 
+            result = await self._retry_with_feedback(
+                user_query, cache_key, turns, usage, attempts
+            )
+            source = "llm"
+            return result
+        finally:
+            self._account(source, usage)
+
+    async def _accept(
+        self, user_query: str, cache_key: str, sql_query: str
+    ) -> None:
+        self._remember(user_query, cache_key, sql_query)
+        await self._save_caches()
+
+    def _add_error_turns(
+        self,
+        turns: list[ChatCompletionMessageParam],
+        sql_query: str,
+        error: str,
+    ) -> None:
+        turns += [
+            {"role": "assistant", "content": sql_query},
+            {"role": "user", "content": self._format_error_turn(error)},
+        ]
+
+    async def _rank_candidates(
+        self, candidates: list[str]
+    ) -> tuple[list[tuple[str, PlanEstimate]], list[tuple[str, str]]]:
+        """Кандидаты с оценкой плана от дешевого и отклоненные explain."""
+
+        async def explain(sql_query: str) -> PlanEstimate:
+            # у каждого кандидата свое соединение: ошибка explain
+            # обрывает транзакцию, а планирование идет параллельно
+            async with self.db_manager.read() as connection:
+                return await self.query_guard.plan_estimate(
+                    connection, sql_query
+                )
+
+        estimates = await asyncio.gather(
+            *(explain(sql_query) for sql_query in candidates),
+            return_exceptions=True,
+        )
+        ranked: list[tuple[str, PlanEstimate]] = []
+        failed: list[tuple[str, str]] = []
+        for sql_query, plan in zip(candidates, estimates, strict=True):
+            if isinstance(plan, BaseException):
+                failed.append((sql_query, str(plan)))
+            else:
+                ranked.append((sql_query, plan))
+        ranked.sort(key=lambda item: item[1].total_cost)
+        return ranked, failed
+
+    async def _try_candidates(
+        self,
+        user_query: str,
+        cache_key: str,
+        turns: list[ChatCompletionMessageParam],
+        usage: TokenUsage,
+    ) -> int | None:
+        """Генерирует кандидатов параллельно и выполняет от дешевого.
+
+        если все кандидаты не подошли, в `turns` попадает ошибка лучшего
+        из них для последовательных исправлений
+        """
+        metrics.ATTEMPTS.inc(kind="candidates")
+        messages = self._messages(user_query, turns)
+        models = [
+            self.models[index % len(self.models)]
+            for index in range(self.llm_settings.candidates)
+        ]
+        valid, invalid, errors = await gather_within(
+            [
+                partial(self._request_completion, model, messages, usage)
+                for model in models
+            ],
+            accept=self._is_valid_sql,
+            grace_seconds=self.llm_settings.candidates_grace_seconds,
+        )
+        for llm_error in errors:
+            metrics.FAILURES.inc(reason=type(llm_error).__name__)
+            journal.record_attempt("candidate", None, error=str(llm_error))
+            logger.warning("candidate generation failed: %s", llm_error)
+
+        ranked, failed = await self._rank_candidates(list(dict.fromkeys(valid)))
+        logger.info(
+            "%s runnable of %s candidates for query: %s",
+            len(ranked),
+            len(models),
+            user_query,
+        )
+        run_failures: list[tuple[str, str]] = []
+        for sql_query, plan_estimate in ranked:
+            try:
+                # план уже получен при ранжировании, второй EXPLAIN не нужен
+                result = await self._run_sql(
+                    sql_query, plan_estimate=plan_estimate
+                )
+            except Exception as sql_error:
+                metrics.FAILURES.inc(reason=type(sql_error).__name__)
+                journal.record_attempt(
+                    "candidate", sql_query, error=str(sql_error)
+                )
+                logger.warning("candidate failed: %s", sql_error)
+                run_failures.append((sql_query, str(sql_error)))
+                continue
+
+            journal.record_attempt("candidate", sql_query)
+            logger.info("candidate succeeded, result: %s", result)
+            await self._accept(user_query, cache_key, sql_query)
+            return result
+
+        for sql_query in invalid:
+            try:
+                self._validate_sql(sql_query)
+            except ValueError as check_error:
+                failed.append((sql_query, str(check_error)))
+        for sql_query, error in failed:
+            journal.record_attempt("candidate", sql_query, error=error)
+        # ошибка выполнения самого дешевого кандидата полезнее всего
+        feedback = run_failures + failed
+        if feedback:
+            self._add_error_turns(turns, *feedback[0])
+        return None
+
+    async def _retry_with_feedback(
+        self,
+        user_query: str,
+        cache_key: str,
+        turns: list[ChatCompletionMessageParam],
+        usage: TokenUsage,
+        attempts: int,
+    ) -> int:
+        budget = self.llm_settings.token_budget
+        error_message = "all candidates failed"
+
+        for attempt in range(attempts):
+            if budget is not None and usage.total_tokens >= budget:
+                metrics.FAILURES.inc(reason=TokenBudgetExceededError.__name__)
+                raise TokenBudgetExceededError(
+                    f"token budget {budget} exhausted: {usage}"
+                )
+
+            sql_query = ""
+            metrics.ATTEMPTS.inc(kind="sequential")
+            try:
+                logger.debug(
+                    "attempt %s/%s for query: %s",
+                    attempt + 1,
+                    attempts,
+                    user_query,
+                )
+
+                sql_query = await self._call_llm(user_query, turns, usage)
+                self._validate_sql(sql_query)
+
+                result = await self._run_sql(sql_query)
+                logger.info(
+                    "query succeeded on %s attempt result: %s",
+                    attempt + 1,
+                    result,
+                )
+
+                journal.record_attempt("llm", sql_query)
+                await self._accept(user_query, cache_key, sql_query)
+                return result
+
             except Exception as error:
                 error_message = str(error)
-                logger.warning(f"attempt {attempt + 1} failed: {error_message}")
-
-                error_history.append(
-                    {
-                        "sql": sql_query,
-                        "error": error_message,
-                    }
+                metrics.FAILURES.inc(reason=type(error).__name__)
+                journal.record_attempt(
+                    "llm", sql_query or None, error=error_message
+                )
+                logger.warning(
+                    "attempt %s failed: %s", attempt + 1, error_message
                 )
 
-                if attempt == self.max_retries - 1:
+                # если llm ответила, исправление просится отдельным ходом;
+                # упавший вызов llm просто повторяется
+                if sql_query:
+                    self._add_error_turns(turns, sql_query, error_message)
+
+                if attempt == attempts - 1:
                     raise Exception(
                         f"failed to execute query after "
-                        f"{self.max_retries} attempts: {error_message}"
+                        f"{attempts} attempts: {error_message}"
                     ) from error
 
-        raise Exception("unexpected error")
+        raise Exception(
+            f"failed to execute query after {attempts} attempts: "
+            f"{error_message}"
+        )
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+import math
+from typing import Any
+
+from openai.types import CompletionUsage
+
+# грубая оценка для ответов без `usage` (поток закрыт до конца, запрос
+# отменен хеджем): около четырех символов на токен
+CHARS_PER_TOKEN = 4
+
+
+class TokenBudgetExceededError(RuntimeError):
+    """Запрос пользователя израсходовал бюджет токенов."""
+
+
+def estimate_tokens(text: str) -> int:  # noqa: D103
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(messages: list[Any]) -> int:  # noqa: D103
+    return sum(
+        estimate_tokens(
+            content
+            if isinstance(content := message["content"], str)
+            else "".join(part["text"] for part in content)
+        )
+        for message in messages
+    )
+
+
+@dataclass(slots=True)
+class TokenUsage:
+    """Токены llm за один или несколько вызовов."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # часть prompt_tokens, прочитанная провайдером из кэша префикса
+    cached_tokens: int = 0
+    calls: int = 0
+    estimated_calls: int = 0
+
+    @property
+    def total_tokens(self) -> int:  # noqa: D102
+        return self.prompt_tokens + self.completion_tokens
+
+    @classmethod
+    def from_completion(cls, usage: CompletionUsage) -> "TokenUsage":
+        """Из поля `usage` ответа chat.completions."""
+        details = usage.prompt_tokens_details
+        return cls(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=(details.cached_tokens or 0) if details else 0,
+            calls=1,
+        )
+
+    @classmethod
+    def estimate(
+        cls, messages: list[Any], completion: str = ""
+    ) -> "TokenUsage":
+        """Оценка по длине текста, когда провайдер не прислал `usage`."""
+        return cls(
+            prompt_tokens=estimate_prompt_tokens(messages),
+            completion_tokens=estimate_tokens(completion),
+            calls=1,
+            estimated_calls=1,
+        )
+
+    def add(self, other: "TokenUsage") -> None:  # noqa: D102
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.calls += other.calls
+        self.estimated_calls += other.estimated_calls
+
+    def __str__(self) -> str:  # noqa: D105
+        estimated = (
+            f", {self.estimated_calls} estimated"
+            if self.estimated_calls
+            else ""
+        )
+        return (
+            f"{self.total_tokens} tokens (prompt {self.prompt_tokens}, "
+            f"cached {self.cached_tokens}, "
+            f"completion {self.completion_tokens}) in {self.calls} calls"
+            f"{estimated}"
+        )
@@ -1,21 +1,19 @@
 from asyncio import run
-from logging import DEBUG, basicConfig
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from src.bot.handlers import router
+from src.bot.webhook import run_webhook
 from src.container import Container
-
-basicConfig(
-    level=DEBUG,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-)
+from src.core import metrics
+from src.core.logs import setup_logging
 
 
 async def main() -> None:  # noqa: D103
     container = Container()
     container.wire(modules=["src.bot.handlers"])
+    log_listener = setup_logging(container.logging_settings())
 
     bot_settings = container.bot_settings()
 
@@ -27,12 +25,37 @@ async def main() -> None:  # noqa: D103
     dp = Dispatcher()
     dp.include_router(router)
 
+    metrics_settings = container.metrics_settings()
+    metrics_runner = None
+    if metrics_settings.enabled:
+        scheduler = container.query_scheduler()
+        database_manager = container.database_manager_ro()
+        metrics.SCHEDULER_QUEUED.set_function(lambda: scheduler.queued)
+        metrics.SCHEDULER_RUNNING.set_function(lambda: scheduler.running)
+        metrics.READ_POOL_SIZE.set_function(
+            lambda: database_manager.read_pool_stats()[0]
+        )
+        metrics.READ_POOL_IDLE.set_function(
+            lambda: database_manager.read_pool_stats()[1]
+        )
+        metrics_runner = await metrics.start_metrics_server(
+            metrics_settings.host, metrics_settings.port
+        )
+
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        if bot_settings.mode == "webhook":
+            await run_webhook(dp, bot, bot_settings)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await container.query_scheduler().close()
+        await container.llm_service().close()
         await container.database_manager_rw().close()
         await container.database_manager_ro().close()
+        log_listener.stop()
 
 
 if __name__ == "__main__":
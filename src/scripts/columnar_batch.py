@@ -0,0 +1,131 @@
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any
+
+VIDEO_COLUMNS: tuple[str, ...] = (
+    "id",
+    "creator_id",
+    "video_created_at",
+    "views_count",
+    "likes_count",
+    "comments_count",
+    "reports_count",
+    "created_at",
+    "updated_at",
+)
+
+SNAPSHOT_COLUMNS: tuple[str, ...] = (
+    "id",
+    "video_id",
+    "views_count",
+    "likes_count",
+    "comments_count",
+    "reports_count",
+    "delta_views_count",
+    "delta_likes_count",
+    "delta_comments_count",
+    "delta_reports_count",
+    "created_at",
+    "updated_at",
+)
+
+TIMESTAMP_COLUMNS = frozenset({"video_created_at", "created_at", "updated_at"})
+
+
+class TimestampParser:
+    """`datetime.fromisoformat` с памятью на повторяющиеся строки.
+
+    снапшоты снимаются по расписанию, поэтому у тысяч строк одинаковые
+    `created_at`/`updated_at`: строка разбирается один раз, а все строки
+    пачки ссылаются на один объект datetime (он же один раз попадает
+    в pickle при передаче между процессами)
+    """
+
+    __slots__ = ("_cache", "max_size")
+
+    def __init__(self, max_size: int = 65536) -> None:  # noqa: D107
+        self._cache: dict[str, datetime] = {}
+        self.max_size = max_size
+
+    def parse(self, value: str) -> datetime:  # noqa: D102
+        parsed = self._cache.get(value)
+        if parsed is None:
+            if len(self._cache) >= self.max_size:
+                self._cache.clear()
+            parsed = self._cache[value] = datetime.fromisoformat(value)
+        return parsed
+
+
+class ColumnarBatch:
+    """Пачка строк, хранимая по колонкам.
+
+    вместо словаря на каждую строку - по одному списку на колонку.
+    uuid остаются строками: asyncpg сам кодирует их в 16 байт бинарного
+    протокола на стороне C, без промежуточных объектов `uuid.UUID`.
+    буферы переиспользуются между пачками через `clear`
+    """
+
+    __slots__ = ("columns", "names")
+
+    def __init__(self, names: tuple[str, ...]) -> None:  # noqa: D107
+        self.names = names
+        self.columns: tuple[list[Any], ...] = tuple([] for _ in names)
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self.columns[0])
+
+    def column(self, name: str) -> list[Any]:  # noqa: D102
+        return self.columns[self.names.index(name)]
+
+    def clear(self) -> None:  # noqa: D102
+        for column in self.columns:
+            column.clear()
+
+    def extend(
+        self, items: list[dict[str, Any]], timestamps: TimestampParser
+    ) -> None:
+        """Дописывает сырые элементы json, разбирая колонку за колонкой."""
+        for name, column in zip(self.names, self.columns, strict=True):
+            if name in TIMESTAMP_COLUMNS:
+                parse = timestamps.parse
+                column.extend([parse(item[name]) for item in items])
+            else:
+                column.extend([item[name] for item in items])
+
+    def records(self) -> Iterator[tuple[Any, ...]]:
+        """Строки для `copy_records_to_table` без материализации списка."""
+        return zip(*self.columns, strict=True)
+
+
+_timestamps = TimestampParser()
+
+
+def convert_raw_batch_columnar(
+    raw_batch: list[dict[str, Any]],
+    videos: ColumnarBatch | None = None,
+    snapshots: ColumnarBatch | None = None,
+) -> tuple[ColumnarBatch, ColumnarBatch]:
+    """Конвертирует сырые видео со снапшотами в колоночные пачки.
+
+    переданные буферы очищаются и заполняются заново. функция уровня
+    модуля, чтобы ее можно было отдать в ProcessPoolExecutor, кэш
+    разбора дат живет в процессе между пачками
+    """
+    videos = videos if videos is not None else ColumnarBatch(VIDEO_COLUMNS)
+    snapshots = (
+        snapshots if snapshots is not None else ColumnarBatch(SNAPSHOT_COLUMNS)
+    )
+    videos.clear()
+    snapshots.clear()
+
+    videos.extend(raw_batch, _timestamps)
+    snapshots.extend(
+        [
+            snapshot_item
+            for video_item in raw_batch
+            for snapshot_item in video_item.get("snapshots", ())
+        ],
+        _timestamps,
+    )
+
+    return videos, snapshots
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+import re
+from time import perf_counter
+
+from sqlalchemy import text
+from src.database.manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# индексы, на которых держатся ограничения (первичный ключ и т.п.),
+# не трогаем: без них не работают внешние ключи и ON CONFLICT
+_SECONDARY_INDEXES_SQL = text("""
+    SELECT i.indexname, i.indexdef
+    FROM pg_indexes AS i
+    JOIN pg_class AS c
+      ON c.relname = i.indexname
+     AND c.relnamespace = to_regnamespace(i.schemaname)
+    WHERE i.schemaname = current_schema()
+      AND i.tablename = ANY(:tables)
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_constraint AS pc WHERE pc.conindid = c.oid
+      )
+    ORDER BY i.tablename, i.indexname
+    """)
+_INDEX_VALID_SQL = text("""
+    SELECT i.indisvalid
+    FROM pg_index AS i
+    JOIN pg_class AS c ON c.oid = i.indexrelid
+    WHERE c.relname = :name
+      AND c.relnamespace = to_regnamespace(current_schema())
+    """)
+# у секционированной таблицы (video_snapshots) pg_indexes отдает
+# `CREATE INDEX ... ON ONLY <родитель>`: такой индекс строится только на
+# родителе, остается невалидным и не попадает в секции
+_ON_ONLY_RE = re.compile(r"\bON ONLY\b")
+
+
+class DeferredIndexes:
+    """Снимает вторичные индексы на время массовой загрузки.
+
+    определения индексов берутся из базы (`pg_indexes`) и сохраняются
+    в файл до удаления: если загрузка упадет посреди работы, следующий
+    запуск восстановит индексы из файла, а не потеряет их. после загрузки
+    индексы строятся параллельно на отдельных соединениях, затем ANALYZE
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        database_manager: DatabaseManager,
+        tables: tuple[str, ...],
+        record_path: Path,
+        parallelism: int = 4,
+        maintenance_work_mem: str = "512MB",
+    ) -> None:
+        self.database_manager = database_manager
+        self.tables = tables
+        self.record_path = record_path
+        self.parallelism = parallelism
+        self.maintenance_work_mem = maintenance_work_mem
+
+        self.definitions: dict[str, str] = {}
+
+    async def _record(self) -> None:
+        if self.record_path.exists():
+            # прошлый запуск не дошел до восстановления индексов
+            self.definitions = json.loads(
+                self.record_path.read_text(encoding="utf-8")
+            )
+            logger.warning(
+                "found %s index definitions left by a previous run in %s",
+                len(self.definitions),
+                self.record_path,
+            )
+            return
+
+        async with self.database_manager.session() as session:
+            rows = await session.execute(
+                _SECONDARY_INDEXES_SQL, {"tables": list(self.tables)}
+            )
+            self.definitions = dict(rows)
+
+        self.record_path.parent.mkdir(parents=True, exist_ok=True)
+        self.record_path.write_text(
+            json.dumps(self.definitions, indent=2), encoding="utf-8"
+        )
+
+    async def drop(self) -> None:
+        """Запоминает и удаляет вторичные индексы таблиц."""
+        await self._record()
+
+        async with self.database_manager.session(commit=True) as session:
+            for name in self.definitions:
+                await session.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+
+        logger.info("dropped indexes: %s", ", ".join(self.definitions) or "-")
+
+    async def _create(self, name: str, semaphore: asyncio.Semaphore) -> None:
+        # без ONLY индекс родителя рекурсивно строится на всех секциях;
+        # DROP INDEX родителя удалил и их копии
+        definition = _ON_ONLY_RE.sub("ON", self.definitions[name], count=1)
+        definition = definition.replace(" INDEX ", " INDEX IF NOT EXISTS ", 1)
+
+        async with (
+            semaphore,
+            self.database_manager.session(commit=True) as session,
+        ):
+            started = perf_counter()
+            await session.execute(
+                text("SELECT set_config('maintenance_work_mem', :value, true)"),
+                {"value": self.maintenance_work_mem},
+            )
+            await session.execute(text(definition))
+            valid = await session.scalar(_INDEX_VALID_SQL, {"name": name})
+            if not valid:
+                raise RuntimeError(f"index {name} was built invalid")
+            logger.info("built %s in %.1fs", name, perf_counter() - started)
+
+    async def rebuild(self) -> None:
+        """Строит индексы параллельно и обновляет статистику планировщика."""
+        semaphore = asyncio.Semaphore(self.parallelism)
+        await asyncio.gather(
+            *(self._create(name, semaphore) for name in self.definitions)
+        )
+
+        async with self.database_manager.session(commit=True) as session:
+            await session.execute(text(f"ANALYZE {', '.join(self.tables)}"))
+
+        self.record_path.unlink(missing_ok=True)
+        logger.info("rebuilt %s indexes and analyzed", len(self.definitions))
@@ -0,0 +1,225 @@
+r"""Генератор синтетического videos.json для нагрузочных прогонов.
+
+формат тот же, что у demo/videos.json: `{"videos": [...]}`, у каждого
+видео вложенный список `snapshots`. файл пишется поэлементно, память не
+зависит от размера, а диск - зависит: при 30 днях и замере раз в час
+это ~360 снапшотов и ~120 КБ на видео, 100000 видео - около 12 ГБ:
+
+    python -m src.scripts.generate_dataset --videos 100000 --creators 2000 \
+        --days 30 --snapshot-every-hours 1 --skew 1.2 \
+        --output demo/videos_100k.json
+"""
+
+from argparse import ArgumentParser, Namespace
+from bisect import bisect_left
+from collections.abc import Generator
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from itertools import accumulate
+import json
+import logging
+from pathlib import Path
+import random
+from typing import Any
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+# доли лайков, комментариев и жалоб от новых просмотров
+LIKE_RATE = 0.05
+COMMENT_RATE = 0.005
+REPORT_RATE = 0.0002
+# вероятность, что у замера просмотров стало меньше (накрутки списали)
+VIEWS_DROP_PROBABILITY = 0.01
+
+
+@dataclass(slots=True)
+class DatasetSpec:
+    """Размер и форма данных.
+
+    видео публикуются равномерно по окну `days` дней от `start`, замеры
+    идут каждые `snapshot_every_hours` часов от публикации до конца окна
+    (не больше `max_snapshots`). `skew` - показатель степени: креаторы
+    выбираются по закону Ципфа, популярность видео - по Парето, поэтому
+    большая часть просмотров и видео приходится на немногих
+    """
+
+    videos: int = 10_000
+    creators: int = 200
+    days: int = 30
+    snapshot_every_hours: int = 1
+    max_snapshots: int | None = None
+    skew: float = 1.2
+    start: datetime = datetime(2025, 11, 1, tzinfo=UTC)
+    seed: int = 42
+
+
+class DatasetGenerator:  # noqa: D101
+    def __init__(self, spec: DatasetSpec) -> None:  # noqa: D107
+        self.spec = spec
+        self.random = random.Random(spec.seed)
+        self.end = spec.start + timedelta(days=spec.days)
+        self.creator_ids = [self._uuid() for _ in range(spec.creators)]
+        self._creator_weights = list(
+            accumulate(
+                1 / (rank**spec.skew) for rank in range(1, spec.creators + 1)
+            )
+        )
+
+    def _uuid(self) -> str:
+        return str(UUID(int=self.random.getrandbits(128), version=4))
+
+    def _creator_id(self) -> str:
+        point = self.random.random() * self._creator_weights[-1]
+        return self.creator_ids[bisect_left(self._creator_weights, point)]
+
+    def _count(self, mean: float) -> int:
+        # экспоненциальное распределение вместо пуассоновского: дешевле
+        # и дает нужный разброс между замерами
+        return int(self.random.expovariate(1 / mean)) if mean > 0 else 0
+
+    def _snapshots(
+        self, video_id: str, published: datetime, popularity: float
+    ) -> list[dict[str, Any]]:
+        step = timedelta(hours=self.spec.snapshot_every_hours)
+        totals = {"views": 0, "likes": 0, "comments": 0, "reports": 0}
+        snapshots: list[dict[str, Any]] = []
+        moment = published + step
+
+        while moment < self.end and (
+            self.spec.max_snapshots is None
+            or len(snapshots) < self.spec.max_snapshots
+        ):
+            age_hours = (moment - published).total_seconds() / 3600
+            views_mean = (
+                20
+                * popularity
+                * self.spec.snapshot_every_hours
+                / (1 + age_hours / 24)
+            )
+            views = self._count(views_mean)
+            if totals["views"] and (
+                self.random.random() < VIEWS_DROP_PROBABILITY
+            ):
+                views = -self.random.randint(1, min(totals["views"], 50))
+            deltas = {
+                "views": views,
+                "likes": self._count(max(views, 0) * LIKE_RATE),
+                "comments": self._count(max(views, 0) * COMMENT_RATE),
+                "reports": self._count(max(views, 0) * REPORT_RATE),
+            }
+            for key, delta in deltas.items():
+                totals[key] += delta
+
+            timestamp = moment.isoformat()
+            snapshots.append(
+                {
+                    "id": self._uuid(),
+                    "video_id": video_id,
+                    **{f"{key}_count": totals[key] for key in totals},
+                    **{f"delta_{key}_count": deltas[key] for key in deltas},
+                    "created_at": timestamp,
+                    "updated_at": timestamp,
+                }
+            )
+            moment += step
+
+        return snapshots
+
+    def video(self, index: int) -> dict[str, Any]:
+        """Видео с замерами; `index` задает момент публикации."""
+        window = self.end - self.spec.start
+        published = self.spec.start + window * (index / self.spec.videos)
+        video_id = self._uuid()
+        popularity = self.random.paretovariate(self.spec.skew)
+        snapshots = self._snapshots(video_id, published, popularity)
+        last = snapshots[-1] if snapshots else None
+
+        return {
+            "id": video_id,
+            "creator_id": self._creator_id(),
+            "video_created_at": published.isoformat(),
+            **{
+                f"{key}_count": last[f"{key}_count"] if last else 0
+                for key in ("views", "likes", "comments", "reports")
+            },
+            "created_at": published.isoformat(),
+            "updated_at": last["updated_at"] if last else published.isoformat(),
+            "snapshots": snapshots,
+        }
+
+    def videos(self) -> Generator[dict[str, Any]]:  # noqa: D102
+        for index in range(self.spec.videos):
+            yield self.video(index)
+
+
+def write_dataset(spec: DatasetSpec, path: Path) -> tuple[int, int]:
+    """Пишет файл и возвращает число видео и снапшотов."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    videos = snapshots = 0
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('{"videos": [')
+        for video in DatasetGenerator(spec).videos():
+            if videos:
+                file.write(",\n")
+            file.write(json.dumps(video, separators=(",", ":")))
+            videos += 1
+            snapshots += len(video["snapshots"])
+            if videos % 10_000 == 0:
+                logger.info("written %s/%s videos", videos, spec.videos)
+        file.write("]}\n")
+
+    return videos, snapshots
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    defaults = DatasetSpec()
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--videos", type=int, default=defaults.videos)
+    parser.add_argument("--creators", type=int, default=defaults.creators)
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument(
+        "--snapshot-every-hours",
+        type=int,
+        default=defaults.snapshot_every_hours,
+    )
+    parser.add_argument("--max-snapshots", type=int, default=None)
+    parser.add_argument("--skew", type=float, default=defaults.skew)
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        default=defaults.start,
+        help="начало окна, ISO 8601 с часовым поясом",
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    return parser.parse_args()
+
+
+def main() -> None:  # noqa: D103
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    spec = DatasetSpec(
+        videos=args.videos,
+        creators=args.creators,
+        days=args.days,
+        snapshot_every_hours=args.snapshot_every_hours,
+        max_snapshots=args.max_snapshots,
+        skew=args.skew,
+        start=args.start,
+        seed=args.seed,
+    )
+    videos, snapshots = write_dataset(spec, args.output)
+    size_mb = args.output.stat().st_size / 2**20
+    logger.info(
+        "%s: %s videos, %s snapshots, %.1f MB",
+        args.output,
+        videos,
+        snapshots,
+        size_mb,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+r"""Подбор индексов по журналу запросов, которые реально выполнял бот.
+
+журнал пишет TextToSQLService (QUERY_LOG_*). запросы группируются по
+отпечатку, медленные группы перезапускаются с EXPLAIN (ANALYZE, BUFFERS)
+на readonly-соединении, по планам ищутся Seq Scan с фильтрами и Sort:
+
+    POSTGRES_HOST=localhost python -m src.scripts.index_advisor
+    POSTGRES_HOST=localhost python -m src.scripts.index_advisor \
+        --slower-than-ms 50 --emit-migration
+"""
+
+from argparse import ArgumentParser, Namespace
+from asyncio import run
+from collections.abc import Generator, Iterable
+from dataclasses import dataclass, field
+from datetime import date
+import json
+import logging
+from pathlib import Path
+import re
+from statistics import quantiles
+from typing import Any, cast
+from uuid import UUID
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from alembic.util import rev_id
+from dependency_injector.wiring import Provide, inject
+from sqlalchemy import Date, DateTime, Table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.container import Container
+from src.core.jsonl import read_jsonl
+from src.core.settings import QueryLogSettings
+from src.database.manager import DatabaseManager
+from src.database.models.base import Base
+
+logger = logging.getLogger(__name__)
+
+PlanNode = dict[str, Any]
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.$:])\d+(?:\.\d+)?(?![\w.])")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_UUID_RE = re.compile(r"^[0-9a-f]{8}-(?:[0-9a-f]{4}-){3}[0-9a-f]{12}$", re.I)
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# месячные секции `<таблица>_yYYYYmMM` относятся к родителю
+_PARTITION_RE = re.compile(r"^(?P<parent>\w+)_y\d{4}m\d{2}$")
+
+# `(created_at >= '...'::timestamp with time zone)` в Filter плана
+_PREDICATE_RE = re.compile(
+    r"(?:\b\w+\.)?\b(?P<column>[a-z_][a-z0-9_]*)\)?\s*"
+    r"(?P<operator>=|>=|<=|>|<)\s"
+)
+_AGGREGATE_RE = re.compile(
+    r"\b(?:sum|avg|min|max|count)\s*\(\s*(?:distinct\s+)?"
+    r"(?:\w+\.)?(?P<column>\w+)",
+    re.IGNORECASE,
+)
+_SORT_KEY_RE = re.compile(r"^(?:\w+\.)?(?P<column>\w+)(?:\s+(?:ASC|DESC))?$")
+_INDEX_DEF_RE = re.compile(
+    r"USING (?P<method>\w+) \((?P<columns>[^)]*)\)"
+    r"(?: INCLUDE \((?P<include>[^)]*)\))?"
+)
+
+SEQ_SCAN_NODES = frozenset({"Seq Scan"})
+MAX_INCLUDE_COLUMNS = 4
+# BRIN выгоден, только когда таблица большая и данные лежат по времени
+BRIN_MIN_ROWS = 1_000_000
+MAX_INDEX_NAME = 63
+
+
+def fingerprint(sql_query: str) -> str:
+    """Запрос без литералов: запросы, отличающиеся значениями, совпадают."""
+    normalized = _STRING_RE.sub("?", sql_query)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip().rstrip(";")
+    return normalized.lower()
+
+
+def restore_param(value: Any) -> Any:
+    """Возвращает типы параметров шаблонов, ставших строками в json."""
+    if not isinstance(value, str):
+        return value
+    if _UUID_RE.match(value):
+        return UUID(value)
+    if _ISO_DATE_RE.match(value):
+        return date.fromisoformat(value)
+    return value
+
+
+@dataclass(slots=True)
+class QueryGroup:  # noqa: D101
+    fingerprint: str
+    timings_ms: list[float] = field(default_factory=list)
+    sample_sql: str = ""
+    sample_params: dict[str, Any] | None = None
+    sample_ms: float = -1.0
+
+    def add(  # noqa: D102
+        self, sql_query: str, params: dict[str, Any] | None, elapsed_ms: float
+    ) -> None:
+        self.timings_ms.append(elapsed_ms)
+        # для EXPLAIN берется самый медленный экземпляр
+        if elapsed_ms > self.sample_ms:
+            self.sample_sql = sql_query
+            self.sample_params = params
+            self.sample_ms = elapsed_ms
+
+    @property
+    def count(self) -> int:  # noqa: D102
+        return len(self.timings_ms)
+
+    @property
+    def total_ms(self) -> float:  # noqa: D102
+        return sum(self.timings_ms)
+
+    @property
+    def p95_ms(self) -> float:  # noqa: D102
+        if len(self.timings_ms) < 2:
+            return self.timings_ms[0] if self.timings_ms else 0.0
+        return quantiles(self.timings_ms, n=20)[-1]
+
+
+def collect(records: Iterable[dict[str, Any]]) -> list[QueryGroup]:
+    """Группирует успешные запросы журнала по отпечатку."""
+    groups: dict[str, QueryGroup] = {}
+    for record in records:
+        if record.get("error") or not record.get("sql"):
+            continue
+        key = fingerprint(record["sql"])
+        group = groups.setdefault(key, QueryGroup(key))
+        group.add(record["sql"], record.get("params"), record["elapsed_ms"])
+
+    return sorted(groups.values(), key=lambda group: -group.total_ms)
+
+
+@dataclass(frozen=True, slots=True)
+class IndexSuggestion:  # noqa: D101
+    table: str
+    columns: tuple[str, ...]
+    include: tuple[str, ...] = ()
+    method: str = "btree"
+
+    @property
+    def name(self) -> str:  # noqa: D102
+        suffix = "brin" if self.method == "brin" else "adv"
+        return f"idx_{self.table}_{'_'.join(self.columns)}_{suffix}"[
+            :MAX_INDEX_NAME
+        ]
+
+    def ddl(self) -> str:  # noqa: D102
+        include = (
+            f" INCLUDE ({', '.join(self.include)})" if self.include else ""
+        )
+        return (
+            f"CREATE INDEX {self.name} ON {self.table} "
+            f"USING {self.method} ({', '.join(self.columns)}){include}"
+        )
+
+
+@dataclass(slots=True)
+class Finding:  # noqa: D101
+    suggestion: IndexSuggestion
+    reason: str
+    groups: list[QueryGroup] = field(default_factory=list)
+
+    @property
+    def total_ms(self) -> float:  # noqa: D102
+        return sum(group.total_ms for group in self.groups)
+
+
+def iter_nodes(node: PlanNode) -> Generator[PlanNode]:  # noqa: D103
+    yield node
+    for child in node.get("Plans", ()):
+        yield from iter_nodes(child)
+
+
+def table_of(relation: str | None) -> Table | None:
+    """Таблица модели для узла плана, секция сводится к родителю."""
+    if relation is None:
+        return None
+    partition = _PARTITION_RE.match(relation)
+    if partition is not None and relation not in Base.metadata.tables:
+        relation = partition["parent"]
+    return Base.metadata.tables.get(relation)
+
+
+def _is_temporal(table: Table, column: str) -> bool:
+    return isinstance(table.columns[column].type, DateTime | Date)
+
+
+def _include_columns(
+    table: Table, sql_query: str, key: tuple[str, ...], filtered: list[str]
+) -> tuple[str, ...]:
+    """Колонки под агрегатами и остаток фильтра - для index-only scan."""
+    used = {
+        match["column"].lower() for match in _AGGREGATE_RE.finditer(sql_query)
+    }
+    used.update(filtered)
+    include = tuple(
+        column.name
+        for column in table.columns
+        if column.name in used and column.name not in key
+    )
+    return include if len(include) <= MAX_INCLUDE_COLUMNS else ()
+
+
+def _scan_suggestion(
+    node: PlanNode, table: Table, sql_query: str
+) -> IndexSuggestion | None:
+    equality: list[str] = []
+    ranges: list[str] = []
+    for match in _PREDICATE_RE.finditer(node.get("Filter", "")):
+        column = match["column"]
+        if column not in table.columns:
+            continue
+        target = equality if match["operator"] == "=" else ranges
+        if column not in target:
+            target.append(column)
+
+    ranges = [column for column in ranges if column not in equality]
+    if not equality and not ranges:
+        return None
+
+    scanned = node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)
+    if (
+        not equality
+        and len(ranges) == 1
+        and _is_temporal(table, ranges[0])
+        and scanned >= BRIN_MIN_ROWS
+    ):
+        return IndexSuggestion(table.name, (ranges[0],), method="brin")
+
+    # btree работает с одним диапазоном: равенства, затем диапазон
+    key = (*sorted(equality), *ranges[:1])
+    return IndexSuggestion(
+        table.name, key, _include_columns(table, sql_query, key, ranges)
+    )
+
+
+def _sort_suggestion(node: PlanNode) -> IndexSuggestion | None:
+    tables = {
+        table.name
+        for child in iter_nodes(node)
+        if (table := table_of(child.get("Relation Name"))) is not None
+    }
+    if len(tables) != 1:
+        return None
+
+    table = Base.metadata.tables[tables.pop()]
+    columns: list[str] = []
+    for key in node.get("Sort Key", ()):
+        match = _SORT_KEY_RE.match(key)
+        if match is None or match["column"] not in table.columns:
+            return None
+        columns.append(match["column"])
+    return IndexSuggestion(table.name, tuple(columns)) if columns else None
+
+
+def analyze_plan(
+    plan: PlanNode, sql_query: str
+) -> list[tuple[IndexSuggestion, str]]:
+    """Кандидаты в индексы по одному плану: (индекс, причина)."""
+    suggestions: list[tuple[IndexSuggestion, str]] = []
+    for node in iter_nodes(plan):
+        node_type = node.get("Node Type", "")
+        table = table_of(node.get("Relation Name"))
+
+        if node_type in SEQ_SCAN_NODES and table is not None:
+            suggestion = _scan_suggestion(node, table, sql_query)
+            if suggestion is not None:
+                buffers = node.get("Shared Hit Blocks", 0) + node.get(
+                    "Shared Read Blocks", 0
+                )
+                suggestions.append(
+                    (
+                        suggestion,
+                        f"{node_type} on {node['Relation Name']}: "
+                        f"{node.get('Rows Removed by Filter', 0)} rows "
+                        f"removed by filter, {buffers} buffers",
+                    )
+                )
+
+        elif node_type in {"Sort", "Incremental Sort"}:
+            suggestion = _sort_suggestion(node)
+            if suggestion is not None:
+                suggestions.append(
+                    (
+                        suggestion,
+                        f"Sort by {', '.join(node.get('Sort Key', ()))}",
+                    )
+                )
+
+    return suggestions
+
+
+def _split_columns(definition: str | None) -> tuple[str, ...]:
+    if not definition:
+        return ()
+    return tuple(column.strip().strip('"') for column in definition.split(","))
+
+
+async def existing_indexes(
+    session: AsyncSession,
+) -> dict[str, list[tuple[str, tuple[str, ...], tuple[str, ...]]]]:
+    """Индексы таблиц модели: таблица -> [(метод, ключ, include)]."""
+    rows = await session.execute(
+        text(
+            "SELECT tablename, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = ANY(:tables)"
+        ),
+        {"tables": list(Base.metadata.tables)},
+    )
+
+    indexes: dict[str, list[tuple[str, tuple[str, ...], tuple[str, ...]]]] = {}
+    for table_name, definition in rows:
+        match = _INDEX_DEF_RE.search(definition)
+        if match is None:
+            continue
+        indexes.setdefault(table_name, []).append(
+            (
+                match["method"],
+                _split_columns(match["columns"]),
+                _split_columns(match["include"]),
+            )
+        )
+    return indexes
+
+
+def is_covered(
+    suggestion: IndexSuggestion,
+    indexes: dict[str, list[tuple[str, tuple[str, ...], tuple[str, ...]]]],
+) -> bool:
+    """Есть ли индекс, который уже дает то же самое."""
+    for method, columns, include in indexes.get(suggestion.table, ()):
+        if method != suggestion.method:
+            continue
+        if columns[: len(suggestion.columns)] != suggestion.columns:
+            continue
+        if set(suggestion.include) <= set(columns) | set(include):
+            return True
+    return False
+
+
+async def explain(
+    session: AsyncSession,
+    sql_query: str,
+    params: dict[str, Any] | None,
+    timeout_ms: int,
+) -> PlanNode:
+    """План с фактическими строками и буферами; запрос выполняется."""
+    await session.execute(
+        text("SELECT set_config('statement_timeout', :value, true)"),
+        {"value": str(timeout_ms)},
+    )
+    result = await session.execute(
+        text(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+            f"{sql_query.strip().rstrip(';')}"
+        ),
+        {name: restore_param(value) for name, value in (params or {}).items()},
+    )
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return cast(PlanNode, plan[0]["Plan"])
+
+
+def render_migration(findings: list[Finding], config_path: Path) -> Path:
+    """Пишет ревизию alembic с предложенными индексами."""
+    upgrades: list[str] = []
+    downgrades: list[str] = []
+    for finding in findings:
+        suggestion = finding.suggestion
+        options = ""
+        if suggestion.method != "btree":
+            options += f", postgresql_using={suggestion.method!r}"
+        if suggestion.include:
+            options += f", postgresql_include={list(suggestion.include)!r}"
+        upgrades.append(
+            f"op.create_index({suggestion.name!r}, {suggestion.table!r}, "
+            f"{list(suggestion.columns)!r}, unique=False{options})"
+        )
+        downgrades.append(
+            f"op.drop_index({suggestion.name!r}, "
+            f"table_name={suggestion.table!r})"
+        )
+
+    script_directory = ScriptDirectory.from_config(Config(str(config_path)))
+    script = script_directory.generate_revision(
+        rev_id(),
+        "advisor_indexes",
+        head="head",
+        upgrades="\n    ".join(upgrades),
+        downgrades="\n    ".join(reversed(downgrades)),
+    )
+    if script is None:
+        raise RuntimeError("alembic did not generate a revision")
+    return Path(script.path)
+
+
+async def find_indexes(
+    database_manager: DatabaseManager,
+    groups: list[QueryGroup],
+    timeout_ms: int,
+) -> list[Finding]:
+    """Предложения по планам групп, от самого большого суммарного времени."""
+    async with database_manager.session() as session:
+        indexes = await existing_indexes(session)
+
+    findings: dict[IndexSuggestion, Finding] = {}
+    for group in groups:
+        try:
+            async with database_manager.session() as session:
+                plan = await explain(
+                    session, group.sample_sql, group.sample_params, timeout_ms
+                )
+        except Exception as explain_error:
+            logger.warning(
+                "explain failed for %s: %s", group.fingerprint, explain_error
+            )
+            continue
+
+        for suggestion, reason in analyze_plan(plan, group.sample_sql):
+            if is_covered(suggestion, indexes):
+                continue
+            finding = findings.setdefault(
+                suggestion, Finding(suggestion, reason)
+            )
+            if group not in finding.groups:
+                finding.groups.append(group)
+
+    return sorted(findings.values(), key=lambda finding: -finding.total_ms)
+
+
+def print_findings(findings: list[Finding]) -> None:  # noqa: D103
+    for finding in findings:
+        print()
+        print(f"{finding.suggestion.ddl()};")
+        print(
+            f"  -- {finding.reason}; {len(finding.groups)} fingerprints, "
+            f"{sum(group.count for group in finding.groups)} runs, "
+            f"{finding.total_ms:.0f} ms total"
+        )
+        for group in finding.groups:
+            print(
+                f"  --   p95 {group.p95_ms:.0f} ms x{group.count}: "
+                f"{group.fingerprint[:120]}"
+            )
+
+
+@inject
+async def main(  # noqa: D103
+    args: Namespace,
+    query_log_settings: QueryLogSettings = Provide[
+        Container.query_log_settings
+    ],
+    database_manager: DatabaseManager = Provide[Container.database_manager_ro],
+) -> None:
+    log_path: Path = args.log or query_log_settings.path
+    groups = collect(read_jsonl(log_path))
+    slow = [group for group in groups if group.p95_ms >= args.slower_than_ms]
+    print(
+        f"{len(groups)} query fingerprints in {log_path}, "
+        f"{len(slow)} with p95 >= {args.slower_than_ms} ms"
+    )
+
+    try:
+        ranked = await find_indexes(
+            database_manager, slow[: args.top], args.timeout_ms
+        )
+    finally:
+        await database_manager.close()
+
+    if not ranked:
+        print("no index suggestions")
+        return
+
+    print_findings(ranked)
+    if args.emit_migration:
+        path = render_migration(ranked, args.alembic_config)
+        print(f"\nwrote {path}")
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--log", type=Path, default=None, help="по умолчанию QUERY_LOG_PATH"
+    )
+    parser.add_argument("--slower-than-ms", type=float, default=100.0)
+    parser.add_argument(
+        "--top", type=int, default=20, help="сколько групп explain-ить"
+    )
+    parser.add_argument("--timeout-ms", type=int, default=30_000)
+    parser.add_argument(
+        "--emit-migration",
+        action="store_true",
+        help="записать предложения ревизией alembic",
+    )
+    parser.add_argument(
+        "--alembic-config", type=Path, default=Path("migrations/alembic.ini")
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    container = Container()
+    container.wire([__name__])
+
+    run(main(parse_args()))
@@ -0,0 +1,81 @@
+import json
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class IngestCheckpoint:
+    """Чекпоинт загрузки: сколько элементов `videos` уже закоммичено.
+
+    пачки могут коммититься не по порядку (несколько писателей), поэтому
+    в файл пишется только непрерывный префикс подтвержденных пачек.
+    чекпоинт привязан к размеру и mtime файла - другой файл начнется с нуля
+    """
+
+    def __init__(self, path_to_json: Path, path: Path) -> None:  # noqa: D107
+        self.path_to_json = path_to_json
+        self.path = path
+
+        self.items_committed = 0
+        self._next_sequence = 0
+        self._pending: dict[int, int] = {}
+
+    def _source_identity(self) -> dict[str, str | int | float]:
+        stat = self.path_to_json.stat()
+        return {
+            "source": str(self.path_to_json.resolve()),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+
+    def load(self) -> int:
+        """Возвращает число элементов, которые можно пропустить."""
+        if not self.path.exists():
+            return 0
+
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as load_error:
+            logger.warning("ignoring broken checkpoint: %s", load_error)
+            return 0
+
+        identity = self._source_identity()
+        if any(payload.get(key) != value for key, value in identity.items()):
+            logger.info("checkpoint belongs to another file, starting over")
+            return 0
+
+        self.items_committed = int(payload["items_committed"])
+        logger.info("resuming after %s items", self.items_committed)
+        return self.items_committed
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    **self._source_identity(),
+                    "items_committed": self.items_committed,
+                }
+            ),
+            encoding="utf-8",
+        )
+        tmp_path.replace(self.path)
+
+    def mark_committed(self, sequence: int, items: int) -> None:
+        """Отмечает закоммиченную пачку с порядковым номером `sequence`."""
+        self._pending[sequence] = items
+
+        advanced = False
+        while self._next_sequence in self._pending:
+            self.items_committed += self._pending.pop(self._next_sequence)
+            self._next_sequence += 1
+            advanced = True
+
+        if advanced:
+            self._save()
+
+    def complete(self) -> None:
+        """Файл загружен целиком, чекпоинт больше не нужен."""
+        self.path.unlink(missing_ok=True)
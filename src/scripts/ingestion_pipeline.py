@@ -0,0 +1,118 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import logging
+from multiprocessing import get_context
+from time import perf_counter
+
+from src.scripts.ingest_checkpoint import IngestCheckpoint
+from src.scripts.json_to_database import (
+    AnySnapshotsBatch,
+    AnyVideoBatch,
+    JsonToDatabaseUploader,
+)
+
+logger = logging.getLogger(__name__)
+
+ConvertedBatch = asyncio.Future[tuple[AnyVideoBatch, AnySnapshotsBatch]]
+# номер пачки, число видео в ней и ее конвертация
+QueueItem = tuple[int, int, ConvertedBatch]
+
+
+class IngestionPipeline:
+    """Конвейерная загрузка json: разбор, конвертация и запись параллельно.
+
+    - ijson читает файл в отдельном потоке и режет его на сырые пачки
+    - конвертация uuid/datetime идет в пуле процессов
+    - ограниченная очередь держит не больше `queue_depth` пачек в памяти
+      и притормаживает чтение, если запись не успевает
+    - несколько писателей разбирают очередь, каждый в своей транзакции
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        uploader: JsonToDatabaseUploader,
+        workers: int,
+        writers: int = 4,
+        queue_depth: int = 8,
+        checkpoint: IngestCheckpoint | None = None,
+    ) -> None:
+        self.uploader = uploader
+        self.workers = workers
+        self.writers = writers
+        self.queue_depth = queue_depth
+        self.checkpoint = checkpoint
+
+        self.batches_written = 0
+        self.rows_written = 0
+
+    async def _produce(
+        self,
+        executor: ProcessPoolExecutor,
+        queue: asyncio.Queue[QueueItem | None],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        skip_items = self.checkpoint.load() if self.checkpoint else 0
+        raw_batches = self.uploader.iter_raw_batches(skip_items)
+
+        sequence = 0
+        while True:
+            raw_batch = await asyncio.to_thread(next, raw_batches, None)
+            if raw_batch is None:
+                break
+
+            # put ждет свободного места - это и есть backpressure
+            await queue.put(
+                (
+                    sequence,
+                    len(raw_batch),
+                    loop.run_in_executor(
+                        executor, self.uploader.converter, raw_batch
+                    ),
+                )
+            )
+            sequence += 1
+
+        for _ in range(self.writers):
+            await queue.put(None)
+
+    async def _write(self, queue: asyncio.Queue[QueueItem | None]) -> None:
+        while (item := await queue.get()) is not None:
+            sequence, items, converted = item
+            videos_batch, snapshots_batch = await converted
+            await self.uploader.upload_bulk_to_database(
+                videos_batch, snapshots_batch
+            )
+
+            if self.checkpoint is not None:
+                self.checkpoint.mark_committed(sequence, items)
+
+            self.batches_written += 1
+            self.rows_written += len(videos_batch) + len(snapshots_batch)
+
+    async def run(self) -> int:
+        """Загружает весь файл и возвращает число записанных строк."""
+        queue: asyncio.Queue[QueueItem | None] = asyncio.Queue(
+            maxsize=self.queue_depth
+        )
+        started = perf_counter()
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=get_context("spawn")
+        ) as executor:
+            async with asyncio.TaskGroup() as task_group:
+                task_group.create_task(self._produce(executor, queue))
+                for _ in range(self.writers):
+                    task_group.create_task(self._write(queue))
+
+        if self.checkpoint is not None:
+            self.checkpoint.complete()
+
+        elapsed = perf_counter() - started
+        logger.info(
+            "ingested %s rows in %s batches, %.1fs, %.0f rows/s",
+            self.rows_written,
+            self.batches_written,
+            elapsed,
+            self.rows_written / elapsed if elapsed else 0,
+        )
+        return self.rows_written
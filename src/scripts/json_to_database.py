@@ -1,14 +1,25 @@
-from collections.abc import Generator
+from collections.abc import Callable, Generator, Iterable
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 from uuid import UUID
 
+from asyncpg import Connection  # type: ignore
 from dependency_injector.wiring import Provide, inject
 import ijson  # type: ignore
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.container import Container
 from src.database.manager import DatabaseManager
 from src.database.models import Videos, VideoSnapshots
+from src.scripts.columnar_batch import (
+    SNAPSHOT_COLUMNS,
+    VIDEO_COLUMNS,
+    ColumnarBatch,
+    convert_raw_batch_columnar,
+)
+from src.scripts.snapshot_partitions import SnapshotPartitions
+from src.scripts.snapshot_rollups import refresh_rollups
 
 VideoItemType = dict[str, Any]
 SnapshotsItemType = dict[str, Any]
@@ -16,13 +27,35 @@ SnapshotsItemType = dict[str, Any]
 VideoBatchType = list[VideoItemType]
 SnapshotsBatchType = list[SnapshotsItemType]
 
+LoaderMode = Literal["orm", "copy"]
+
+# orm работает со словарями, COPY - с колоночными пачками
+AnyVideoBatch = VideoBatchType | ColumnarBatch
+AnySnapshotsBatch = SnapshotsBatchType | ColumnarBatch
+BatchConverter = Callable[
+    [list[VideoItemType]], tuple[AnyVideoBatch, AnySnapshotsBatch]
+]
+
+
+def primary_key(model: type[Videos] | type[VideoSnapshots]) -> tuple[str, ...]:
+    """Колонки первичного ключа - цель ON CONFLICT при upsert."""
+    return tuple(column.name for column in model.__table__.primary_key)
+
 
 class JsonToDatabaseUploader:  # noqa: D101
+    # COPY почти не зависит от размера пачки, а orm упирается в flush
+    DEFAULT_BULK_SIZES: dict[LoaderMode, int] = {"orm": 50, "copy": 2000}
+
     @inject
     def __init__(  # noqa: D107
         self,
         path_to_json: Path,
-        bulk_size: int = 50,
+        bulk_size: int | None = None,
+        mode: LoaderMode = "orm",
+        use_staging: bool = False,
+        upsert: bool = False,
+        maintain_rollups: bool = False,
+        partition_months_ahead: int = 1,
         database_manager: DatabaseManager = Provide[
             Container.database_manager_rw
         ],
@@ -31,11 +64,27 @@ class JsonToDatabaseUploader:  # noqa: D101
             raise FileNotFoundError(f"json file not found: {path_to_json}")
 
         self.path_to_json = path_to_json
-        self.bulk_size = bulk_size
+        self.bulk_size = bulk_size or self.DEFAULT_BULK_SIZES[mode]
+        self.mode = mode
+        # upsert через COPY возможен только слиянием из staging
+        self.use_staging = use_staging or (upsert and mode == "copy")
+        self.upsert = upsert
+        self.maintain_rollups = maintain_rollups
         self.database_manager = database_manager
+        self.partitions = SnapshotPartitions(
+            database_manager, months_ahead=partition_months_ahead
+        )
 
+        self.converter: BatchConverter = (
+            convert_raw_batch_columnar if mode == "copy" else convert_raw_batch
+        )
+        # буферы последовательной загрузки, переиспользуются между пачками
+        self._video_columns = ColumnarBatch(VIDEO_COLUMNS)
+        self._snapshot_columns = ColumnarBatch(SNAPSHOT_COLUMNS)
+
+    @staticmethod
     def _convert_video_data(  # noqa: D102
-        self, video_item: VideoItemType
+        video_item: VideoItemType,
     ) -> VideoItemType:
         return {
             "id": UUID(video_item["id"]),
@@ -51,8 +100,9 @@ class JsonToDatabaseUploader:  # noqa: D101
             "updated_at": datetime.fromisoformat(video_item["updated_at"]),
         }
 
+    @staticmethod
     def _convert_snapshot_data(  # noqa: D102
-        self, snapshot_item: SnapshotsItemType
+        snapshot_item: SnapshotsItemType,
     ) -> SnapshotsItemType:
         return {
             "id": UUID(snapshot_item["id"]),
@@ -70,48 +120,224 @@ class JsonToDatabaseUploader:  # noqa: D101
         }
 
     async def upload_bulk_to_database(  # noqa: D102
+        self,
+        videos_batch: AnyVideoBatch,
+        snapshots_batch: AnySnapshotsBatch,
+    ) -> None:
+        if isinstance(videos_batch, ColumnarBatch) and isinstance(
+            snapshots_batch, ColumnarBatch
+        ):
+            await self.partitions.ensure(snapshots_batch.column("created_at"))
+            await self.copy_bulk_to_database(videos_batch, snapshots_batch)
+        elif isinstance(videos_batch, list) and isinstance(
+            snapshots_batch, list
+        ):
+            await self.partitions.ensure(
+                snapshot["created_at"] for snapshot in snapshots_batch
+            )
+            await self.add_bulk_to_database(videos_batch, snapshots_batch)
+        else:
+            raise TypeError("videos and snapshots batches must match")
+
+    @staticmethod
+    async def _driver_connection(session: AsyncSession) -> Connection:
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        return raw_connection.driver_connection
+
+    async def _copy_records(
+        self,
+        connection: Connection,
+        model: type[Videos] | type[VideoSnapshots],
+        columns: tuple[str, ...],
+        records: Iterable[tuple[Any, ...]],
+    ) -> None:
+        table_name = model.__tablename__
+        if not self.use_staging:
+            await connection.copy_records_to_table(
+                table_name, records=records, columns=columns
+            )
+            return
+
+        # staging живет до конца соединения, строки чистятся на commit
+        staging_name = f"{table_name}_staging"
+        column_list = ", ".join(columns)
+        await connection.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging_name} "
+            f"(LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        await connection.copy_records_to_table(
+            staging_name, records=records, columns=columns
+        )
+
+        if not self.upsert:
+            await connection.execute(
+                f"INSERT INTO {table_name} ({column_list}) "
+                f"SELECT {column_list} FROM {staging_name}"
+            )
+            return
+
+        key = primary_key(model)
+        key_list = ", ".join(key)
+        update_list = ", ".join(
+            f"{column} = EXCLUDED.{column}"
+            for column in columns
+            if column not in key
+        )
+        await connection.execute(
+            f"INSERT INTO {table_name} ({column_list}) "
+            f"SELECT DISTINCT ON ({key_list}) {column_list} "
+            f"FROM {staging_name} "
+            f"ON CONFLICT ({key_list}) DO UPDATE SET {update_list}"
+        )
+
+    async def copy_bulk_to_database(
+        self,
+        videos_batch: ColumnarBatch,
+        snapshots_batch: ColumnarBatch,
+    ) -> None:
+        """Пишет пачку бинарным COPY через asyncpg в одной транзакции."""
+        async with self.database_manager.session(commit=True) as session:
+            connection = await self._driver_connection(session)
+
+            if len(videos_batch):
+                await self._copy_records(
+                    connection,
+                    Videos,
+                    videos_batch.names,
+                    videos_batch.records(),
+                )
+
+            if len(snapshots_batch):
+                await self._copy_records(
+                    connection,
+                    VideoSnapshots,
+                    snapshots_batch.names,
+                    snapshots_batch.records(),
+                )
+
+            if self.maintain_rollups and len(snapshots_batch):
+                await refresh_rollups(
+                    session,
+                    snapshots_batch.column("video_id"),
+                    snapshots_batch.column("created_at"),
+                )
+
+    async def add_bulk_to_database(  # noqa: D102
         self,
         videos_batch: VideoBatchType,
         snapshots_batch: SnapshotsBatchType,
     ) -> None:
         async with self.database_manager.session(commit=True) as session:
-            if videos_batch:
-                session.add_all(
-                    [Videos(**video_data) for video_data in videos_batch]
+            if self.upsert:
+                await self._upsert_rows(session, Videos, videos_batch)
+                await self._upsert_rows(
+                    session, VideoSnapshots, snapshots_batch
                 )
+            else:
+                if videos_batch:
+                    session.add_all(
+                        [Videos(**video_data) for video_data in videos_batch]
+                    )
+
+                if snapshots_batch:
+                    session.add_all(
+                        [
+                            VideoSnapshots(**snapshot_data)
+                            for snapshot_data in snapshots_batch
+                        ]
+                    )
 
-            if snapshots_batch:
-                session.add_all(
-                    [
-                        VideoSnapshots(**snapshot_data)
-                        for snapshot_data in snapshots_batch
-                    ]
+            if self.maintain_rollups and snapshots_batch:
+                # суммы считаются sql-запросом, строки должны быть в базе
+                await session.flush()
+                await refresh_rollups(
+                    session,
+                    [row["video_id"] for row in snapshots_batch],
+                    [row["created_at"] for row in snapshots_batch],
                 )
 
-    def load_bulk_from_json(  # noqa: D102
-        self,
-    ) -> Generator[tuple[VideoBatchType, SnapshotsBatchType]]:
-        videos_batch: VideoBatchType = []
-        snapshots_batch: SnapshotsBatchType = []
+    @staticmethod
+    async def _upsert_rows(
+        session: AsyncSession,
+        model: type[Videos] | type[VideoSnapshots],
+        rows: list[dict[str, Any]],
+    ) -> None:
+        if not rows:
+            return
+
+        key = primary_key(model)
+        statement = insert(model)
+        statement = statement.on_conflict_do_update(
+            index_elements=key,
+            set_={
+                column: statement.excluded[column]
+                for column in rows[0]
+                if column not in key
+            },
+        )
+        # executemany: sqlalchemy сам режет на страницы с учетом
+        # лимита параметров asyncpg
+        await session.execute(statement, rows)
+
+    def iter_raw_batches(
+        self, skip_items: int = 0
+    ) -> Generator[list[VideoItemType]]:
+        """Отдает сырые элементы `videos` из json пачками по bulk_size.
+
+        первые `skip_items` элементов разбираются, но не отдаются -
+        так загрузка продолжается с чекпоинта
+        """
+        raw_batch: list[VideoItemType] = []
 
         with open(self.path_to_json, "rb") as file:
-            videos_items = ijson.items(file, "videos.item")
+            for index, video_item in enumerate(
+                ijson.items(file, "videos.item")
+            ):
+                if index < skip_items:
+                    continue
+
+                raw_batch.append(video_item)
+
+                if len(raw_batch) == self.bulk_size:
+                    yield raw_batch
+                    raw_batch = []
+
+        if raw_batch:
+            yield raw_batch
+
+    def load_bulk_from_json(  # noqa: D102
+        self,
+        skip_items: int = 0,
+    ) -> Generator[tuple[AnyVideoBatch, AnySnapshotsBatch]]:
+        for raw_batch in self.iter_raw_batches(skip_items):
+            if self.mode == "copy":
+                yield convert_raw_batch_columnar(
+                    raw_batch, self._video_columns, self._snapshot_columns
+                )
+            else:
+                yield convert_raw_batch(raw_batch)
 
-            for video_item in videos_items:
-                snapshots_items = video_item.pop("snapshots", [])
 
-                video_data = self._convert_video_data(video_item)
-                videos_batch.append(video_data)
+def convert_raw_batch(
+    raw_batch: list[VideoItemType],
+) -> tuple[VideoBatchType, SnapshotsBatchType]:
+    """Конвертирует пачку сырых видео вместе со снапшотами.
 
-                for snapshot_item in snapshots_items:
-                    snapshot_data = self._convert_snapshot_data(snapshot_item)
-                    snapshots_batch.append(snapshot_data)
+    функция уровня модуля, чтобы ее можно было отдать в ProcessPoolExecutor
+    """
+    videos_batch: VideoBatchType = []
+    snapshots_batch: SnapshotsBatchType = []
 
-                if len(videos_batch) == self.bulk_size:
-                    yield videos_batch, snapshots_batch
+    for video_item in raw_batch:
+        snapshots_items = video_item.pop("snapshots", [])
 
-                    videos_batch.clear()
-                    snapshots_batch.clear()
+        videos_batch.append(
+            JsonToDatabaseUploader._convert_video_data(video_item)
+        )
+        snapshots_batch.extend(
+            JsonToDatabaseUploader._convert_snapshot_data(snapshot_item)
+            for snapshot_item in snapshots_items
+        )
 
-        if videos_batch or snapshots_batch:
-            yield videos_batch, snapshots_batch
+    return videos_batch, snapshots_batch
@@ -0,0 +1,289 @@
+r"""Повтор sql из журнала вопросов на базе - нагрузка реальной смесью.
+
+журнал пишет TextToSQLService (QUERY_LOG_JOURNAL_*). успешные попытки
+повторяются на readonly-пуле в исходном ритме прихода, ускоренном в
+`--speed` раз, или с постоянной частотой `--rate`; `--concurrency`
+ограничивает число одновременных запросов. отчет - задержки, отставание
+от расписания и самые тяжелые запросы, чтобы сравнить схему или индексы
+до и после:
+
+    POSTGRES_HOST=localhost python -m src.scripts.replay_journal --speed 10
+    POSTGRES_HOST=localhost python -m src.scripts.replay_journal \
+        --rate 50 --concurrency 16 --repeat 3
+"""
+
+from argparse import ArgumentParser, Namespace
+import asyncio
+from asyncio import run
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from statistics import quantiles
+from time import perf_counter
+from typing import Any
+
+from dependency_injector.wiring import Provide, inject
+from src.container import Container
+from src.core.jsonl import read_jsonl
+from src.core.settings import QueryLogSettings
+from src.database.manager import DatabaseManager
+from src.scripts.index_advisor import collect, restore_param
+
+
+@dataclass(slots=True)
+class ReplayQuery:  # noqa: D101
+    # секунды от первого запроса журнала
+    offset: float
+    sql: str
+    params: dict[str, Any] | None
+    kind: str
+
+
+@dataclass(slots=True)
+class ReplayResult:  # noqa: D101
+    sql: str
+    params: dict[str, Any] | None
+    elapsed_ms: float
+    lag_ms: float
+    error: str | None = None
+
+
+@dataclass(slots=True)
+class ReplayStats:  # noqa: D101
+    seconds: float = 0.0
+    results: list[ReplayResult] = field(default_factory=list)
+
+    @property
+    def errors(self) -> int:  # noqa: D102
+        return sum(result.error is not None for result in self.results)
+
+
+def load_queries(
+    records: Iterable[dict[str, Any]], include_failed: bool = False
+) -> list[ReplayQuery]:
+    """Выполненный sql журнала по времени прихода.
+
+    по умолчанию берутся только попытки без ошибки - тот sql, который
+    дал ответ пользователю
+    """
+    queries: list[ReplayQuery] = []
+    for record in records:
+        for attempt in record.get("attempts") or ():
+            if not attempt.get("sql"):
+                continue
+            if attempt.get("error") and not include_failed:
+                continue
+            params = attempt.get("params")
+            queries.append(
+                ReplayQuery(
+                    offset=record["at"] + attempt["offset_ms"] / 1000,
+                    sql=attempt["sql"],
+                    params=(
+                        {
+                            name: restore_param(value)
+                            for name, value in params.items()
+                        }
+                        if params
+                        else None
+                    ),
+                    kind=attempt["kind"],
+                )
+            )
+
+    queries.sort(key=lambda query: query.offset)
+    if queries:
+        first = queries[0].offset
+        for query in queries:
+            query.offset -= first
+    return queries
+
+
+def due_times(
+    queries: list[ReplayQuery], speed: float, rate: float | None
+) -> list[float]:
+    """Когда запускать каждый запрос, в секундах от начала повтора."""
+    if rate:
+        return [index / rate for index in range(len(queries))]
+    if speed <= 0:
+        return [0.0] * len(queries)
+    return [query.offset / speed for query in queries]
+
+
+async def replay(
+    database_manager: DatabaseManager,
+    queries: list[ReplayQuery],
+    due: list[float],
+    concurrency: int,
+    timeout_ms: int,
+) -> ReplayStats:
+    """Запускает запросы по расписанию, не больше `concurrency` сразу.
+
+    если все слоты заняты, запрос ждет и копит отставание от расписания:
+    рост `lag` значит, что база не держит заданный темп
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = ReplayStats()
+    tasks: list[asyncio.Task[None]] = []
+    started = perf_counter()
+
+    async def run_one(query: ReplayQuery, lag_ms: float) -> None:
+        error: str | None = None
+        query_started = perf_counter()
+        try:
+            async with database_manager.read() as connection:
+                await connection.fetchval(
+                    "SELECT set_config('statement_timeout', :value, true)",
+                    {"value": str(timeout_ms)},
+                )
+                await connection.fetchrow(query.sql, query.params)
+        except Exception as replay_error:
+            error = str(replay_error)
+        finally:
+            semaphore.release()
+        stats.results.append(
+            ReplayResult(
+                sql=query.sql,
+                params=query.params,
+                elapsed_ms=(perf_counter() - query_started) * 1000,
+                lag_ms=lag_ms,
+                error=error,
+            )
+        )
+
+    for query, due_at in zip(queries, due, strict=True):
+        delay = due_at - (perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await semaphore.acquire()
+        lag_ms = max(perf_counter() - started - due_at, 0.0) * 1000
+        tasks.append(asyncio.create_task(run_one(query, lag_ms)))
+
+    await asyncio.gather(*tasks)
+    stats.seconds = perf_counter() - started
+    return stats
+
+
+def _percentiles(values: list[float]) -> tuple[float, float, float]:
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value
+    points = quantiles(values, n=100, method="inclusive")
+    return points[49], points[94], points[98]
+
+
+def print_report(stats: ReplayStats, top: int) -> None:  # noqa: D103
+    count = len(stats.results)
+    if not count:
+        print("nothing replayed")
+        return
+
+    elapsed = [result.elapsed_ms for result in stats.results]
+    lags = [result.lag_ms for result in stats.results]
+    p50, p95, p99 = _percentiles(elapsed)
+    print(
+        f"{count} queries in {stats.seconds:.1f} s "
+        f"({count / stats.seconds:.1f} q/s), {stats.errors} errors"
+    )
+    print(f"latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms")
+    print(
+        f"schedule lag p95 {_percentiles(lags)[1]:.1f} ms, "
+        f"max {max(lags):.1f} ms"
+    )
+
+    groups = collect(
+        {
+            "sql": result.sql,
+            "params": result.params,
+            "elapsed_ms": result.elapsed_ms,
+            "error": result.error,
+        }
+        for result in stats.results
+    )
+    for group in groups[:top]:
+        print(
+            f"  {group.total_ms:>9.0f} ms total, p95 {group.p95_ms:.1f} ms "
+            f"x{group.count}: {group.fingerprint[:120]}"
+        )
+
+    errors: dict[str, int] = {}
+    for result in stats.results:
+        if result.error is not None:
+            errors[result.error] = errors.get(result.error, 0) + 1
+    for error, times in sorted(errors.items(), key=lambda item: -item[1]):
+        print(f"  error x{times}: {error[:160]}")
+
+
+@inject
+async def main(  # noqa: D103
+    args: Namespace,
+    query_log_settings: QueryLogSettings = Provide[
+        Container.query_log_settings
+    ],
+    database_manager: DatabaseManager = Provide[Container.database_manager_ro],
+) -> None:
+    journal_path: Path = args.journal or query_log_settings.journal_path
+    queries = load_queries(read_jsonl(journal_path), args.include_failed)
+    if args.limit is not None:
+        queries = queries[: args.limit]
+    span = queries[-1].offset if queries else 0.0
+    print(
+        f"{len(queries)} queries over {span:.0f} s in {journal_path}, "
+        f"repeat {args.repeat}"
+    )
+
+    try:
+        for round_number in range(args.repeat):
+            if args.repeat > 1:
+                print(f"\nround {round_number + 1}")
+            stats = await replay(
+                database_manager,
+                queries,
+                due_times(queries, args.speed, args.rate),
+                args.concurrency,
+                args.timeout_ms,
+            )
+            print_report(stats, args.top)
+    finally:
+        await database_manager.close()
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=None,
+        help="по умолчанию QUERY_LOG_JOURNAL_PATH",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="ускорение исходного ритма; 0 - все сразу",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="постоянная частота, запросов в секунду, вместо ритма журнала",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument(
+        "--include-failed",
+        action="store_true",
+        help="повторять и попытки, закончившиеся ошибкой",
+    )
+    parser.add_argument("--timeout-ms", type=int, default=30_000)
+    parser.add_argument(
+        "--top", type=int, default=10, help="сколько тяжелых запросов показать"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    container = Container()
+    container.wire([__name__])
+
+    run(main(parse_args()))
@@ -0,0 +1,189 @@
+from argparse import ArgumentParser, Namespace
+import asyncio
+from collections.abc import Iterable
+from datetime import UTC, date, datetime
+import logging
+import re
+
+from dependency_injector.wiring import Provide, inject
+from sqlalchemy import text
+from src.container import Container
+from src.database.manager import DatabaseManager
+from src.database.models import VideoSnapshots
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = VideoSnapshots.__tablename__
+
+_PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+# создание секций сериализуется между писателями и процессами
+_PARTITIONS_LOCK = 7_406_210_302
+
+_PARTITIONS_SQL = text("""
+    SELECT c.relname
+    FROM pg_inherits AS i
+    JOIN pg_class AS c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(:parent)
+    ORDER BY c.relname
+    """)
+
+
+def month_start(moment: datetime | date) -> date:  # noqa: D103
+    if isinstance(moment, datetime):
+        moment = moment.astimezone(UTC).date()
+    return moment.replace(day=1)
+
+
+def next_month(month: date) -> date:  # noqa: D103
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def partition_name(month: date) -> str:  # noqa: D103
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+class SnapshotPartitions:
+    """Месячные секции `video_snapshots` по `created_at` (UTC).
+
+    секции создаются заранее, отдельной короткой транзакцией до записи
+    пачки: `CREATE TABLE ... PARTITION OF` берет эксклюзивную блокировку
+    родителя, и внутри транзакции пачки она бы ждала соседних писателей.
+    уже созданные месяцы запоминаются, так что обычно проверка не ходит
+    в базу
+    """
+
+    def __init__(  # noqa: D107
+        self, database_manager: DatabaseManager, months_ahead: int = 1
+    ) -> None:
+        self.database_manager = database_manager
+        self.months_ahead = months_ahead
+
+        self._known: set[date] = set()
+        self._lock = asyncio.Lock()
+
+    def _required(self, moments: set[datetime]) -> set[date]:
+        months = {month_start(moment) for moment in moments}
+        if months:
+            month = max(months)
+            for _ in range(self.months_ahead):
+                month = next_month(month)
+                months.add(month)
+        return months - self._known
+
+    async def ensure(self, created_at: Iterable[datetime]) -> None:
+        """Создает секции под моменты `created_at` и на месяцы вперед."""
+        moments = set(created_at)
+        if not self._required(moments):
+            return
+
+        async with self._lock:
+            missing = self._required(moments)
+            if not missing:
+                return
+
+            async with self.database_manager.session(commit=True) as session:
+                await session.execute(
+                    text("SELECT pg_advisory_xact_lock(:lock_key)"),
+                    {"lock_key": _PARTITIONS_LOCK},
+                )
+                for month in sorted(missing):
+                    # границы - полночь UTC, независимо от TimeZone сессии
+                    await session.execute(
+                        text(
+                            "CREATE TABLE IF NOT EXISTS "
+                            f"{partition_name(month)} "
+                            f"PARTITION OF {PARENT_TABLE} FOR VALUES "
+                            f"FROM ('{month.isoformat()} 00:00+00') "
+                            f"TO ('{next_month(month).isoformat()} 00:00+00')"
+                        )
+                    )
+
+            self._known.update(missing)
+            logger.info(
+                "partitions ready: %s",
+                ", ".join(partition_name(month) for month in sorted(missing)),
+            )
+
+    async def detach_before(
+        self, cutoff: date, drop: bool = False
+    ) -> list[str]:
+        """Отсоединяет секции, целиком лежащие раньше `cutoff`.
+
+        отсоединение - операция над каталогом, данные не переписываются.
+        без `drop` секции остаются обычными таблицами (для архива),
+        суммы в таблицах `*_hourly`/`*_daily` не трогаются
+        """
+        async with self.database_manager.session(commit=True) as session:
+            await session.execute(
+                text("SELECT pg_advisory_xact_lock(:lock_key)"),
+                {"lock_key": _PARTITIONS_LOCK},
+            )
+            rows = await session.execute(
+                _PARTITIONS_SQL, {"parent": PARENT_TABLE}
+            )
+
+            detached: list[str] = []
+            for (name,) in rows.all():
+                match = _PARTITION_NAME.match(name)
+                if match is None:
+                    continue
+                month = date(int(match[1]), int(match[2]), 1)
+                if next_month(month) > cutoff:
+                    continue
+
+                await session.execute(
+                    text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+                )
+                if drop:
+                    await session.execute(text(f"DROP TABLE {name}"))
+                self._known.discard(month)
+                detached.append(name)
+
+        logger.info(
+            "%s partitions: %s",
+            "dropped" if drop else "detached",
+            ", ".join(detached) or "-",
+        )
+        return detached
+
+
+@inject
+async def main(  # noqa: D103
+    args: Namespace,
+    database_manager: DatabaseManager = Provide[Container.database_manager_rw],
+) -> None:
+    partitions = SnapshotPartitions(database_manager)
+    try:
+        await partitions.detach_before(args.detach_before, drop=args.drop)
+    finally:
+        await database_manager.close()
+
+
+def parse_args() -> Namespace:  # noqa: D103
+    parser = ArgumentParser(
+        description="отсоединить месячные секции video_snapshots"
+    )
+    parser.add_argument(
+        "--detach-before",
+        type=date.fromisoformat,
+        required=True,
+        help="секции, целиком лежащие раньше этой даты (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--drop",
+        action="store_true",
+        help="удалить отсоединенные секции вместо архивирования",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    container = Container()
+    container.wire([__name__])
+
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,181 @@
+from collections.abc import Iterable, Sequence
+from datetime import UTC, date, datetime, time, timedelta
+import logging
+from typing import Any, Literal
+from uuid import UUID
+
+from sqlalchemy import TextClause, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.models import (
+    CreatorSnapshotsDaily,
+    CreatorSnapshotsHourly,
+    VideoSnapshotsDaily,
+    VideoSnapshotsHourly,
+)
+
+logger = logging.getLogger(__name__)
+
+RollupScope = Literal["batch", "all"]
+
+_SUM_COLUMNS = (
+    "delta_views_count",
+    "delta_likes_count",
+    "delta_comments_count",
+    "delta_reports_count",
+)
+
+# произвольная константа для pg_advisory_xact_lock: пересчет сумм
+# по креаторам сериализуется между параллельными писателями
+_CREATOR_ROLLUP_LOCK = 7_406_210_301
+
+
+def _upsert(
+    table: str,
+    key: tuple[str, ...],
+    columns: tuple[str, ...],
+    select_sql: str,
+) -> TextClause:
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for column in columns
+        if column not in key
+    )
+    return text(
+        f"INSERT INTO {table} ({', '.join(columns)}) {select_sql} "
+        f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}"
+    )
+
+
+def _statements(scope: RollupScope) -> tuple[TextClause, ...]:
+    """Пересчет сумм из источника: раз за разом дает тот же результат.
+
+    для scope="batch" пересчитываются только видео пачки в окне целых
+    суток (UTC) вокруг их снапшотов, для scope="all" - все таблицы целиком
+    """
+    batch = scope == "batch"
+    sums = ", ".join(f"SUM({column})" for column in _SUM_COLUMNS)
+    snapshot_sums = ", ".join(f"SUM(s.{column})" for column in _SUM_COLUMNS)
+    delta_columns = (*_SUM_COLUMNS, "snapshots_count")
+
+    snapshots_filter = (
+        "s.video_id = ANY(:video_ids) "
+        "AND s.created_at >= :window_start AND s.created_at < :window_end"
+        if batch
+        else "TRUE"
+    )
+    hourly_filter = (
+        "hour_start >= :window_start AND hour_start < :window_end"
+        if batch
+        else "TRUE"
+    )
+    daily_filter = "day >= :first_day AND day < :end_day" if batch else "TRUE"
+    video_filter = "video_id = ANY(:video_ids)" if batch else "TRUE"
+    creator_filter = (
+        "creator_id IN (SELECT creator_id FROM videos "
+        "WHERE id = ANY(:video_ids))"
+        if batch
+        else "TRUE"
+    )
+
+    return (
+        _upsert(
+            VideoSnapshotsHourly.__tablename__,
+            ("video_id", "hour_start"),
+            ("video_id", "hour_start", "creator_id", *delta_columns),
+            f"SELECT s.video_id, date_trunc('hour', s.created_at, 'UTC'), "
+            f"v.creator_id, {snapshot_sums}, COUNT(*) "
+            "FROM video_snapshots AS s JOIN videos AS v ON v.id = s.video_id "
+            f"WHERE {snapshots_filter} GROUP BY 1, 2, 3",
+        ),
+        _upsert(
+            VideoSnapshotsDaily.__tablename__,
+            ("video_id", "day"),
+            ("video_id", "day", "creator_id", *delta_columns),
+            f"SELECT video_id, (hour_start AT TIME ZONE 'UTC')::date, "
+            f"creator_id, {sums}, SUM(snapshots_count) "
+            f"FROM {VideoSnapshotsHourly.__tablename__} "
+            f"WHERE {video_filter} AND {hourly_filter} GROUP BY 1, 2, 3",
+        ),
+        text("SELECT pg_advisory_xact_lock(:lock_key)"),
+        _upsert(
+            CreatorSnapshotsHourly.__tablename__,
+            ("creator_id", "hour_start"),
+            ("creator_id", "hour_start", *delta_columns, "videos_count"),
+            f"SELECT creator_id, hour_start, {sums}, "
+            f"SUM(snapshots_count), COUNT(*) "
+            f"FROM {VideoSnapshotsHourly.__tablename__} "
+            f"WHERE {creator_filter} AND {hourly_filter} GROUP BY 1, 2",
+        ),
+        _upsert(
+            CreatorSnapshotsDaily.__tablename__,
+            ("creator_id", "day"),
+            ("creator_id", "day", *delta_columns, "videos_count"),
+            f"SELECT creator_id, day, {sums}, "
+            f"SUM(snapshots_count), COUNT(*) "
+            f"FROM {VideoSnapshotsDaily.__tablename__} "
+            f"WHERE {creator_filter} AND {daily_filter} GROUP BY 1, 2",
+        ),
+    )
+
+
+def _with_params(
+    statements: tuple[TextClause, ...],
+) -> tuple[tuple[TextClause, tuple[str, ...]], ...]:
+    return tuple(
+        (statement, tuple(statement.compile().params))
+        for statement in statements
+    )
+
+
+_BATCH_STATEMENTS = _with_params(_statements("batch"))
+_ALL_STATEMENTS = _with_params(_statements("all"))
+
+ROLLUP_TABLES = (
+    VideoSnapshotsHourly.__tablename__,
+    VideoSnapshotsDaily.__tablename__,
+    CreatorSnapshotsHourly.__tablename__,
+    CreatorSnapshotsDaily.__tablename__,
+)
+
+
+def _day_start(moment: datetime) -> datetime:
+    return datetime.combine(moment.astimezone(UTC).date(), time(), UTC)
+
+
+async def refresh_rollups(
+    session: AsyncSession,
+    video_ids: Iterable[UUID | str],
+    created_at: Sequence[datetime],
+) -> None:
+    """Пересчитывает суммы для видео пачки в текущей транзакции.
+
+    вызывается после записи снапшотов, до commit: суммы становятся
+    видны одновременно с сырыми данными
+    """
+    if not created_at:
+        return
+
+    window_start = _day_start(min(created_at))
+    window_end = _day_start(max(created_at)) + timedelta(days=1)
+    first_day: date = window_start.date()
+    end_day: date = window_end.date()
+
+    params: dict[str, Any] = {
+        "video_ids": list(set(video_ids)),
+        "window_start": window_start,
+        "window_end": window_end,
+        "first_day": first_day,
+        "end_day": end_day,
+        "lock_key": _CREATOR_ROLLUP_LOCK,
+    }
+    for statement, names in _BATCH_STATEMENTS:
+        await session.execute(statement, {name: params[name] for name in names})
+
+
+async def rebuild_rollups(session: AsyncSession) -> None:
+    """Строит суммы заново по всей истории снапшотов."""
+    await session.execute(text(f"TRUNCATE {', '.join(ROLLUP_TABLES)}"))
+    params = {"lock_key": _CREATOR_ROLLUP_LOCK}
+    for statement, names in _ALL_STATEMENTS:
+        await session.execute(statement, {name: params[name] for name in names})
+    logger.info("rebuilt snapshot rollups")
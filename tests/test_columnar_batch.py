@@ -0,0 +1,116 @@
+from datetime import datetime
+from typing import Any
+
+from src.scripts.columnar_batch import (
+    SNAPSHOT_COLUMNS,
+    VIDEO_COLUMNS,
+    ColumnarBatch,
+    TimestampParser,
+    convert_raw_batch_columnar,
+)
+
+CREATED_AT = "2025-11-28T10:00:00+00:00"
+
+
+def video_item(index: int, snapshots: int = 0) -> dict[str, Any]:
+    video_id = f"00000000-0000-0000-0000-{index:012d}"
+    return {
+        "id": video_id,
+        "creator_id": "11111111-1111-1111-1111-111111111111",
+        "video_created_at": CREATED_AT,
+        "views_count": index * 10,
+        "likes_count": index,
+        "comments_count": 0,
+        "reports_count": 0,
+        "created_at": CREATED_AT,
+        "updated_at": CREATED_AT,
+        "snapshots": [
+            {
+                "id": f"{video_id}-{snapshot}",
+                "video_id": video_id,
+                "views_count": snapshot,
+                "likes_count": 0,
+                "comments_count": 0,
+                "reports_count": 0,
+                "delta_views_count": 1,
+                "delta_likes_count": 0,
+                "delta_comments_count": 0,
+                "delta_reports_count": 0,
+                "created_at": CREATED_AT,
+                "updated_at": CREATED_AT,
+            }
+            for snapshot in range(snapshots)
+        ],
+    }
+
+
+def test_records_round_trip_rows_in_column_order() -> None:
+    items = [video_item(1), video_item(2)]
+    batch = ColumnarBatch(VIDEO_COLUMNS)
+
+    batch.extend(items, TimestampParser())
+
+    rows = list(batch.records())
+    assert len(batch) == 2
+    assert [dict(zip(VIDEO_COLUMNS, row, strict=True)) for row in rows] == [
+        {
+            name: (
+                datetime.fromisoformat(item[name])
+                if name.endswith("_at")
+                else item[name]
+            )
+            for name in VIDEO_COLUMNS
+        }
+        for item in items
+    ]
+    assert batch.column("views_count") == [10, 20]
+
+
+def test_timestamp_parser_returns_same_object_for_same_string() -> None:
+    parser = TimestampParser()
+
+    first = parser.parse(CREATED_AT)
+    second = parser.parse(CREATED_AT)
+
+    assert first is second
+    assert first == datetime.fromisoformat(CREATED_AT)
+
+
+def test_timestamp_parser_clears_cache_when_full() -> None:
+    parser = TimestampParser(max_size=1)
+
+    first = parser.parse(CREATED_AT)
+    parser.parse("2025-11-29T10:00:00+00:00")
+
+    assert parser.parse(CREATED_AT) is not first
+
+
+def test_convert_reuses_buffers_after_reset() -> None:
+    videos, snapshots = convert_raw_batch_columnar(
+        [video_item(1, snapshots=2), video_item(2, snapshots=1)]
+    )
+    video_columns = videos.columns
+    snapshot_ids = snapshots.column("id")
+
+    reused_videos, reused_snapshots = convert_raw_batch_columnar(
+        [video_item(3)], videos, snapshots
+    )
+
+    assert reused_videos is videos
+    assert reused_snapshots is snapshots
+    assert videos.columns is video_columns
+    assert snapshots.column("id") is snapshot_ids
+    assert videos.column("id") == [video_item(3)["id"]]
+    assert len(snapshots) == 0
+
+
+def test_convert_flattens_snapshots_with_shared_timestamps() -> None:
+    videos, snapshots = convert_raw_batch_columnar(
+        [video_item(1, snapshots=2), video_item(2, snapshots=3)]
+    )
+
+    assert snapshots.names == SNAPSHOT_COLUMNS
+    assert len(videos) == 2
+    assert len(snapshots) == 5
+    created_at = snapshots.column("created_at")
+    assert all(value is created_at[0] for value in created_at)
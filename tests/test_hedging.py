@@ -0,0 +1,150 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import pytest
+from src.llm_service.hedging import LatencyStats, gather_within, race
+
+
+def test_latency_percentile_nearest_rank() -> None:
+    stats = LatencyStats()
+    assert stats.percentile("m", 0.9) is None
+    for seconds in range(1, 11):
+        stats.observe("m", float(seconds))
+    assert stats.count("m") == 10
+    assert stats.percentile("m", 0.5) == 5.0
+    assert stats.percentile("m", 0.9) == 9.0
+    assert stats.percentile("m", 1.0) == 10.0
+    assert stats.percentile("other", 0.5) is None
+
+
+def test_latency_window_drops_oldest() -> None:
+    stats = LatencyStats(window=3)
+    for seconds in (10.0, 1.0, 2.0, 3.0):
+        stats.observe("m", seconds)
+    assert stats.count("m") == 3
+    assert stats.percentile("m", 1.0) == 3.0
+
+
+class Call:
+    """Вызов для race: отвечает через `delay` секунд или падает."""
+
+    def __init__(
+        self, result: str, delay: float = 0.0, error: bool = False
+    ) -> None:
+        self.result = result
+        self.delay = delay
+        self.error = error
+        self.started_at: float | None = None
+        self.cancelled = False
+
+    async def __call__(self) -> str:
+        self.started_at = asyncio.get_running_loop().time()
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise ValueError(self.result)
+        return self.result
+
+
+def calls(*items: Call) -> list[Callable[[], Awaitable[str]]]:
+    return list(items)
+
+
+async def test_race_returns_first_call_without_hedging() -> None:
+    first, second = Call("first"), Call("second")
+    assert await race(calls(first, second), lambda _: 1.0) == "first"
+    assert second.started_at is None
+
+
+async def test_race_hedges_after_delay_and_cancels_loser() -> None:
+    slow, fast = Call("slow", delay=10.0), Call("fast", delay=0.01)
+    result = await race(calls(slow, fast), lambda _: 0.01)
+    assert result == "fast"
+    await asyncio.sleep(0)
+    assert slow.cancelled
+
+
+async def test_race_hedges_right_after_failure() -> None:
+    failing, backup = Call("boom", error=True), Call("backup")
+    started = asyncio.get_running_loop().time()
+    result = await race(calls(failing, backup), lambda _: 10.0)
+    assert result == "backup"
+    assert backup.started_at is not None
+    assert backup.started_at - started < 1.0
+
+
+async def test_race_hedges_right_after_rejected_result() -> None:
+    bad, good = Call("bad"), Call("good")
+    result = await race(
+        calls(bad, good), lambda _: 10.0, accept=lambda value: value == "good"
+    )
+    assert result == "good"
+
+
+async def test_race_falls_back_to_first_rejected_result() -> None:
+    result = await race(
+        calls(Call("first", delay=0.01), Call("second", delay=0.02)),
+        lambda _: 0.0,
+        accept=lambda _: False,
+    )
+    assert result == "first"
+
+
+async def test_race_prefers_rejected_result_to_error() -> None:
+    result = await race(
+        calls(Call("boom", error=True), Call("rejected")),
+        lambda _: 10.0,
+        accept=lambda _: False,
+    )
+    assert result == "rejected"
+
+
+async def test_race_raises_first_error_when_all_fail() -> None:
+    with pytest.raises(ValueError, match="first"):
+        await race(
+            calls(Call("first", error=True), Call("second", error=True)),
+            lambda _: 10.0,
+        )
+
+
+async def test_race_cancelled_cancels_running_calls() -> None:
+    first, second = Call("first", delay=10.0), Call("second", delay=10.0)
+    task = asyncio.create_task(race(calls(first, second), lambda _: 0.0))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0)
+    assert first.cancelled and second.cancelled
+
+
+async def test_gather_within_waits_grace_then_cancels_slow() -> None:
+    fast = Call("fast", delay=0.01)
+    close = Call("close", delay=0.03)
+    bad = Call("bad", delay=0.02)
+    failing = Call("boom", delay=0.0, error=True)
+    slow = Call("slow", delay=10.0)
+    accepted, rejected, errors = await gather_within(
+        calls(fast, close, bad, failing, slow),
+        accept=lambda value: value != "bad",
+        grace_seconds=0.1,
+    )
+    assert accepted == ["fast", "close"]
+    assert rejected == ["bad"]
+    assert [str(error) for error in errors] == ["boom"]
+    await asyncio.sleep(0)
+    assert slow.cancelled
+
+
+async def test_gather_within_waits_for_all_without_accepted() -> None:
+    accepted, rejected, errors = await gather_within(
+        calls(Call("a", delay=0.02), Call("b", error=True)),
+        accept=lambda _: False,
+        grace_seconds=0.0,
+    )
+    assert accepted == []
+    assert rejected == ["a"]
+    assert len(errors) == 1
@@ -0,0 +1,196 @@
+import pytest
+from src.scripts.index_advisor import (
+    IndexSuggestion,
+    PlanNode,
+    analyze_plan,
+    fingerprint,
+    is_covered,
+)
+
+CREATOR_ID = "0b8d5a0e-5f5c-4c1e-9a43-7d1f2e3a4b5c"
+
+
+@pytest.mark.parametrize(
+    ("first", "second"),
+    [
+        (
+            "SELECT COUNT(*) FROM videos WHERE views_count > 1000",
+            "select count(*)  from videos\nwhere views_count > 25;",
+        ),
+        (
+            f"SELECT * FROM videos WHERE creator_id = '{CREATOR_ID}'",
+            "SELECT * FROM videos WHERE creator_id = 'it''s'",
+        ),
+        (
+            "SELECT AVG(views_count) * 1.5 FROM videos",
+            "SELECT AVG(views_count) * 2 FROM videos",
+        ),
+        (
+            "SELECT 1 FROM videos WHERE created_at < DATE '2025-11-28' + 1",
+            "SELECT 1 FROM videos WHERE created_at < DATE '2025-12-03' + 7",
+        ),
+    ],
+)
+def test_fingerprint_ignores_literal_values(first: str, second: str) -> None:
+    assert fingerprint(first) == fingerprint(second)
+
+
+@pytest.mark.parametrize(
+    ("sql_query", "expected"),
+    [
+        (
+            "SELECT COUNT(*) FROM videos WHERE views_count > 1000",
+            "select count(*) from videos where views_count > ?",
+        ),
+        (
+            "SELECT delta_views_count FROM video_snapshots_hourly",
+            "select delta_views_count from video_snapshots_hourly",
+        ),
+        (
+            "SELECT id FROM videos WHERE id = :p0::uuid",
+            "select id from videos where id = :p0::uuid",
+        ),
+    ],
+)
+def test_fingerprint_keeps_identifiers_and_params(
+    sql_query: str, expected: str
+) -> None:
+    assert fingerprint(sql_query) == expected
+
+
+def test_fingerprint_distinguishes_operators() -> None:
+    assert fingerprint("SELECT 1 FROM videos WHERE views_count > 5") != (
+        fingerprint("SELECT 1 FROM videos WHERE views_count < 5")
+    )
+
+
+def seq_scan(relation: str, filter_text: str, removed: int) -> PlanNode:
+    return {
+        "Node Type": "Seq Scan",
+        "Relation Name": relation,
+        "Filter": filter_text,
+        "Actual Rows": 10,
+        "Rows Removed by Filter": removed,
+        "Shared Hit Blocks": 100,
+        "Shared Read Blocks": 20,
+    }
+
+
+def test_analyze_plan_suggests_equality_then_range_with_include() -> None:
+    plan: PlanNode = {
+        "Node Type": "Aggregate",
+        "Plans": [
+            seq_scan(
+                "videos",
+                f"((creator_id = '{CREATOR_ID}'::uuid) AND "
+                "(video_created_at >= '2025-11-01 00:00:00+00'::timestamp "
+                "with time zone))",
+                5000,
+            )
+        ],
+    }
+    sql_query = (
+        "SELECT SUM(views_count) FROM videos "
+        f"WHERE creator_id = '{CREATOR_ID}' "
+        "AND video_created_at >= '2025-11-01'"
+    )
+
+    ((suggestion, reason),) = analyze_plan(plan, sql_query)
+
+    assert suggestion == IndexSuggestion(
+        "videos",
+        ("creator_id", "video_created_at"),
+        include=("views_count",),
+    )
+    assert reason == (
+        "Seq Scan on videos: 5000 rows removed by filter, 120 buffers"
+    )
+
+
+def test_analyze_plan_maps_partition_to_parent_and_picks_brin() -> None:
+    plan = seq_scan(
+        "video_snapshots_hourly_y2025m11",
+        "(hour_start >= '2025-11-28 00:00:00+00'::timestamp with time zone)",
+        2_000_000,
+    )
+
+    ((suggestion, _),) = analyze_plan(
+        plan, "SELECT * FROM video_snapshots_hourly WHERE hour_start >= ?"
+    )
+
+    assert suggestion == IndexSuggestion(
+        "video_snapshots_hourly", ("hour_start",), method="brin"
+    )
+
+
+def test_analyze_plan_suggests_sort_key() -> None:
+    plan: PlanNode = {
+        "Node Type": "Sort",
+        "Sort Key": ["videos.views_count DESC"],
+        "Plans": [{"Node Type": "Seq Scan", "Relation Name": "videos"}],
+    }
+
+    suggestions = analyze_plan(
+        plan, "SELECT id FROM videos ORDER BY views_count DESC"
+    )
+
+    assert suggestions == [
+        (
+            IndexSuggestion("videos", ("views_count",)),
+            "Sort by videos.views_count DESC",
+        )
+    ]
+
+
+def test_analyze_plan_skips_unknown_tables_and_columns() -> None:
+    plan: PlanNode = {
+        "Node Type": "Append",
+        "Plans": [
+            seq_scan("pg_class", "(relname = 'videos'::name)", 500),
+            seq_scan("videos", "(unknown_column = 1)", 500),
+        ],
+    }
+
+    assert analyze_plan(plan, "SELECT 1") == []
+
+
+INDEXES = {
+    "videos": [
+        ("btree", ("creator_id", "video_created_at"), ("views_count",)),
+        ("brin", ("created_at",), ()),
+    ]
+}
+
+
+@pytest.mark.parametrize(
+    ("suggestion", "covered"),
+    [
+        (IndexSuggestion("videos", ("creator_id",)), True),
+        (
+            IndexSuggestion(
+                "videos",
+                ("creator_id", "video_created_at"),
+                include=("views_count",),
+            ),
+            True,
+        ),
+        (
+            IndexSuggestion(
+                "videos", ("creator_id",), include=("video_created_at",)
+            ),
+            True,
+        ),
+        (IndexSuggestion("videos", ("video_created_at",)), False),
+        (
+            IndexSuggestion(
+                "videos", ("creator_id",), include=("likes_count",)
+            ),
+            False,
+        ),
+        (IndexSuggestion("videos", ("created_at",)), False),
+        (IndexSuggestion("videos", ("created_at",), method="brin"), True),
+        (IndexSuggestion("video_snapshots", ("video_id",)), False),
+    ],
+)
+def test_is_covered(suggestion: IndexSuggestion, covered: bool) -> None:
+    assert is_covered(suggestion, INDEXES) is covered
@@ -0,0 +1,98 @@
+from itertools import count
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+import pytest
+from src.core import metrics
+
+_names = count(1)
+
+
+def unique(prefix: str) -> str:
+    # метрики регистрируются в общем REGISTRY, имена не должны повторяться
+    return f"test_{prefix}_{next(_names)}"
+
+
+def test_metric_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        metrics.Metric("test_abstract", "never registered")  # type: ignore[abstract]
+
+
+def test_counter_exposition() -> None:
+    name = unique("counter")
+    counter = metrics.Counter(name, "Requests.", ("source",))
+    counter.inc(source="llm")
+    counter.inc(2, source="llm")
+    counter.inc(0.5, source='a"b\\c\nd')
+    assert counter.render() == "\n".join(
+        [
+            f"# HELP {name} Requests.",
+            f"# TYPE {name} counter",
+            f'{name}{{source="llm"}} 3',
+            f'{name}{{source="a\\"b\\\\c\\nd"}} 0.5',
+        ]
+    )
+
+
+def test_counter_requires_labels() -> None:
+    counter = metrics.Counter(unique("labels"), "Labels.", ("kind",))
+    with pytest.raises(ValueError, match="missing label 'kind'"):
+        counter.inc()
+
+
+def test_histogram_exposition() -> None:
+    name = unique("histogram")
+    histogram = metrics.Histogram(
+        name, "Latency.", ("stage",), buckets=(0.1, 1.0)
+    )
+    histogram.observe(0.05, stage="sql")
+    histogram.observe(0.1, stage="sql")
+    histogram.observe(2.5, stage="sql")
+    assert histogram.render().splitlines()[2:] == [
+        f'{name}_bucket{{stage="sql",le="0.1"}} 2',
+        f'{name}_bucket{{stage="sql",le="1"}} 2',
+        f'{name}_bucket{{stage="sql",le="+Inf"}} 3',
+        f'{name}_sum{{stage="sql"}} 2.65',
+        f'{name}_count{{stage="sql"}} 3',
+    ]
+
+
+def test_histogram_time_observes_failed_block() -> None:
+    histogram = metrics.Histogram(unique("timed"), "Timed.")
+    with pytest.raises(RuntimeError), histogram.time():
+        raise RuntimeError
+    assert histogram.render().endswith(" 1")
+
+
+def test_gauge_reads_function_and_skips_failure() -> None:
+    name = unique("gauge")
+    gauge = metrics.Gauge(name, "Queue.")
+    assert list(gauge.samples()) == []
+    gauge.set_function(lambda: 7)
+    assert list(gauge.samples()) == [f"{name} 7"]
+    gauge.set_function(lambda: 1 / 0)
+    assert list(gauge.samples()) == []
+
+
+def test_registry_rejects_duplicate_names() -> None:
+    name = unique("duplicate")
+    metrics.Counter(name, "First.")
+    with pytest.raises(ValueError, match="already registered"):
+        metrics.Counter(name, "Second.")
+
+
+async def test_metrics_endpoint() -> None:
+    name = unique("endpoint")
+    metrics.Counter(name, "Endpoint.").inc()
+    app = web.Application()
+    app.router.add_get("/metrics", metrics.metrics_handler)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.get("/metrics")
+        body = await response.text()
+
+    assert response.status == 200
+    assert response.content_type == "text/plain"
+    assert f"# TYPE {name} counter\n{name} 1\n" in body
+    # метрики разделены пустой строкой, ответ кончается переводом строки
+    assert "\n\n# HELP" in body
+    assert body.endswith("\n")
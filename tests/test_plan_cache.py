@@ -0,0 +1,130 @@
+from pathlib import Path
+import time
+
+import pytest
+from src.llm_service.plan_cache import PlanCache, normalize_question
+
+
+class Clock:
+    """Подменяемое время для проверки TTL."""
+
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    fake = Clock(1000.0)
+    monkeypatch.setattr(time, "time", fake)
+    return fake
+
+
+def test_normalize_question_ignores_case_quotes_and_punctuation() -> None:
+    assert normalize_question("Сколько  всего «видео»?") == normalize_question(
+        "сколько всего видео"
+    )
+    assert normalize_question("Ещё видео.") == "еще видео"
+
+
+def test_normalize_question_keeps_operators_and_numbers() -> None:
+    greater = normalize_question("Сколько видео, где просмотров > 100000?")
+    less = normalize_question("Сколько видео, где просмотров < 100000?")
+
+    assert greater != less
+    assert normalize_question("рост +5%") != normalize_question("рост -5%")
+    assert normalize_question("больше 1.5 тысяч в 10:00") == (
+        "больше 1.5 тысяч в 10:00"
+    )
+
+
+def test_put_evicts_least_recently_used() -> None:
+    cache = PlanCache("fp", max_size=2)
+    cache.put("a", "SELECT 1")
+    cache.put("b", "SELECT 2")
+    assert cache.get("a") == "SELECT 1"
+
+    cache.put("c", "SELECT 3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "SELECT 1"
+    assert cache.get("c") == "SELECT 3"
+    assert len(cache) == 2
+
+
+def test_get_drops_expired_entries(clock: Clock) -> None:
+    cache = PlanCache("fp", ttl_seconds=60)
+    cache.put("a", "SELECT 1")
+
+    clock.now += 30
+    assert cache.get("a") == "SELECT 1"
+
+    clock.now += 31
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_load_skips_expired_entries(clock: Clock, tmp_path: Path) -> None:
+    path = tmp_path / "plans.json"
+    writer = PlanCache("fp", ttl_seconds=60, path=path)
+    writer.put("old", "SELECT 1")
+    clock.now += 40
+    writer.put("fresh", "SELECT 2")
+    writer.save()
+
+    clock.now += 30
+    reader = PlanCache("fp", ttl_seconds=60, path=path)
+    reader.load()
+
+    assert reader.get("old") is None
+    assert reader.get("fresh") == "SELECT 2"
+
+
+def test_load_ignores_cache_with_other_fingerprint(tmp_path: Path) -> None:
+    path = tmp_path / "plans.json"
+    writer = PlanCache("old-prompt", path=path)
+    writer.put("a", "SELECT 1")
+    writer.save()
+
+    reader = PlanCache("new-prompt", path=path)
+    reader.load()
+
+    assert len(reader) == 0
+
+
+def test_failed_write_keeps_cache_dirty(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache = PlanCache("fp", path=tmp_path / "plans.json")
+    cache.put("a", "SELECT 1")
+    snapshot = cache.dump()
+    assert snapshot is not None
+
+    def fail(*_args: object, **_kwargs: object) -> int:
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Path, "write_text", fail)
+        with pytest.raises(OSError):
+            cache.write(snapshot)
+
+    assert cache.dirty
+    retry = cache.dump()
+    assert retry is not None
+    cache.write(retry)
+    assert not cache.dirty
+    assert cache.dump() is None
+
+
+def test_changes_after_dump_stay_dirty(tmp_path: Path) -> None:
+    cache = PlanCache("fp", path=tmp_path / "plans.json")
+    cache.put("a", "SELECT 1")
+    snapshot = cache.dump()
+    assert snapshot is not None
+
+    cache.put("b", "SELECT 2")
+    cache.write(snapshot)
+
+    assert cache.dirty
@@ -0,0 +1,105 @@
+from typing import Any
+
+import pytest
+from src.core.settings import QueryGuardSettings
+from src.database.manager import ReadConnection
+from src.llm_service.query_guard import (
+    PlanEstimate,
+    QueryGuard,
+    QueryTooExpensiveError,
+    estimate,
+)
+
+
+class FakeConnection:
+    """Отвечает на EXPLAIN заданным планом и запоминает запросы."""
+
+    def __init__(self, plan: dict[str, Any]) -> None:
+        self.plan = plan
+        self.queries: list[str] = []
+
+    async def fetchval(
+        self, sql_query: str, _params: dict[str, Any] | None = None
+    ) -> Any:
+        self.queries.append(sql_query)
+        if sql_query.startswith("EXPLAIN"):
+            return [{"Plan": self.plan}]
+        return None
+
+
+def scan(rows: float, cost: float = 10.0) -> dict[str, Any]:
+    return {
+        "Node Type": "Seq Scan",
+        "Relation Name": "videos",
+        "Plan Rows": rows,
+        "Total Cost": cost,
+    }
+
+
+def guard(**settings: Any) -> QueryGuard:
+    return QueryGuard(QueryGuardSettings(**settings))
+
+
+def as_read(connection: FakeConnection) -> ReadConnection:
+    return connection  # type: ignore[return-value]
+
+
+def test_estimate_finds_widest_node_and_cartesian_join() -> None:
+    plan = {
+        "Node Type": "Nested Loop",
+        "Total Cost": 500.0,
+        "Plan Rows": 100,
+        "Plans": [scan(10), scan(1_000)],
+    }
+    assert estimate(plan) == PlanEstimate(
+        total_cost=500.0,
+        max_rows=1_000,
+        widest_node="Seq Scan on videos",
+        has_unconditioned_join=True,
+    )
+
+
+async def test_check_explains_and_sets_timeout() -> None:
+    connection = FakeConnection(scan(10))
+    await guard(statement_timeout_ms=5_000).check(
+        as_read(connection), "SELECT 1;"
+    )
+    assert "statement_timeout" in connection.queries[0]
+    assert connection.queries[1] == "EXPLAIN (FORMAT JSON) SELECT 1"
+
+
+async def test_check_rejects_expensive_plan() -> None:
+    connection = FakeConnection(scan(10, cost=5_000))
+    with pytest.raises(QueryTooExpensiveError, match="estimated cost 5000"):
+        await guard(max_cost=1_000).check(as_read(connection), "SELECT 1")
+
+
+async def test_check_rejects_wide_node() -> None:
+    connection = FakeConnection(scan(10_000))
+    with pytest.raises(
+        QueryTooExpensiveError, match="Seq Scan on videos is estimated"
+    ):
+        await guard(max_rows=1_000).check(as_read(connection), "SELECT 1")
+
+
+async def test_check_reuses_given_estimate() -> None:
+    connection = FakeConnection(scan(10))
+    cheap = estimate(scan(10))
+    await guard().check(as_read(connection), "SELECT 1", None, cheap)
+    assert not any(query.startswith("EXPLAIN") for query in connection.queries)
+
+    expensive = estimate(scan(10, cost=5_000))
+    with pytest.raises(QueryTooExpensiveError):
+        await guard(max_cost=1_000).check(
+            as_read(connection), "SELECT 1", None, expensive
+        )
+    # таймаут ставится и без повторного EXPLAIN
+    assert connection.queries == [connection.queries[0]] * 2
+
+
+async def test_disabled_guard_does_nothing() -> None:
+    connection = FakeConnection(scan(10, cost=5_000))
+    await guard(enabled=False, max_cost=1).check(
+        as_read(connection), "SELECT 1"
+    )
+    assert connection.queries == []
@@ -0,0 +1,103 @@
+from datetime import date
+import json
+from typing import Any
+from uuid import UUID
+
+import pytest
+from src.llm_service import journal
+from src.scripts.replay_journal import ReplayQuery, due_times, load_queries
+
+VIDEO_ID = "0b8d5a0e-5f5c-4c1e-9a43-7d1f2e3a4b5c"
+
+
+def attempt(
+    kind: str,
+    sql_query: str | None,
+    offset_ms: float,
+    params: dict[str, Any] | None = None,
+    error: str | None = None,
+) -> dict[str, Any]:
+    return {
+        "kind": kind,
+        "sql": sql_query,
+        "params": params,
+        "error": error,
+        "offset_ms": offset_ms,
+    }
+
+
+def test_load_queries_keeps_successful_sql_in_arrival_order() -> None:
+    records: list[dict[str, Any]] = [
+        {
+            "at": 110.0,
+            "attempts": [
+                attempt("llm", "SELECT bad", 100, error="syntax error"),
+                attempt("llm", None, 200, error="empty response"),
+                attempt("retry", "SELECT 2", 500),
+            ],
+        },
+        {"at": 100.0, "attempts": [attempt("plan_cache", "SELECT 1", 0)]},
+        {"at": 105.0, "attempts": []},
+        {"at": 106.0},
+    ]
+    queries = load_queries(records)
+    assert [(query.sql, query.kind) for query in queries] == [
+        ("SELECT 1", "plan_cache"),
+        ("SELECT 2", "retry"),
+    ]
+    # смещения от первого запроса журнала
+    assert [query.offset for query in queries] == [0.0, 10.5]
+
+
+def test_load_queries_include_failed() -> None:
+    records = [
+        {
+            "at": 0.0,
+            "attempts": [
+                attempt("llm", "SELECT bad", 100, error="syntax error"),
+                attempt("retry", "SELECT 2", 300),
+            ],
+        }
+    ]
+    queries = load_queries(records, include_failed=True)
+    assert [query.sql for query in queries] == ["SELECT bad", "SELECT 2"]
+    assert queries[1].offset == pytest.approx(0.2)
+
+
+def test_load_queries_restores_template_params() -> None:
+    with journal.trace_query("просмотры видео за 28 ноября") as trace:
+        journal.record_attempt(
+            "template",
+            "SELECT :p0, :p1, :p2",
+            {"p0": UUID(VIDEO_ID), "p1": date(2025, 11, 28), "p2": 5},
+        )
+    # журнал пишет json с default=str
+    record = json.loads(json.dumps(trace.record(), default=str))
+
+    [query] = load_queries([record])
+    assert query.params == {
+        "p0": UUID(VIDEO_ID),
+        "p1": date(2025, 11, 28),
+        "p2": 5,
+    }
+    assert query.offset == 0.0
+
+
+def test_load_queries_empty() -> None:
+    assert load_queries([]) == []
+
+
+def queries_at(*offsets: float) -> list[ReplayQuery]:
+    return [ReplayQuery(offset, "SELECT 1", None, "llm") for offset in offsets]
+
+
+def test_due_times_scales_journal_rhythm() -> None:
+    queries = queries_at(0.0, 1.0, 4.0)
+    assert due_times(queries, speed=1.0, rate=None) == [0.0, 1.0, 4.0]
+    assert due_times(queries, speed=2.0, rate=None) == [0.0, 0.5, 2.0]
+    assert due_times(queries, speed=0.0, rate=None) == [0.0, 0.0, 0.0]
+
+
+def test_due_times_constant_rate_ignores_journal() -> None:
+    queries = queries_at(0.0, 1.0, 4.0, 9.0)
+    assert due_times(queries, speed=1.0, rate=2.0) == [0.0, 0.5, 1.0, 1.5]
@@ -0,0 +1,109 @@
+import asyncio
+from collections.abc import AsyncGenerator
+
+import pytest
+from src.bot.scheduler import Job, QueryScheduler
+
+
+@pytest.fixture
+async def scheduler() -> AsyncGenerator[QueryScheduler]:
+    scheduler = QueryScheduler(
+        max_concurrency=1, max_backlog=4, max_queued_per_user=2
+    )
+    yield scheduler
+    await scheduler.close()
+
+
+def recorder(order: list[str], name: str, gate: asyncio.Event) -> Job:
+    async def job() -> None:
+        order.append(name)
+        await gate.wait()
+
+    return job
+
+
+async def drain(scheduler: QueryScheduler) -> None:
+    while scheduler.queued or scheduler.running:
+        await asyncio.sleep(0)
+
+
+async def test_users_are_served_round_robin(
+    scheduler: QueryScheduler,
+) -> None:
+    order: list[str] = []
+    gate = asyncio.Event()
+    gate.set()
+    for name in ("a1", "a2"):
+        assert scheduler.submit("a", recorder(order, name, gate))
+    for name in ("b1", "b2"):
+        assert scheduler.submit("b", recorder(order, name, gate))
+
+    await drain(scheduler)
+    assert order == ["a1", "b1", "a2", "b2"]
+
+
+async def test_user_jobs_run_one_at_a_time() -> None:
+    scheduler = QueryScheduler(
+        max_concurrency=4, max_backlog=10, max_queued_per_user=10
+    )
+    order: list[str] = []
+    gate = asyncio.Event()
+    try:
+        scheduler.submit("a", recorder(order, "a1", gate))
+        scheduler.submit("a", recorder(order, "a2", gate))
+        scheduler.submit("b", recorder(order, "b1", gate))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert order == ["a1", "b1"]
+        assert scheduler.running == 2
+        assert scheduler.queued == 1
+
+        gate.set()
+        await drain(scheduler)
+        assert order == ["a1", "b1", "a2"]
+    finally:
+        await scheduler.close()
+
+
+async def test_rejects_over_per_user_limit(
+    scheduler: QueryScheduler,
+) -> None:
+    gate = asyncio.Event()
+    order: list[str] = []
+    assert scheduler.submit("a", recorder(order, "a1", gate))
+    assert scheduler.submit("a", recorder(order, "a2", gate))
+    assert not scheduler.submit("a", recorder(order, "a3", gate))
+    # лимит на пользователя не мешает остальным
+    assert scheduler.submit("b", recorder(order, "b1", gate))
+
+
+async def test_rejects_over_backlog(scheduler: QueryScheduler) -> None:
+    gate = asyncio.Event()
+    order: list[str] = []
+    for key in ("a", "b", "c", "d"):
+        assert scheduler.submit(key, recorder(order, key, gate))
+    assert not scheduler.submit("e", recorder(order, "e", gate))
+    assert "e" not in scheduler._queues
+
+    # место освобождается, когда воркер забирает запрос
+    await asyncio.sleep(0)
+    assert order == ["a"]
+    assert scheduler.queued == 3
+    assert scheduler.submit("e", recorder(order, "e", gate))
+
+
+async def test_failed_job_does_not_stop_worker(
+    scheduler: QueryScheduler,
+) -> None:
+    order: list[str] = []
+    gate = asyncio.Event()
+    gate.set()
+
+    async def failing() -> None:
+        raise RuntimeError("boom")
+
+    scheduler.submit("a", failing)
+    scheduler.submit("a", recorder(order, "a2", gate))
+    await drain(scheduler)
+    assert order == ["a2"]
+    assert not scheduler._queues
@@ -0,0 +1,78 @@
+import pytest
+from src.database.models.base import Base
+from src.llm_service.sql_checker import SQLChecker, SQLCheckError
+
+
+@pytest.fixture(scope="module")
+def checker() -> SQLChecker:
+    return SQLChecker(Base.metadata)
+
+
+@pytest.mark.parametrize(
+    "sql_query",
+    [
+        "SELECT COUNT(*) FROM videos",
+        "select count(*) from videos;",
+        "SELECT v.id FROM public.videos AS v WHERE v.views_count > 100",
+        "SELECT COALESCE(SUM(delta_views_count), 0) "
+        "FROM video_snapshots_hourly "
+        "WHERE hour_start >= :p0 AND hour_start < :p0 + INTERVAL '1 day'",
+        "SELECT creator_id, SUM(views_count) AS total FROM videos "
+        "GROUP BY creator_id ORDER BY total DESC LIMIT 5",
+        "SELECT COUNT(DISTINCT s.video_id) FROM video_snapshots s "
+        "JOIN videos v ON v.id = s.video_id WHERE v.creator_id = "
+        "'0b8d5a0e-5f5c-4c1e-9a43-7d1f2e3a4b5c'",
+        "WITH top AS (SELECT id, views_count FROM videos) "
+        "SELECT whatever FROM top",
+        "SELECT x.n FROM (SELECT COUNT(*) AS n FROM videos) x",
+        "SELECT EXTRACT(EPOCH FROM created_at) FROM videos",
+        "SELECT CAST(created_at AS date), created_at::date FROM videos",
+        "SELECT substring(id::text FROM 1 FOR 8) FROM videos",
+        "SELECT overlay('abc' PLACING 'x' FROM 1) FROM videos",
+        "SELECT overlay(id::text PLACING 'x' FROM 1 FOR 2) FROM videos",
+        "SELECT trim(BOTH 'x' FROM id::text) FROM videos",
+        "SELECT substring('abc' SIMILAR 'a' ESCAPE '#') FROM videos",
+        "SELECT position('a' IN 'abc') FROM videos",
+        "SELECT COUNT(*) FROM videos "
+        "WHERE views_count IS DISTINCT FROM likes_count",
+        "SELECT * FROM generate_series(1, 3) AS g(n) WHERE n > 1",
+        "SELECT 'DELETE FROM videos' AS text_value",
+        "SELECT id FROM videos -- DROP TABLE videos",
+    ],
+)
+def test_check_accepts(checker: SQLChecker, sql_query: str) -> None:
+    checker.check(sql_query)
+
+
+@pytest.mark.parametrize(
+    ("sql_query", "message"),
+    [
+        ("", "empty sql query"),
+        ("SELECT 1; SELECT 2", "multiple statements"),
+        ("DELETE FROM videos", "only SELECT"),
+        ("WITH d AS (DELETE FROM videos RETURNING id) SELECT 1", "DELETE"),
+        ("SELECT id INTO backup FROM videos", "INTO"),
+        ("SELECT id FROM videos FOR UPDATE", "row locking"),
+        ("SELECT pg_sleep(10)", "pg_sleep"),
+        ("SELECT COUNT(*) FROM video", 'relation "video" does not exist'),
+        ("SELECT view_count FROM videos", 'column "view_count"'),
+        ("SELECT v.bogus FROM videos v", "bogus"),
+        ("SELECT x.id FROM videos v", 'FROM-clause entry for table "x"'),
+        ("SELECT substring(bogus FROM 1) FROM videos", 'column "bogus"'),
+        (
+            "SELECT overlay(placing_value PLACING 'x' FROM 1) FROM videos",
+            'column "placing_value"',
+        ),
+        (
+            "SELECT creator_id, COUNT(*) FROM videos",
+            "creator_id",
+        ),
+        ("SELECT (id FROM videos", "unbalanced parentheses"),
+        ("SELECT 'abc FROM videos", "unterminated literal"),
+    ],
+)
+def test_check_rejects(
+    checker: SQLChecker, sql_query: str, message: str
+) -> None:
+    with pytest.raises(SQLCheckError, match=message):
+        checker.check(sql_query)
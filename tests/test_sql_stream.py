@@ -0,0 +1,72 @@
+import pytest
+from src.llm_service.sql_stream import SQLStreamExtractor, extract_sql
+
+
+def feed_chunks(chunks: list[str]) -> tuple[str | None, SQLStreamExtractor]:
+    extractor = SQLStreamExtractor()
+    for chunk in chunks:
+        sql_query = extractor.feed(chunk)
+        if sql_query is not None:
+            return sql_query, extractor
+    return None, extractor
+
+
+def split_every(text: str, size: int) -> list[str]:
+    return [text[index : index + size] for index in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize(
+    ("content", "expected"),
+    [
+        ("SELECT 1; пояснение", "SELECT 1;"),
+        ("  SELECT 1", "SELECT 1"),
+        ("```sql\nSELECT 1\n```\nпояснение", "SELECT 1"),
+        ("```\nSELECT 1\n```", "SELECT 1"),
+        ("```SELECT 1```", "SELECT 1"),
+        ("```sql SELECT 1```", "SELECT 1"),
+        ("SELECT ';' AS a; хвост", "SELECT ';' AS a;"),
+        ('SELECT "a;b" FROM t; хвост', 'SELECT "a;b" FROM t;'),
+        ("SELECT 'it''s;'; хвост", "SELECT 'it''s;';"),
+        ("SELECT 1 -- ;\n, 2; хвост", "SELECT 1 -- ;\n, 2;"),
+        ("SELECT /* ; */ 1; хвост", "SELECT /* ; */ 1;"),
+        ("SELECT 1 /* a * b ** */; хвост", "SELECT 1 /* a * b ** */;"),
+        ("", ""),
+    ],
+)
+def test_extract_sql(content: str, expected: str) -> None:
+    assert extract_sql(content) == expected
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "SELECT 'a;' -- b;\n/* c; */ , 2; хвост",
+        "```sql\nSELECT '```' /* ``` */, 1 - 2 / 3\n```\nхвост",
+    ],
+)
+@pytest.mark.parametrize("size", [1, 2, 3, 5])
+def test_chunked_stream_matches_whole_response(content: str, size: int) -> None:
+    sql_query, extractor = feed_chunks(split_every(content, size))
+    if sql_query is None:
+        sql_query = extractor.finish()
+    assert sql_query == extract_sql(content)
+
+
+def test_stops_before_explanation_arrives() -> None:
+    extractor = SQLStreamExtractor()
+    assert extractor.feed("```sql\nSELECT count(*)") is None
+    assert extractor.feed(" FROM videos\n``") is None
+    assert extractor.feed("`\n") == "SELECT count(*) FROM videos"
+
+
+def test_split_comment_marker_is_not_a_statement_end() -> None:
+    extractor = SQLStreamExtractor()
+    assert extractor.feed("SELECT 1 -") is None
+    assert extractor.feed("- ;\n") is None
+    assert extractor.feed(", 2;") == "SELECT 1 -- ;\n, 2;"
+
+
+def test_finish_without_end() -> None:
+    extractor = SQLStreamExtractor()
+    assert extractor.feed("```sql\nSELECT 1") is None
+    assert extractor.finish() == "SELECT 1"
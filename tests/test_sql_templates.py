@@ -0,0 +1,128 @@
+from datetime import date
+from uuid import UUID
+
+import pytest
+from src.llm_service.plan_cache import PlanCache
+from src.llm_service.sql_templates import SQLTemplateCache, extract_literals
+
+VIDEO_ID = "0b8d5a0e-5f5c-4c1e-9a43-7d1f2e3a4b5c"
+
+DAY_SQL = (
+    "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots_hourly "
+    "WHERE created_at >= '2025-11-28' AND created_at < DATE '2025-11-28' + 1"
+)
+
+
+@pytest.fixture
+def templates() -> SQLTemplateCache:
+    return SQLTemplateCache(PlanCache("fp"))
+
+
+def test_extract_literals_finds_uuid_dates_and_numbers() -> None:
+    literals = extract_literals(
+        f"видео {VIDEO_ID} набрало больше 10 000 просмотров 28 ноября 2025"
+    )
+
+    assert [(literal.kind, literal.value) for literal in literals] == [
+        ("uuid", UUID(VIDEO_ID)),
+        ("number", 10000),
+        ("date", date(2025, 11, 28)),
+    ]
+
+
+def test_extract_literals_splits_day_range_without_year() -> None:
+    literals = extract_literals("с 1 по 5 ноября")
+
+    assert [literal.value for literal in literals] == [
+        date(2000, 11, 1),
+        date(2000, 11, 5),
+    ]
+    assert not any(literal.has_year for literal in literals)
+
+
+def test_extract_literals_reads_iso_date() -> None:
+    (literal,) = extract_literals("за 2025-12-03")
+
+    assert literal.kind == "date"
+    assert literal.value == date(2025, 12, 3)
+
+
+def test_learn_and_match_bind_new_values(
+    templates: SQLTemplateCache,
+) -> None:
+    assert templates.learn("сколько просмотров 28 ноября 2025", DAY_SQL)
+
+    matched = templates.match("Сколько просмотров 3 декабря 2025?")
+
+    assert matched is not None
+    _, bound = matched
+    assert bound.params == {"p0": date(2025, 12, 3)}
+    assert bound.sql.count("CAST(:p0 AS DATE)") == 2
+    assert "+ 1" in bound.sql
+
+
+def test_match_fills_year_from_template(templates: SQLTemplateCache) -> None:
+    assert templates.learn("сколько просмотров 28 ноября", DAY_SQL)
+
+    matched = templates.match("сколько просмотров 3 декабря")
+
+    assert matched is not None
+    assert matched[1].params == {"p0": date(2025, 12, 3)}
+
+
+def test_learn_binds_number_and_uuid(templates: SQLTemplateCache) -> None:
+    sql_query = (
+        "SELECT COUNT(*) FROM videos "
+        f"WHERE creator_id = '{VIDEO_ID}' AND views_count > 1000"
+    )
+    assert templates.learn(
+        f"сколько видео у {VIDEO_ID} больше 1000 просмотров", sql_query
+    )
+
+    other_id = "1c9e6b1f-6a6d-4d2f-8b54-8e2f3a4b5c6d"
+    matched = templates.match(
+        f"сколько видео у {other_id} больше 500 просмотров"
+    )
+
+    assert matched is not None
+    assert matched[1].params == {"p0": UUID(other_id), "p1": 500}
+
+
+def test_learn_refuses_number_bound_into_date_shift(
+    templates: SQLTemplateCache,
+) -> None:
+    sql_query = (
+        "SELECT COUNT(*) FROM video_snapshots_hourly "
+        "WHERE views_count > 1000 AND created_at >= '2025-11-28' "
+        "AND created_at < DATE '2025-11-28' + 1"
+    )
+
+    assert not templates.learn(
+        "больше 1 тысячи просмотров 28 ноября 2025", sql_query
+    )
+    assert templates.match("больше 5 тысячи просмотров 3 декабря 2025") is None
+
+
+def test_learn_refuses_unmapped_number(templates: SQLTemplateCache) -> None:
+    sql_query = "SELECT COUNT(*) FROM videos WHERE views_count > 5000"
+
+    assert not templates.learn("больше 5 тысяч просмотров", sql_query)
+    assert not templates.learn(
+        "сколько просмотров 28 ноября 2025", f"{DAY_SQL} LIMIT 50"
+    )
+
+
+def test_learn_refuses_ambiguous_number(templates: SQLTemplateCache) -> None:
+    sql_query = (
+        "SELECT COUNT(*) FROM videos "
+        "WHERE views_count > 10 AND likes_count > 10"
+    )
+
+    assert not templates.learn("больше 10 просмотров и лайков", sql_query)
+
+
+def test_match_requires_same_shape(templates: SQLTemplateCache) -> None:
+    assert templates.learn("сколько просмотров 28 ноября 2025", DAY_SQL)
+
+    assert templates.match("сколько лайков 28 ноября 2025") is None
+    assert templates.match("сколько просмотров") is None
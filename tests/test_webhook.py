@@ -0,0 +1,123 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from itertools import count
+from time import time
+from typing import Any
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+from pydantic import SecretStr, ValidationError
+import pytest
+from src.bot.webhook import HEALTH_PATH, create_webhook_app
+from src.core.settings import BotSettings
+
+SECRET = "local-check"
+SECRET_HEADER = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+FAKE_TOKEN = "123456:fake-token-for-local-webhook-check"
+
+_update_ids = count(1)
+
+
+def fake_update(user_id: int, text: str) -> dict[str, Any]:
+    update_id = next(_update_ids)
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "test"},
+            "text": text,
+        },
+    }
+
+
+class Recorder:
+    """Диспетчер, который ждет `release` вместо llm."""
+
+    def __init__(self) -> None:
+        self.release = asyncio.Event()
+        self.started: list[str] = []
+        self.handled: list[str] = []
+        self.dispatcher = Dispatcher()
+        self.dispatcher.message(F.text)(self.handle)
+
+    async def handle(self, message: Message) -> None:
+        assert message.text is not None
+        self.started.append(message.text)
+        await self.release.wait()
+        self.handled.append(message.text)
+
+
+@pytest.fixture
+def settings() -> BotSettings:
+    return BotSettings(mode="webhook", webhook_secret=SecretStr(SECRET))
+
+
+@pytest.fixture
+def recorder() -> Recorder:
+    return Recorder()
+
+
+@pytest.fixture
+async def client(
+    recorder: Recorder, settings: BotSettings
+) -> AsyncGenerator[TestClient[Any, Any]]:
+    bot = Bot(token=FAKE_TOKEN)
+    app = create_webhook_app(recorder.dispatcher, bot, settings)
+    async with TestClient(TestServer(app)) as client:
+        yield client
+
+
+async def wait_for(condition: Any) -> None:
+    async with asyncio.timeout(5):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+def test_webhook_mode_requires_secret() -> None:
+    with pytest.raises(ValidationError, match="BOT_WEBHOOK_SECRET"):
+        BotSettings(mode="webhook", webhook_secret=None)
+    BotSettings(mode="polling", webhook_secret=None)
+
+
+async def test_rejects_update_without_secret(
+    client: TestClient[Any, Any], settings: BotSettings, recorder: Recorder
+) -> None:
+    response = await client.post(
+        settings.webhook_path, json=fake_update(1, "no secret")
+    )
+    assert response.status == 401
+    await asyncio.sleep(0.05)
+    assert not recorder.started
+
+
+async def test_acks_before_handler_finishes(
+    client: TestClient[Any, Any], settings: BotSettings, recorder: Recorder
+) -> None:
+    texts = [f"query {index}" for index in range(20)]
+    responses = await asyncio.gather(
+        *(
+            client.post(
+                settings.webhook_path,
+                json=fake_update(index % 5, text),
+                headers=SECRET_HEADER,
+            )
+            for index, text in enumerate(texts)
+        )
+    )
+    assert [response.status for response in responses] == [200] * 20
+    # все подтверждены, хотя ни один обработчик еще не закончил
+    assert not recorder.handled
+
+    await wait_for(lambda: len(recorder.started) == len(texts))
+    recorder.release.set()
+    await wait_for(lambda: len(recorder.handled) == len(texts))
+    assert sorted(recorder.handled) == sorted(texts)
+
+
+async def test_health(client: TestClient[Any, Any]) -> None:
+    response = await client.get(HEALTH_PATH)
+    assert response.status == 200
+    assert await response.text() == "ok"